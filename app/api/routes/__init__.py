@@ -7,6 +7,7 @@ from app.api.routes.dashboard_routes import router as dashboard_router
 from app.api.routes.monitor_routes import router as monitor_router
 from app.api.routes.rule_routes import router as rule_router
 from app.api.routes.consequence_routes import router as consequence_router
+from app.api.routes.admin_routes import router as admin_router
 
 api_router = APIRouter()
 
@@ -17,3 +18,4 @@ api_router.include_router(dashboard_router, prefix="/dashboard", tags=["Dashboar
 api_router.include_router(monitor_router, prefix="/monitor", tags=["Monitor"])
 api_router.include_router(rule_router, prefix="/rules", tags=["Rules"])
 api_router.include_router(consequence_router, prefix="/consequences", tags=["Consequences"])
+api_router.include_router(admin_router, prefix="/admin", tags=["Admin"])
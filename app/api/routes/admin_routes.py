@@ -0,0 +1,48 @@
+# routes/admin_routes.py
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.responses import PlainTextResponse
+
+from app.core.profiler import profile_store
+from app.core.query_tracer import slow_queries
+from app.core.security import admin_only
+
+router = APIRouter(dependencies=[Depends(admin_only)])
+
+@router.get("/profiles")
+async def list_profiles():
+    """Profiles kept from requests sent with the profiler header, newest first."""
+    return [profile.summary() for profile in profile_store.list()]
+
+@router.get("/profiles/{profile_id}")
+async def download_profile(
+    profile_id: int,
+    format: Literal["pstats", "text"] = "pstats",
+    sort: Literal["cumulative", "tottime", "calls"] = "cumulative",
+    limit: int = 50,
+):
+    """The profile as a pstats dump (`python -m pstats`, snakeviz), or as text with format=text."""
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    if format == "text":
+        return PlainTextResponse(profile.text(sort, limit))
+    return Response(
+        profile.dump(),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.prof"'},
+    )
+
+@router.delete("/profiles", status_code=status.HTTP_204_NO_CONTENT)
+async def clear_profiles():
+    profile_store.clear()
+
+@router.get("/slow-queries")
+async def list_slow_queries(limit: int = 20):
+    """MongoDB query shapes slower than MONGO_SLOW_QUERY_MS, by total time spent in them."""
+    return {"shapes": slow_queries.top(limit), "dropped": slow_queries.dropped}
+
+@router.delete("/slow-queries", status_code=status.HTTP_204_NO_CONTENT)
+async def clear_slow_queries():
+    slow_queries.clear()
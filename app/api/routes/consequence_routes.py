@@ -1,11 +1,12 @@
 from fastapi import APIRouter, HTTPException, status
-from typing import List
+from typing import List, Optional
 import logging
 
 from app.schemas.consequence import ConsequenceRead
 from app.services.consequence_service import (
     get_all_consequences,
     get_consequence_by_id,
+    get_consequences_by_event,
     mark_consequence_as_executed
 )
 
@@ -16,10 +17,14 @@ router = APIRouter()
 
 
 @router.get("/", response_model=List[ConsequenceRead], status_code=status.HTTP_200_OK)
-async def list_consequences_route():
+async def list_consequences_route(event_id: Optional[str] = None):
     try:
-        logger.info("Fetching all consequences...")
-        consequences = await get_all_consequences()
+        if event_id:
+            logger.info(f"Fetching consequences for event {event_id}...")
+            consequences = await get_consequences_by_event(event_id)
+        else:
+            logger.info("Fetching all consequences...")
+            consequences = await get_all_consequences()
         return [
             ConsequenceRead(
                 id=str(c.id),
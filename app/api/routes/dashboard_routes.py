@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException
 from app.services.user_service import get_user_by_id
 from app.services.device_service import get_devices_by_user
 from app.services.sensor_service import get_sensors_by_device_id
+from app.services.device_twin import get_live_states
 import logging
 
 router = APIRouter()
@@ -15,6 +16,8 @@ async def get_user_dashboard(user_id: str):
             raise HTTPException(status_code=404, detail="User not found")
 
         devices = await get_devices_by_user(user_id)
+        # Latest readings of every device in one Redis round trip
+        live = await get_live_states([str(device.id) for device in devices])
         result = []
 
         for device in devices:
@@ -36,6 +39,8 @@ async def get_user_dashboard(user_id: str):
                 "type": device.type,
                 "location": device.location,
                 "is_active": device.is_active,
+                "state": device.state,
+                "live": live.get(str(device.id)),
                 "sensors": sensor_data
             })
 
@@ -1,6 +1,6 @@
 import logging
 from typing import List, Literal
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, status
 from pydantic import BaseModel
 
 from app.schemas.device import DeviceCreate, DeviceRead, DeviceUpdate
@@ -13,6 +13,7 @@ from app.services.device_service import (
     update_device,
     delete_device,
 )
+from app.services.device_twin import get_live_states
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -42,6 +43,22 @@ async def create_device_route(device_in: DeviceCreate):
         )
 
 
+@router.get("/live")
+async def get_live_devices_route(ids: List[str] = Query(...)):
+    """
+    Latest state and readings of each device in `ids`, served from the
+    Redis device twins without touching MongoDB.
+    """
+    try:
+        return await get_live_states(ids)
+    except Exception as e:
+        logger.error(f"Error fetching live device states: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error fetching live device states: {str(e)}"
+        )
+
+
 @router.get("/{device_id}", response_model=DeviceRead)
 async def get_device(device_id: str):
     try:
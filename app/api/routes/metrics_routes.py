@@ -0,0 +1,21 @@
+# routes/metrics_routes.py
+import logging
+
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from app.core.metrics import EVENT_QUEUE_DEPTH
+from app.queues.transport import event_transport
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus exposition of the request, reactor, rule and MongoDB metrics."""
+    # Queue depth lives in Redis, so it is read at scrape time rather than tracked
+    try:
+        EVENT_QUEUE_DEPTH.set(await event_transport.depth())
+    except Exception as e:
+        logger.error(f"Error reading the event queue depth: {e}")
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
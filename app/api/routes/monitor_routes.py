@@ -1,17 +1,37 @@
 # routes/monitor_routes.py
 import datetime
-from fastapi import APIRouter
+from typing import Literal, Optional, Union
+from fastapi import APIRouter, Response, status
+from app.constants import MONITOR_INGEST_MODE
 from app.queues.event_producer import enqueue_event
-from app.schemas.event import EventCreate, EventRead
-from app.services.event_service import log_event
+from app.queues.reactor_pool import reactor_pool
+from app.services.mqtt_publisher import mqtt_publisher
+from app.services.telemetry_bridge import telemetry_bridge
+from app.services.window_state import window_store
+from app.services.write_buffer import write_buffers
+from app.schemas.event import EventAccepted, EventCreate, EventRead
+from app.services.event_service import ingest_event, log_event
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-@router.post("/", response_model=EventRead)
-async def create_event(event: EventCreate):
+@router.post("/", response_model=Union[EventRead, EventAccepted])
+async def create_event(
+    event: EventCreate,
+    response: Response,
+    mode: Optional[Literal["sync", "async"]] = None,
+):
     logger.info(f"Monitoring event: {event.event_type}")
+    if (mode or MONITOR_INGEST_MODE) == "async":
+        # Rules are evaluated by the reactor worker; the caller polls for consequences
+        accepted = await ingest_event(event)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return EventAccepted(
+            id=str(accepted.id),
+            consequences_url=f"/api/consequences/?event_id={accepted.id}"
+        )
+
     saved_event = await log_event(event)
     return EventRead(
         id=str(saved_event.id),
@@ -30,4 +50,29 @@ async def trigger_event():
         "timestamp": datetime.datetime.utcnow().isoformat()
     }
     await enqueue_event(event)
-    return {"message": "Event queued", "event": event}
\ No newline at end of file
+    return {"message": "Event queued", "event": event}
+
+@router.get("/reactor")
+async def reactor_status():
+    """Per-worker queue depth and in-flight counts of the reactor pool."""
+    return reactor_pool.stats()
+
+@router.get("/buffers")
+async def write_buffer_status():
+    """Depth and flush counters of the event and consequence write-behind buffers."""
+    return [buffer.stats() for buffer in write_buffers]
+
+@router.get("/windows")
+async def window_status():
+    """Number of sliding-window series held for aggregate conditions, and evictions."""
+    return window_store.stats()
+
+@router.get("/mqtt")
+async def mqtt_status():
+    """Connection state of the MQTT command publisher, queue depth and in-flight messages."""
+    return mqtt_publisher.stats()
+
+@router.get("/telemetry")
+async def telemetry_status():
+    """Readings received by the MQTT telemetry bridge, ingested, invalid and dropped."""
+    return telemetry_bridge.stats()
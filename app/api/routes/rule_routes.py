@@ -27,6 +27,8 @@ async def create_rule_route(rule_in: RuleCreate):
             trigger_type=rule.trigger_type,
             condition=rule.condition,
             operator=rule.operator,
+            condition_tree=rule.condition_tree,
+            expression=rule.expression,
             target_device_id=rule.target_device_id,
             action=rule.action,
             created_at=rule.created_at
@@ -51,6 +53,8 @@ async def list_rules_route():
                 trigger_type=rule.trigger_type,
                 condition=rule.condition,
                 operator=rule.operator,
+                condition_tree=rule.condition_tree,
+                expression=rule.expression,
                 target_device_id=rule.target_device_id,
                 action=rule.action,
                 created_at=rule.created_at
@@ -1 +1,106 @@
+import os
+import socket
+
 EVENT_QUEUE = "event_queue"
+
+# Event transport between producers and the reactor: "list" (RPUSH/BLPOP on
+# EVENT_QUEUE) or "stream" (Redis Streams consumer group on EVENT_STREAM,
+# with acknowledgements and redelivery of entries left by crashed workers).
+# Entries still unacknowledged after EVENT_STREAM_MAX_DELIVERIES deliveries
+# are moved to EVENT_STREAM_DEAD_LETTER. Entries a replica holds are kept
+# from going idle every EVENT_STREAM_CLAIM_INTERVAL_SECONDS, which must stay
+# below EVENT_STREAM_CLAIM_IDLE_MS.
+EVENT_QUEUE_BACKEND = os.getenv("EVENT_QUEUE_BACKEND", "list")
+EVENT_STREAM = os.getenv("EVENT_STREAM", "event_stream")
+EVENT_STREAM_GROUP = os.getenv("EVENT_STREAM_GROUP", "reactor")
+EVENT_STREAM_CONSUMER = os.getenv("EVENT_STREAM_CONSUMER", f"{socket.gethostname()}-{os.getpid()}")
+EVENT_STREAM_MAXLEN = int(os.getenv("EVENT_STREAM_MAXLEN", "100000"))
+EVENT_STREAM_CLAIM_IDLE_MS = int(os.getenv("EVENT_STREAM_CLAIM_IDLE_MS", "60000"))
+EVENT_STREAM_CLAIM_INTERVAL_SECONDS = float(os.getenv("EVENT_STREAM_CLAIM_INTERVAL_SECONDS", "30"))
+EVENT_STREAM_MAX_DELIVERIES = int(os.getenv("EVENT_STREAM_MAX_DELIVERIES", "5"))
+EVENT_STREAM_DEAD_LETTER = os.getenv("EVENT_STREAM_DEAD_LETTER", f"{EVENT_STREAM}:dead")
+
+# Seconds before the in-process rule index is reloaded from MongoDB, so rule
+# writes made by other replicas are eventually picked up (0 disables reloads).
+RULE_INDEX_TTL_SECONDS = float(os.getenv("RULE_INDEX_TTL_SECONDS", "60"))
+
+# Events between re-orderings of compound rule conditions by observed leaf
+# selectivity, so AND/OR evaluation short-circuits as early as possible.
+RULE_REORDER_INTERVAL_EVENTS = int(os.getenv("RULE_REORDER_INTERVAL_EVENTS", "10000"))
+
+# Sliding windows behind aggregate conditions such as avg(temperature,300):
+# time buckets per window, (device, key, window) series kept in memory before
+# the least recently updated are evicted, and the Redis snapshot they are
+# restored from after a restart. Each replica snapshots to its own key, so
+# give replicas a stable WINDOW_SNAPSHOT_KEY if their hostnames change across
+# restarts. Windows changed since the last snapshot are written
+# WINDOW_SNAPSHOT_CHUNK at a time.
+WINDOW_BUCKETS = int(os.getenv("WINDOW_BUCKETS", "60"))
+WINDOW_MAX_SERIES = int(os.getenv("WINDOW_MAX_SERIES", "100000"))
+WINDOW_SNAPSHOT_KEY = os.getenv("WINDOW_SNAPSHOT_KEY", f"reactor:windows:{socket.gethostname()}")
+WINDOW_SNAPSHOT_CHUNK = int(os.getenv("WINDOW_SNAPSHOT_CHUNK", "1000"))
+WINDOW_SNAPSHOT_INTERVAL_SECONDS = float(os.getenv("WINDOW_SNAPSHOT_INTERVAL_SECONDS", "30"))
+
+# Reactor consumer: events drained from EVENT_QUEUE per batch, seconds BLPOP
+# waits for the first event, and the error backoff bounds.
+REACTOR_BATCH_SIZE = int(os.getenv("REACTOR_BATCH_SIZE", "100"))
+REACTOR_BLOCK_TIMEOUT_SECONDS = int(os.getenv("REACTOR_BLOCK_TIMEOUT_SECONDS", "5"))
+REACTOR_BACKOFF_MIN_SECONDS = float(os.getenv("REACTOR_BACKOFF_MIN_SECONDS", "0.1"))
+REACTOR_BACKOFF_MAX_SECONDS = float(os.getenv("REACTOR_BACKOFF_MAX_SECONDS", "5"))
+
+# Reactor worker pool: number of workers events are partitioned across by
+# device, and how many events each worker may hold before the feeder waits.
+REACTOR_WORKERS = int(os.getenv("REACTOR_WORKERS", "4"))
+REACTOR_WORKER_QUEUE_SIZE = int(os.getenv("REACTOR_WORKER_QUEUE_SIZE", "1000"))
+
+# Write-behind buffers for events and consequences: documents per insert_many,
+# seconds between periodic flushes, and the pending-document cap after which
+# writers wait for a flush instead of growing memory.
+WRITE_BUFFER_MAX_BATCH = int(os.getenv("WRITE_BUFFER_MAX_BATCH", "500"))
+WRITE_BUFFER_FLUSH_INTERVAL_SECONDS = float(os.getenv("WRITE_BUFFER_FLUSH_INTERVAL_SECONDS", "0.5"))
+WRITE_BUFFER_MAX_PENDING = int(os.getenv("WRITE_BUFFER_MAX_PENDING", "10000"))
+
+# Batches at least this large are matched with the NumPy evaluator instead of
+# per-event index lookups (crossover from benchmarks/vectorized_rules.py).
+REACTOR_VECTORIZE_MIN_BATCH = int(os.getenv("REACTOR_VECTORIZE_MIN_BATCH", "64"))
+
+# MQTT broker the device commands are published to, keepalive, the QoS 1
+# messages that may await a PUBACK at once, the publish queue bound after
+# which commands are dropped, and the reconnect backoff bounds.
+MQTT_BROKER = os.getenv("MQTT_BROKER", "mqtt")
+MQTT_PORT = int(os.getenv("MQTT_PORT", "1883"))
+MQTT_KEEPALIVE_SECONDS = int(os.getenv("MQTT_KEEPALIVE_SECONDS", "60"))
+MQTT_MAX_INFLIGHT = int(os.getenv("MQTT_MAX_INFLIGHT", "100"))
+MQTT_QUEUE_SIZE = int(os.getenv("MQTT_QUEUE_SIZE", "10000"))
+MQTT_RECONNECT_MIN_SECONDS = int(os.getenv("MQTT_RECONNECT_MIN_SECONDS", "1"))
+MQTT_RECONNECT_MAX_SECONDS = int(os.getenv("MQTT_RECONNECT_MAX_SECONDS", "60"))
+
+# MQTT telemetry bridge: topic filter sensors publish readings on (the "+"
+# level is the device id), subscription QoS, readings per bulk ingest,
+# seconds between flushes of a partial batch, and the number of received
+# readings held before new ones are dropped.
+MQTT_TELEMETRY_TOPIC = os.getenv("MQTT_TELEMETRY_TOPIC", "device/+/telemetry")
+MQTT_TELEMETRY_QOS = int(os.getenv("MQTT_TELEMETRY_QOS", "1"))
+MQTT_TELEMETRY_BATCH_SIZE = int(os.getenv("MQTT_TELEMETRY_BATCH_SIZE", "500"))
+MQTT_TELEMETRY_FLUSH_INTERVAL_SECONDS = float(os.getenv("MQTT_TELEMETRY_FLUSH_INTERVAL_SECONDS", "0.2"))
+MQTT_TELEMETRY_MAX_PENDING = int(os.getenv("MQTT_TELEMETRY_MAX_PENDING", "50000"))
+
+# Redis hash prefix of the per-device twin holding the latest reading of
+# each data key and the device state.
+DEVICE_TWIN_PREFIX = os.getenv("DEVICE_TWIN_PREFIX", "device:twin:")
+
+# Default for POST /api/monitor/: "sync" evaluates rules inside the request,
+# "async" only persists and enqueues the event and answers 202.
+MONITOR_INGEST_MODE = os.getenv("MONITOR_INGEST_MODE", "sync")
+
+# Per-request profiler: requests carrying this header and an admin bearer
+# token are run under cProfile, and the last PROFILER_MAX_PROFILES profiles
+# are kept in memory for GET /api/admin/profiles.
+PROFILER_HEADER = os.getenv("PROFILER_HEADER", "X-Profile")
+PROFILER_MAX_PROFILES = int(os.getenv("PROFILER_MAX_PROFILES", "20"))
+
+# MongoDB commands slower than this are logged with their filter shape and
+# listed by GET /api/admin/slow-queries, which keeps at most
+# MONGO_SLOW_QUERY_MAX_SHAPES distinct shapes.
+MONGO_SLOW_QUERY_MS = float(os.getenv("MONGO_SLOW_QUERY_MS", "100"))
+MONGO_SLOW_QUERY_MAX_SHAPES = int(os.getenv("MONGO_SLOW_QUERY_MAX_SHAPES", "1000"))
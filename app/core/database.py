@@ -10,6 +10,8 @@ from app.models.sensor import Sensor
 from app.models.event import Event
 from app.models.automation import Automation
 from app.models.action import Action
+from app.core.metrics import mongo_command_metrics
+from app.core.query_tracer import query_tracer
 
 import os
 from dotenv import load_dotenv
@@ -31,7 +33,8 @@ client: Optional[AsyncIOMotorClient] = None  # type: ignore
 
 async def init_db():
     global client
-    client = AsyncIOMotorClient(MONGODB_URI)  # MongoDB client initialization
+    # The listeners time every command the client sends, for /metrics, and charge it to the current request or reactor batch
+    client = AsyncIOMotorClient(MONGODB_URI, event_listeners=[mongo_command_metrics, query_tracer])  # MongoDB client initialization
     db = client[DATABASE_NAME]
 
     # Initialize Beanie models
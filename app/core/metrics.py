@@ -0,0 +1,126 @@
+# app/core/metrics.py
+"""
+Prometheus metrics of the backend, exposed on GET /metrics.
+
+Metrics are module-level prometheus_client objects: recording is a label
+lookup plus an in-place increment, so the request path, the reactor and the
+Mongo command listener can record unconditionally.
+"""
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+from pymongo import monitoring
+
+# Database round trips and in-memory steps are mostly well under the default buckets' 5ms floor
+SHORT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+# Ingest-to-action lag, up to a backlog of a minute
+LAG_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+)
+EVENT_QUEUE_DEPTH = Gauge("event_queue_depth", "Events waiting in the reactor's Redis queue")
+REACTOR_EVENTS = Counter("reactor_events_total", "Events handled by the reactor workers", ["outcome"])
+REACTOR_BATCH_SECONDS = Histogram("reactor_batch_duration_seconds", "Time a reactor worker spends on one batch")
+RULE_EVALUATIONS = Counter("rule_evaluations_total", "Events evaluated against the rule index")
+RULE_MATCHES = Counter("rule_matches_total", "Rules fired by evaluated events")
+MONGO_COMMAND_SECONDS = Histogram(
+    "mongo_command_duration_seconds",
+    "MongoDB command round trips",
+    ["command", "outcome"],
+    buckets=SHORT_BUCKETS,
+)
+MONGO_ROUND_TRIPS = Histogram(
+    "mongo_round_trips",
+    "MongoDB commands sent per HTTP request (by route template) or reactor batch",
+    ["source"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+
+# Stages of "sensor reading -> device action", from the ingested_at stamp of each event
+EVENT_QUEUE_WAIT_SECONDS = Histogram(
+    "reactor_queue_wait_seconds",
+    "Time from ingest until a reactor worker picks the event up",
+    buckets=LAG_BUCKETS,
+)
+RULE_EVALUATION_SECONDS = Histogram(
+    "reactor_rule_evaluation_seconds",
+    "Time matching a batch of events against the rules",
+    buckets=SHORT_BUCKETS,
+)
+ACTION_PERSIST_SECONDS = Histogram(
+    "reactor_persist_seconds",
+    "Time applying a batch's actions and recording its consequences",
+    buckets=SHORT_BUCKETS,
+)
+EVENT_TO_ACTION_SECONDS = Histogram(
+    "event_to_action_seconds",
+    "Time from ingest until the actions an event triggered were applied",
+    ["path"],
+    buckets=LAG_BUCKETS,
+)
+
+# Children for label values known up front, so the hot paths skip the lookup
+REACTOR_PROCESSED = REACTOR_EVENTS.labels("processed")
+REACTOR_FAILED = REACTOR_EVENTS.labels("failed")
+EVENT_TO_ACTION_REACTOR = EVENT_TO_ACTION_SECONDS.labels("reactor")
+EVENT_TO_ACTION_SYNC = EVENT_TO_ACTION_SECONDS.labels("sync")
+
+# Requests no route matched share one label instead of one series per URL
+UNMATCHED_ROUTE = "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing HTTP requests by method, route template and status.
+
+    Plain ASGI rather than BaseHTTPMiddleware, which would add a task and a
+    stream per request. The route template is read from the scope after the
+    router matched it, so `/api/devices/{device_id}` is one series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"],
+                route.path if route is not None else UNMATCHED_ROUTE,
+                status,
+            ).observe(time.perf_counter() - start)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Records the duration of every command sent by the Motor client it is registered on."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_SECONDS.labels(event.command_name, "succeeded").observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        MONGO_COMMAND_SECONDS.labels(event.command_name, "failed").observe(event.duration_micros / 1e6)
+
+
+mongo_command_metrics = MongoCommandMetrics()
+
@@ -0,0 +1,163 @@
+# app/core/profiler.py
+"""
+Opt-in cProfile of single requests, for admins.
+
+A request carrying the PROFILER_HEADER header and an admin bearer token is
+run under cProfile; the profile is kept in a bounded in-memory ring and the
+response names it in an X-Profile-Id header, to be downloaded from
+GET /api/admin/profiles/{profile_id}. Requests without the header go
+straight through.
+"""
+import cProfile
+import io
+import itertools
+import logging
+import marshal
+import pstats
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, List, Optional
+
+from starlette.requests import Request
+
+from app.constants import PROFILER_HEADER, PROFILER_MAX_PROFILES
+from app.core.security import admin_only, get_current_active_user, get_current_user, oauth2_scheme
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER_KEY = PROFILER_HEADER.lower().encode("latin-1")
+
+
+class RequestProfile:
+    def __init__(self, profile_id: int, method: str, path: str, user: str, status: int, seconds: float, stats: dict):
+        self.profile_id = profile_id
+        self.method = method
+        self.path = path
+        self.user = user
+        self.status = status
+        self.seconds = seconds
+        self.stats = stats
+        self.created_at = datetime.utcnow()
+
+    def summary(self) -> dict:
+        return {
+            "profile_id": self.profile_id,
+            "method": self.method,
+            "path": self.path,
+            "user": self.user,
+            "status": self.status,
+            "seconds": round(self.seconds, 6),
+            "created_at": self.created_at.isoformat(),
+        }
+
+    def dump(self) -> bytes:
+        """The profile in the format of pstats.Stats.dump_stats, for pstats, snakeviz and the like."""
+        return marshal.dumps(self.stats)
+
+    def text(self, sort: str = "cumulative", limit: int = 50) -> str:
+        output = io.StringIO()
+        stats = pstats.Stats(stream=output)
+        stats.stats = self.stats
+        stats.get_top_level_stats()
+        stats.sort_stats(sort).print_stats(limit)
+        return output.getvalue()
+
+
+class ProfileStore:
+    """The last `size` profiles; older ones are dropped as new ones arrive."""
+
+    def __init__(self, size: int = PROFILER_MAX_PROFILES):
+        self._profiles: Deque[RequestProfile] = deque(maxlen=size)
+        self._ids = itertools.count(1)
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def add(self, profile: RequestProfile) -> None:
+        self._profiles.append(profile)
+
+    def get(self, profile_id: int) -> Optional[RequestProfile]:
+        for profile in self._profiles:
+            if profile.profile_id == profile_id:
+                return profile
+        return None
+
+    def list(self) -> List[RequestProfile]:
+        return list(reversed(self._profiles))
+
+    def clear(self) -> None:
+        self._profiles.clear()
+
+
+profile_store = ProfileStore()
+
+
+async def authorize(scope) -> Optional[str]:
+    """Email of the admin the request's bearer token belongs to, or None."""
+    try:
+        token = await oauth2_scheme(Request(scope))
+        user = await admin_only(current_user=await get_current_active_user(await get_current_user(token)))
+        return user.email
+    except Exception as e:
+        # Not being able to check the token (e.g. MongoDB down) only means the request is not profiled
+        logger.debug(f"Profiler authorization failed: {e!r}")
+        return None
+
+
+class ProfilerMiddleware:
+    """
+    ASGI middleware running admin requests that ask for it under cProfile.
+
+    cProfile sees everything the event loop runs meanwhile, so other
+    requests served concurrently show up in the profile too; only one
+    request is profiled at a time and others asking meanwhile are served
+    unprofiled.
+    """
+
+    def __init__(self, app, store: ProfileStore = profile_store):
+        self.app = app
+        self.store = store
+        self.busy = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not any(name == PROFILE_HEADER_KEY for name, _ in scope["headers"]):
+            await self.app(scope, receive, send)
+            return
+
+        user = await authorize(scope)
+        if user is None:
+            logger.warning(f"Ignoring {PROFILER_HEADER} on {scope['path']}: not an admin")
+            await self.app(scope, receive, send)
+            return
+        if self.busy:
+            logger.warning(f"Not profiling {scope['path']}: another request is being profiled")
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = self.store.next_id()
+        status = 500
+
+        async def send_with_profile_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", str(profile_id).encode())]
+            await send(message)
+
+        self.busy = True
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profiler.disable()
+            seconds = time.perf_counter() - start
+            self.busy = False
+            profiler.create_stats()
+            self.store.add(RequestProfile(profile_id, scope["method"], scope["path"], user, status, seconds, profiler.stats))
+            logger.info(f"Profiled {scope['method']} {scope['path']} for {user} as profile {profile_id} ({seconds:.3f}s)")
@@ -0,0 +1,203 @@
+# app/core/query_tracer.py
+"""
+MongoDB command tracing: round trips per request or reactor batch, and slow query shapes.
+
+The HTTP middleware and the reactor workers put a QueryTrace in a context
+variable; Motor copies the context into the thread running each command,
+so the command listener registered in init_db can charge the command to
+it. Commands slower than MONGO_SLOW_QUERY_MS are logged with their filter
+shape (the filter with every value replaced by "?") and aggregated per
+shape for GET /api/admin/slow-queries.
+"""
+import json
+import logging
+import threading
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+from app.constants import MONGO_SLOW_QUERY_MAX_SHAPES, MONGO_SLOW_QUERY_MS
+from app.core.metrics import MONGO_ROUND_TRIPS
+
+logger = logging.getLogger(__name__)
+
+# Commands no QueryTrace is active for, e.g. the write buffers' periodic flushes
+UNTRACED = "background"
+
+# (collection, command name, filter shape)
+ShapeKey = Tuple[str, str, str]
+
+
+class QueryTrace:
+    """The MongoDB commands of one request or reactor batch."""
+
+    __slots__ = ("_label", "_scope", "round_trips", "seconds")
+
+    def __init__(self, label: Optional[str] = None, scope: Optional[dict] = None):
+        self._label = label
+        self._scope = scope
+        self.round_trips = 0
+        self.seconds = 0.0
+
+    @property
+    def label(self) -> str:
+        if self._label is not None:
+            return self._label
+        # The route template is known once the router matched, which happens before any query
+        route = self._scope.get("route")
+        return f"{self._scope['method']} {route.path if route is not None else self._scope['path']}"
+
+
+current_query_trace: ContextVar[Optional[QueryTrace]] = ContextVar("current_query_trace", default=None)
+
+
+def query_shape(value: Any) -> Any:
+    """`value` with every literal replaced by "?", keeping field names, operators and pipeline stages."""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)) and value and all(isinstance(item, dict) for item in value):
+        # $and / $or branches and aggregation stages; a list of values ($in) is one "?"
+        return [query_shape(item) for item in value]
+    return "?"
+
+
+def command_filter(command_name: str, command: dict) -> Any:
+    """The part of a command that selects documents, if it has one."""
+    if command_name == "aggregate":
+        return command.get("pipeline")
+    if command_name in ("update", "delete"):
+        statements = command.get("updates" if command_name == "update" else "deletes") or [{}]
+        return statements[0].get("q")
+    return command.get("filter", command.get("query"))
+
+
+def command_collection(command_name: str, command: dict, database_name: str) -> str:
+    """
+    The collection a command runs on. getMore carries the cursor id under its
+    name and the collection under "collection"; commands without a collection
+    (e.g. aggregate: 1 on a database) are charged to the database.
+    """
+    for value in (command.get(command_name), command.get("collection")):
+        if isinstance(value, str):
+            return value
+    return database_name
+
+
+class SlowQueryStats:
+    """Slow commands aggregated per shape; at most `max_shapes` shapes are kept."""
+
+    def __init__(self, max_shapes: int = MONGO_SLOW_QUERY_MAX_SHAPES):
+        self.max_shapes = max_shapes
+        self._shapes: Dict[ShapeKey, dict] = {}
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def record(self, key: ShapeKey, seconds: float, source: str) -> None:
+        # Listeners run in Motor's executor threads
+        with self._lock:
+            entry = self._shapes.get(key)
+            if entry is None:
+                if len(self._shapes) >= self.max_shapes:
+                    self.dropped += 1
+                    return
+                entry = self._shapes[key] = {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+            entry["count"] += 1
+            entry["total_seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+            entry["last_source"] = source
+
+    def top(self, limit: int = 20) -> List[dict]:
+        """Shapes by total time spent in their slow commands."""
+        with self._lock:
+            items = sorted(self._shapes.items(), key=lambda item: item[1]["total_seconds"], reverse=True)[:limit]
+        return [
+            {
+                "collection": collection,
+                "command": command_name,
+                "shape": shape,
+                "count": entry["count"],
+                "total_seconds": round(entry["total_seconds"], 6),
+                "avg_seconds": round(entry["total_seconds"] / entry["count"], 6),
+                "max_seconds": round(entry["max_seconds"], 6),
+                "last_source": entry["last_source"],
+            }
+            for (collection, command_name, shape), entry in items
+        ]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._shapes.clear()
+            self.dropped = 0
+
+
+slow_queries = SlowQueryStats()
+
+
+class QueryTracer(monitoring.CommandListener):
+    """
+    Charges every command to the active QueryTrace and reports slow ones.
+
+    started() only keeps a reference to the command; its shape is computed
+    for the commands that turn out to be slow.
+    """
+
+    def __init__(self, threshold_ms: float = MONGO_SLOW_QUERY_MS, stats: SlowQueryStats = slow_queries):
+        self.threshold_micros = threshold_ms * 1000
+        self.stats = stats
+        self._commands: Dict[Tuple[Any, int], dict] = {}
+
+    def started(self, event):
+        trace = current_query_trace.get()
+        if trace is not None:
+            trace.round_trips += 1
+        self._commands[(event.connection_id, event.request_id)] = event.command
+
+    def succeeded(self, event):
+        self._finished(event)
+
+    def failed(self, event):
+        self._finished(event)
+
+    def _finished(self, event):
+        command = self._commands.pop((event.connection_id, event.request_id), None)
+        trace = current_query_trace.get()
+        if trace is not None:
+            trace.seconds += event.duration_micros / 1e6
+        if event.duration_micros < self.threshold_micros or command is None:
+            return
+
+        collection = command_collection(event.command_name, command, event.database_name)
+        shape = json.dumps(query_shape(command_filter(event.command_name, command)), sort_keys=True)
+        source = trace.label if trace is not None else UNTRACED
+        seconds = event.duration_micros / 1e6
+        self.stats.record((collection, event.command_name, shape), seconds, source)
+        logger.warning(
+            f"🐢 Slow MongoDB {event.command_name} on {collection} took {seconds * 1e3:.1f}ms "
+            f"for {source}: {shape}"
+        )
+
+
+query_tracer = QueryTracer()
+
+
+class QueryTraceMiddleware:
+    """ASGI middleware giving each HTTP request a QueryTrace and recording its round trips."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = QueryTrace(scope=scope)
+        token = current_query_trace.set(trace)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_query_trace.reset(token)
+            route = scope.get("route")
+            if route is not None:
+                MONGO_ROUND_TRIPS.labels(route.path).observe(trace.round_trips)
@@ -80,3 +80,6 @@ def require_roles(required_roles: list):
         )
     
     return role_checker
+
+# Shared by the admin routes and the request profiler
+admin_only = require_roles(["admin"])
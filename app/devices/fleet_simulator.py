@@ -0,0 +1,353 @@
+"""
+Simulate a fleet of virtual devices in one asyncio process.
+
+Sensors publish readings at their own rate, over MQTT (to
+device/<id>/telemetry, picked up by the telemetry bridge) or over HTTP
+(POST /api/monitor/). Every device also listens on device/<id>/control
+and records the command round-trip latency: the time between its last
+reading and a command addressed to it. For that measure, the rules under
+test should target the device that produced the reading. Device ids are
+ObjectId-shaped, as the action dispatcher only commands such ids; pass
+--device-ids with the ids of devices registered in MongoDB to have their
+states updated as well.
+
+    python -m app.devices.fleet_simulator --devices 10000 --rate 1 --duration 60
+    python -m app.devices.fleet_simulator --transport http --url http://localhost:8000 --devices 500
+    python -m app.devices.fleet_simulator --device-ids registered_ids.txt
+"""
+import abc
+import argparse
+import asyncio
+import heapq
+import json
+import random
+import time
+from typing import Dict, List, Optional
+
+import httpx
+import paho.mqtt.client as mqtt
+
+from app.constants import MQTT_BROKER, MQTT_PORT
+from app.services.topic_trie import TopicTrie
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class VirtualDevice(abc.ABC):
+    """A device publishing `rate` readings per second, with a random phase so a fleet does not fire in lockstep."""
+
+    event_type = "reading"
+
+    def __init__(self, device_id: str, rate: float, rng: random.Random):
+        self.device_id = device_id
+        self.interval = 1.0 / rate
+        self.rng = rng
+        self.state = "off"
+        self.last_sent: Optional[float] = None
+
+    def first_due(self, now: float) -> float:
+        return now + self.rng.uniform(0, self.interval)
+
+    def next_due(self, now: float) -> float:
+        return now + self.interval
+
+    @abc.abstractmethod
+    def read(self) -> Dict[str, float]:
+        """The data of the next reading."""
+
+    def command(self, payload: str) -> None:
+        if payload in ("on", "off"):
+            self.state = payload
+
+
+class TemperatureSensor(VirtualDevice):
+    """Random walk around `base` with `drift` degrees of noise per reading, pulled back towards `base`."""
+
+    event_type = "temperature_change"
+
+    def __init__(self, device_id: str, rate: float, rng: random.Random, base: float = 22.0, drift: float = 0.3):
+        super().__init__(device_id, rate, rng)
+        self.base = base
+        self.drift = drift
+        self.value = base + rng.uniform(-2, 2)
+
+    def read(self) -> Dict[str, float]:
+        self.value += self.rng.gauss(0, self.drift) + 0.05 * (self.base - self.value)
+        return {"temperature": round(self.value, 2)}
+
+
+class MotionSensor(VirtualDevice):
+    """
+    Quiet most of the time; a burst starts with `burst_probability` per
+    reading and reports motion at `burst_rate` times the base rate for
+    about `burst_length` readings.
+    """
+
+    event_type = "motion_detected"
+
+    def __init__(
+        self,
+        device_id: str,
+        rate: float,
+        rng: random.Random,
+        burst_probability: float = 0.05,
+        burst_length: int = 10,
+        burst_rate: float = 5.0,
+    ):
+        super().__init__(device_id, rate, rng)
+        self.burst_probability = burst_probability
+        self.burst_length = burst_length
+        self.burst_rate = burst_rate
+        self.remaining = 0
+
+    def next_due(self, now: float) -> float:
+        return now + (self.interval / self.burst_rate if self.remaining else self.interval)
+
+    def read(self) -> Dict[str, float]:
+        if self.remaining:
+            self.remaining -= 1
+        elif self.rng.random() < self.burst_probability:
+            self.remaining = max(1, int(self.rng.expovariate(1 / self.burst_length)))
+        return {"motion": 1.0 if self.remaining else 0.0}
+
+
+DEVICE_KINDS = {"temperature": TemperatureSensor, "motion": MotionSensor}
+
+
+def make_fleet(
+    count: int, rate: float, mix: Dict[str, float], seed: int = 1, device_ids: Optional[List[str]] = None,
+) -> List[VirtualDevice]:
+    """
+    `count` devices split across DEVICE_KINDS by the weights in `mix`, with
+    the ids in `device_ids` (which must hold at least `count`) or random
+    24-hex-digit ids like a MongoDB ObjectId.
+    """
+    rng = random.Random(seed)
+    if device_ids is None:
+        device_ids = [f"{rng.getrandbits(96):024x}" for _ in range(count)]
+    elif len(device_ids) < count:
+        raise ValueError(f"{count} devices need as many ids, got {len(device_ids)}")
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    return [
+        DEVICE_KINDS[rng.choices(kinds, weights)[0]](device_ids[i], rate, random.Random(rng.random()))
+        for i in range(count)
+    ]
+
+
+class FleetStats:
+    def __init__(self):
+        self.sent = 0
+        self.errors = 0
+        self.commands = 0
+        self.send_latencies: List[float] = []
+        self.command_latencies: List[float] = []
+
+    def summary(self, elapsed: float) -> dict:
+        as_ms = lambda seconds: round(seconds * 1e3, 2) if seconds is not None else None
+        return {
+            "sent": self.sent,
+            "sent_per_second": round(self.sent / elapsed, 1) if elapsed else 0.0,
+            "errors": self.errors,
+            "send_p50_ms": as_ms(percentile(self.send_latencies, 0.5)),
+            "send_p99_ms": as_ms(percentile(self.send_latencies, 0.99)),
+            "commands": self.commands,
+            "command_p50_ms": as_ms(percentile(self.command_latencies, 0.5)),
+            "command_p99_ms": as_ms(percentile(self.command_latencies, 0.99)),
+        }
+
+
+class FleetSimulator:
+    """
+    Drives every device from one scheduler: a heap ordered by each device's
+    next reading, so 10k+ devices cost one task rather than one per device.
+    Readings due together are sent as one batch.
+    """
+
+    def __init__(self, devices: List[VirtualDevice], max_batch: int = 500, clock=time.monotonic):
+        self.devices = {device.device_id: device for device in devices}
+        self.max_batch = max_batch
+        self.clock = clock
+        self.stats = FleetStats()
+        self.router = TopicTrie()
+        self.router.add("device/+/control", self.on_control)
+
+    def on_control(self, topic: str, payload) -> None:
+        device = self.devices.get(topic.split("/")[1])
+        if device is None:
+            return
+        device.command(payload.decode() if isinstance(payload, bytes) else payload)
+        self.stats.commands += 1
+        if device.last_sent is not None:
+            self.stats.command_latencies.append(self.clock() - device.last_sent)
+
+    async def run(self, send, duration: float, sleep=asyncio.sleep) -> float:
+        """Send readings with `send(batch)` for `duration` seconds; returns the elapsed seconds."""
+        clock = self.clock
+        start = clock()
+        schedule = [(device.first_due(start), device.device_id) for device in self.devices.values()]
+        heapq.heapify(schedule)
+        while schedule:
+            due, device_id = schedule[0]
+            if due - start >= duration:
+                break
+            now = clock()
+            if due > now:
+                await sleep(due - now)
+                continue
+            batch = []
+            while schedule and schedule[0][0] <= now and len(batch) < self.max_batch:
+                due, device_id = heapq.heappop(schedule)
+                device = self.devices[device_id]
+                batch.append((device, device.read()))
+                heapq.heappush(schedule, (device.next_due(due), device_id))
+            sent_at = clock()
+            for device, _ in batch:
+                device.last_sent = sent_at
+            await send(batch)
+        return clock() - start
+
+
+class MqttSender:
+    """Publishes readings to device/<id>/telemetry and routes control messages back to the fleet."""
+
+    def __init__(self, stats: FleetStats, host: str = MQTT_BROKER, port: int = MQTT_PORT, qos: int = 0):
+        self.stats = stats
+        self.qos = qos
+        self.client = mqtt.Client()
+        self.host = host
+        self.port = port
+
+    def start(self, router: TopicTrie, loop: asyncio.AbstractEventLoop):
+        def on_connect(client, userdata, flags, rc):
+            for topic_filter in router.filters():
+                client.subscribe(topic_filter)
+
+        def on_message(client, userdata, message):
+            loop.call_soon_threadsafe(router.dispatch, message.topic, message.payload)
+
+        self.client.on_connect = on_connect
+        self.client.on_message = on_message
+        self.client.connect(self.host, self.port, 60)
+        self.client.loop_start()
+
+    def stop(self):
+        self.client.disconnect()
+        self.client.loop_stop()
+
+    async def __call__(self, batch):
+        for device, values in batch:
+            payload = json.dumps({"event_type": device.event_type, "data": values})
+            info = self.client.publish(f"device/{device.device_id}/telemetry", payload, qos=self.qos)
+            if info.rc == mqtt.MQTT_ERR_SUCCESS:
+                self.stats.sent += 1
+            else:
+                self.stats.errors += 1
+
+
+class HttpSender:
+    """POSTs readings to /api/monitor/, at most `concurrency` requests at a time."""
+
+    def __init__(self, stats: FleetStats, client: httpx.AsyncClient, mode: Optional[str] = None, concurrency: int = 100):
+        self.stats = stats
+        self.client = client
+        self.params = {"mode": mode} if mode else None
+        self.slots = asyncio.Semaphore(concurrency)
+        self.tasks = set()
+
+    async def post(self, device: VirtualDevice, values: Dict[str, float]):
+        try:
+            start = time.monotonic()
+            response = await self.client.post(
+                "/api/monitor/",
+                params=self.params,
+                json={"device_id": device.device_id, "event_type": device.event_type, "data": values},
+            )
+            if response.status_code < 400:
+                self.stats.sent += 1
+                self.stats.send_latencies.append(time.monotonic() - start)
+            else:
+                self.stats.errors += 1
+        except httpx.HTTPError:
+            self.stats.errors += 1
+        finally:
+            self.slots.release()
+
+    async def __call__(self, batch):
+        for device, values in batch:
+            # Waiting for a slot paces the fleet to what the server sustains
+            await self.slots.acquire()
+            task = asyncio.create_task(self.post(device, values))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def drain(self):
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+
+async def main_async(args) -> dict:
+    mix = dict(kind.split("=") for kind in args.mix.split(","))
+    device_ids = None
+    if args.device_ids:
+        with open(args.device_ids) as f:
+            device_ids = [line.strip() for line in f if line.strip()]
+    devices = make_fleet(
+        args.devices, args.rate, {kind: float(weight) for kind, weight in mix.items()}, args.seed, device_ids,
+    )
+    simulator = FleetSimulator(devices)
+    client = None
+    mqtt_sender = None
+    if args.transport == "http":
+        client = httpx.AsyncClient(base_url=args.url, timeout=30)
+        sender = HttpSender(simulator.stats, client, mode=args.mode, concurrency=args.concurrency)
+    else:
+        sender = mqtt_sender = MqttSender(simulator.stats, args.broker, args.port, args.qos)
+
+    # Commands are received over MQTT whatever the readings are sent with
+    if mqtt_sender is None and not args.no_control:
+        mqtt_sender = MqttSender(simulator.stats, args.broker, args.port)
+    if mqtt_sender is not None:
+        mqtt_sender.start(simulator.router, asyncio.get_running_loop())
+    try:
+        elapsed = await simulator.run(sender, args.duration)
+        if client is not None:
+            await sender.drain()
+            await client.aclose()
+        # Leave in-flight commands a moment to arrive
+        await asyncio.sleep(args.settle)
+    finally:
+        if mqtt_sender is not None:
+            mqtt_sender.stop()
+    return simulator.stats.summary(elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=1.0, help="readings per second per device")
+    parser.add_argument("--mix", default="temperature=0.7,motion=0.3", help="weights of each device kind")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to run")
+    parser.add_argument("--transport", choices=["mqtt", "http"], default="mqtt")
+    parser.add_argument("--broker", default=MQTT_BROKER)
+    parser.add_argument("--port", type=int, default=MQTT_PORT)
+    parser.add_argument("--qos", type=int, default=0, help="QoS of MQTT telemetry")
+    parser.add_argument("--url", default="http://localhost:8000", help="backend base URL for --transport http")
+    parser.add_argument("--mode", choices=["sync", "async"], help="POST /api/monitor/ ingest mode")
+    parser.add_argument("--concurrency", type=int, default=100, help="concurrent HTTP requests")
+    parser.add_argument("--no-control", action="store_true", help="do not subscribe to control topics")
+    parser.add_argument("--settle", type=float, default=2.0, help="seconds to wait for commands after the run")
+    parser.add_argument("--device-ids", help="file with one registered device id per line, used instead of random ids")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    summary = asyncio.run(main_async(args))
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
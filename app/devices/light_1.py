@@ -1,14 +1,8 @@
 import paho.mqtt.client as mqtt
 
-def on_connect(client, userdata, flags, rc):
-    if rc == 0:
-        print("💡 light_1 connected to MQTT Broker")
-        client.subscribe("device/light_1/control")
-    else:
-        print("❌ light_1 failed to connect, return code", rc)
+from app.services.topic_trie import TopicTrie
 
-def on_message(client, userdata, msg):
-    command = msg.payload.decode()
+def handle_command(topic, command):
     if command == "on":
         print("💡 light_1 turned ON")
     elif command == "off":
@@ -16,9 +10,28 @@ def on_message(client, userdata, msg):
     else:
         print(f"⚠️ Unknown command for light_1: {command}")
 
-client = mqtt.Client()
-client.on_connect = on_connect
-client.on_message = on_message
+router = TopicTrie()
+router.add("device/light_1/control", handle_command)
+
+def on_connect(client, userdata, flags, rc):
+    if rc == 0:
+        print("💡 light_1 connected to MQTT Broker")
+        for topic_filter in router.filters():
+            client.subscribe(topic_filter)
+    else:
+        print("❌ light_1 failed to connect, return code", rc)
+
+def on_message(client, userdata, msg):
+    router.dispatch(msg.topic, msg.payload.decode())
+
+def main():
+    client = mqtt.Client()
+    client.on_connect = on_connect
+    client.on_message = on_message
+
+    client.connect("mqtt", 1883, 60)
+    client.loop_forever()
+
 
-client.connect("mqtt", 1883, 60)
-client.loop_forever()
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,18 @@
-import paho.mqtt.publish as publish
+import asyncio
 
-publish.single(
-    topic="device/light_1/control",
-    payload="on",
-    hostname="mqtt",  # this matches your Docker service name
-    port=1883
-)
+from app.services.mqtt_publisher import control_topic, mqtt_publisher
 
-print("📤 Sent 'on' command to light_1")
+
+async def main():
+    # Same persistent publisher as the backend; stop() waits for the PUBACK
+    mqtt_publisher.start()
+    mqtt_publisher.publish(control_topic("light_1"), "on")
+    await mqtt_publisher.stop()
+    if mqtt_publisher.acked:
+        print("📤 Sent 'on' command to light_1")
+    else:
+        print("❌ Command to light_1 was not acknowledged by the broker")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
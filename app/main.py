@@ -1,9 +1,18 @@
 from fastapi import FastAPI
 from app.core.database import init_db  # Import the init_db function
 from app.api.routes import api_router  # Import the API router
+from app.api.routes.metrics_routes import router as metrics_router
 import os
 import asyncio
-from app.queues.reactor_worker import consume_events
+from app.core import database
+from app.core.metrics import MetricsMiddleware
+from app.core.profiler import ProfilerMiddleware
+from app.core.query_tracer import QueryTraceMiddleware
+from app.queues.reactor_pool import reactor_pool
+from app.services.mqtt_publisher import mqtt_publisher
+from app.services.telemetry_bridge import telemetry_bridge
+from app.services.window_state import window_store
+from app.services.write_buffer import write_buffers
 from fastapi.middleware.cors import CORSMiddleware
 
 app = FastAPI()
@@ -16,21 +25,38 @@ app.add_middleware(
     allow_methods=["*"],  # Allow all HTTP methods (GET, POST, etc.)
     allow_headers=["*"],  # Allow all headers
 )
+app.add_middleware(QueryTraceMiddleware)
+app.add_middleware(ProfilerMiddleware)
+# Added last so it is outermost and times the whole stack
+app.add_middleware(MetricsMiddleware)
 
 
 app.include_router(api_router, prefix="/api", tags=["API"])
+app.include_router(metrics_router, tags=["Metrics"])
 
 @app.on_event("startup")
 async def startup_db_client():
     await init_db()  # Initialize the database connection via Beanie
     print("Connected to MongoDB!")
-    asyncio.create_task(consume_events())
+    for buffer in write_buffers:
+        buffer.start()
+    await window_store.start()
+    mqtt_publisher.start()
+    reactor_pool.start()
+    telemetry_bridge.start()
     print("Event Consumer Started!")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    if app.mongodb_client:
-        app.mongodb_client.close()
+    # The bridge flushes its last readings into the buffers and queue, so it stops first
+    await telemetry_bridge.stop()
+    await reactor_pool.stop()
+    await mqtt_publisher.stop()
+    await window_store.stop()
+    for buffer in write_buffers:
+        await buffer.stop()
+    if database.client:
+        database.client.close()
 
 @app.get("/")
 async def root():
@@ -12,8 +12,11 @@ class Consequence(Document):
     status: str = "pending"  # or "executed"
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     executed_at: Optional[datetime] = None
+    # Seconds from the triggering event's ingest to executed_at, when the event was stamped
+    latency_seconds: Optional[float] = None
     class Settings:
         name = "consequences"
+        indexes = ["event_id"]
 
 
     class Config:
@@ -25,6 +28,7 @@ class Consequence(Document):
                 "action": "turn_on",
                 "device_id": "device-123",
                 "status": "pending",
-                "executed_at": "2025-04-24T17:00:00Z"
+                "executed_at": "2025-04-24T17:00:00Z",
+                "latency_seconds": 0.042
             }
         }
\ No newline at end of file
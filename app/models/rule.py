@@ -1,14 +1,46 @@
 # models/rule.py
 from beanie import Document
-from pydantic import Field
-from typing import Dict
+from pydantic import BaseModel, Field, model_validator
+from typing import Dict, List, Literal, Optional, Union
 from datetime import datetime
 
+ComparisonOperator = Literal[">", "<", "==", ">=", "<="]
+
+
+class ConditionLeaf(BaseModel):
+    key: str  # e.g., "temperature"
+    operator: ComparisonOperator
+    value: float
+    # Compare an aggregate of the device's recent values instead of the event value,
+    # e.g. aggregate="avg", window_seconds=300 for the 5 minute average
+    aggregate: Optional[Literal["avg", "sum", "min", "max", "count"]] = None
+    window_seconds: Optional[float] = Field(default=None, gt=0)
+
+    @model_validator(mode="after")
+    def check_window(self):
+        if (self.aggregate is None) != (self.window_seconds is None):
+            raise ValueError("aggregate and window_seconds must be given together")
+        return self
+
+
+class ConditionGroup(BaseModel):
+    op: Literal["and", "or"]
+    conditions: List[Union["ConditionGroup", ConditionLeaf]] = Field(min_length=1)
+
+
+ConditionNode = Union[ConditionGroup, ConditionLeaf]
+
+
 class Rule(Document):
     name: str
     trigger_type: str  # e.g., "temperature_change"
-    condition: Dict[str, float]  # e.g., {"temperature": 28.0}
-    operator: str  # ">", "<", "=="
+    # Legacy form: one operator applied to every key, the rule fires when any key matches
+    condition: Dict[str, float] = Field(default_factory=dict)  # e.g., {"temperature": 28.0}
+    operator: Optional[str] = None  # ">", "<", "=="
+    # Boolean condition tree with per-leaf operators; takes precedence over condition/operator
+    condition_tree: Optional[ConditionNode] = None
+    # Source of condition_tree when written as an expression, e.g. "temperature > 28 and humidity < 40"
+    expression: Optional[str] = None
     target_device_id: str
     action: str  # e.g., "turn_on"
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -20,11 +52,16 @@ class Rule(Document):
         arbitrary_types_allowed = True
         json_schema_extra = {
             "example": {
-                "name": "Hot temp triggers AC",
+                "name": "Hot and dry triggers humidifier",
                 "trigger_type": "temperature_change",
-                "condition": {"temperature": 28.0},
-                "operator": ">",
+                "condition_tree": {
+                    "op": "and",
+                    "conditions": [
+                        {"key": "temperature", "operator": ">", "value": 28.0},
+                        {"key": "humidity", "operator": "<", "value": 40.0}
+                    ]
+                },
                 "target_device_id": "device-123",
                 "action": "turn_on"
             }
-        }
\ No newline at end of file
+        }
@@ -1,14 +1,38 @@
-from app.core.redis_client import redis_client
-from app.constants import EVENT_QUEUE
-import json
+import time
+from typing import List, Optional
+from app.queues.transport import event_transport
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Bookkeeping of a queue event, nested so it is not mistaken for a reading
+# by the rule engine or the device twins
+META_KEY = "meta"
+
+def stamp_ingest(event: dict) -> dict:
+    """
+    Stamp the event with the time it entered the system, unless its producer already did.
+
+    Epoch seconds rather than a monotonic clock: the reactor consuming the
+    queue may run in another process, where a monotonic reading means nothing.
+    """
+    event.setdefault(META_KEY, {}).setdefault("ingested_at", time.time())
+    return event
+
+def ingested_at(event: dict) -> Optional[float]:
+    meta = event.get(META_KEY)
+    return meta.get("ingested_at") if isinstance(meta, dict) else None
+
 async def enqueue_event(event: dict):
     try:
-        await redis_client.rpush(EVENT_QUEUE, json.dumps(event))
+        await event_transport.push([stamp_ingest(event)])
         logger.info(f"✅ Event queued: {event}")
     except Exception as e:
         logger.error(f"❌ Failed to queue event: {e}")
-        
\ No newline at end of file
+
+async def enqueue_events(events: List[dict]):
+    try:
+        await event_transport.push([stamp_ingest(event) for event in events])
+        logger.info(f"✅ {len(events)} event(s) queued")
+    except Exception as e:
+        logger.error(f"❌ Failed to queue {len(events)} event(s): {e}")
@@ -0,0 +1,166 @@
+import asyncio
+import itertools
+import logging
+import time
+import zlib
+from typing import List, Optional
+
+from app.constants import (
+    EVENT_STREAM_CLAIM_INTERVAL_SECONDS,
+    REACTOR_BATCH_SIZE,
+    REACTOR_WORKERS,
+    REACTOR_WORKER_QUEUE_SIZE,
+)
+from app.core.metrics import MONGO_ROUND_TRIPS, REACTOR_BATCH_SECONDS, REACTOR_FAILED, REACTOR_PROCESSED
+from app.core.query_tracer import QueryTrace, current_query_trace
+from app.queues.reactor_worker import consume_events, handle_messages
+from app.queues.transport import QueueMessage, event_transport
+
+logger = logging.getLogger(__name__)
+
+
+def partition_key(event: dict) -> Optional[str]:
+    """Events sharing this key are handled by the same worker, in order."""
+    key = event.get("device_id") or event.get("sensor_id")
+    return str(key) if key is not None else None
+
+
+class ReactorWorker:
+    """Handles the events of the devices hashed to it, one batch at a time."""
+
+    def __init__(self, worker_id: int, batch_size: int, queue_size: int):
+        self.worker_id = worker_id
+        self.batch_size = batch_size
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.in_flight = 0
+        self.processed = 0
+        self.failed = 0
+
+    async def run(self):
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            self.in_flight = len(batch)
+            start = time.perf_counter()
+            # The batch's MongoDB commands are charged to it, named after its first event
+            trace = QueryTrace(f"reactor worker {self.worker_id} ({len(batch)} event(s) from {batch[0][1].get('event_id')})")
+            token = current_query_trace.set(trace)
+            try:
+                await handle_messages(batch)
+                self.processed += len(batch)
+                REACTOR_PROCESSED.inc(len(batch))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += len(batch)
+                REACTOR_FAILED.inc(len(batch))
+                logger.error(f"❌ Reactor worker {self.worker_id} failed on {len(batch)} event(s): {e}")
+            finally:
+                current_query_trace.reset(token)
+                MONGO_ROUND_TRIPS.labels("reactor").observe(trace.round_trips)
+                REACTOR_BATCH_SECONDS.observe(time.perf_counter() - start)
+                self.in_flight = 0
+                for _ in batch:
+                    self.queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            "worker_id": self.worker_id,
+            "queue_depth": self.queue.qsize(),
+            "in_flight": self.in_flight,
+            "processed": self.processed,
+            "failed": self.failed,
+        }
+
+
+class ReactorPool:
+    """
+    Pool of reactor workers fed from the event queue.
+
+    Events are partitioned by device_id (or sensor_id) hash so events of one
+    device keep their order while different devices are handled concurrently.
+    Events without either key are spread round-robin. While events wait in
+    the worker queues their stream entries are touched periodically, so they
+    are not claimed as stale by another replica however long the backlog.
+    """
+
+    def __init__(
+        self,
+        size: int = REACTOR_WORKERS,
+        batch_size: int = REACTOR_BATCH_SIZE,
+        queue_size: int = REACTOR_WORKER_QUEUE_SIZE,
+    ):
+        self.size = max(1, size)
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.workers: List[ReactorWorker] = []
+        self._round_robin = itertools.cycle(range(self.size))
+        self._feeder: Optional[asyncio.Task] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def worker_for(self, event: dict) -> ReactorWorker:
+        key = partition_key(event)
+        if key is None:
+            return self.workers[next(self._round_robin)]
+        return self.workers[zlib.crc32(key.encode()) % self.size]
+
+    async def dispatch(self, messages: List[QueueMessage]):
+        # Waiting on a full worker queue holds back the feeder, and with it
+        # further reads from Redis, instead of buffering without bound.
+        for message in messages:
+            await self.worker_for(message[1]).queue.put(message)
+
+    async def keep_alive(self, interval: float = EVENT_STREAM_CLAIM_INTERVAL_SECONDS):
+        # Runs apart from the feeder, which waits while the worker queues are full
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await event_transport.touch()
+            except Exception as e:
+                logger.error(f"❌ Failed to touch the queued events' stream entries: {e}")
+
+    def start(self):
+        if self.running:
+            return
+        self.workers = [ReactorWorker(i, self.batch_size, self.queue_size) for i in range(self.size)]
+        self._feeder = asyncio.create_task(consume_events(self.batch_size, handler=self.dispatch))
+        self._tasks = [asyncio.create_task(worker.run()) for worker in self.workers]
+        self._tasks.append(asyncio.create_task(self.keep_alive()))
+        logger.info(f"Reactor pool started with {self.size} worker(s)")
+
+    async def stop(self, drain_timeout: float = 5.0):
+        """Stop reading new events, give workers time to finish queued ones, then cancel them."""
+        if not self.running:
+            return
+        self._feeder.cancel()
+        await asyncio.gather(self._feeder, return_exceptions=True)
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(worker.queue.join() for worker in self.workers)),
+                timeout=drain_timeout,
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Reactor pool stopped with {self.stats()['queue_depth']} event(s) still queued")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        workers = [worker.stats() for worker in self.workers]
+        return {
+            "workers": workers,
+            "queue_depth": sum(w["queue_depth"] for w in workers),
+            "in_flight": sum(w["in_flight"] for w in workers),
+            "processed": sum(w["processed"] for w in workers),
+            "failed": sum(w["failed"] for w in workers),
+        }
+
+
+reactor_pool = ReactorPool()
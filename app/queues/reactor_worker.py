@@ -1,48 +1,122 @@
-import datetime
-from app.core.redis_client import redis_client
-from app.constants import EVENT_QUEUE
-import json
+import time
+from typing import Awaitable, Callable, List, Optional
+from app.constants import (
+    EVENT_STREAM_CLAIM_INTERVAL_SECONDS,
+    REACTOR_BACKOFF_MAX_SECONDS,
+    REACTOR_BACKOFF_MIN_SECONDS,
+    REACTOR_BATCH_SIZE,
+)
 import logging
 import asyncio
 
+from app.core.metrics import (
+    ACTION_PERSIST_SECONDS,
+    EVENT_QUEUE_WAIT_SECONDS,
+    EVENT_TO_ACTION_REACTOR,
+    RULE_EVALUATION_SECONDS,
+)
 from app.models.consequence import Consequence
-from app.services.consequence_service import mark_consequence_as_executed
-from app.services.rule_service import get_matching_rules
+from app.services.action_dispatcher import dispatch_actions
+from app.services.consequence_service import create_executed_consequences
+from app.services.device_twin import record_events
+from app.services.rule_engine import rule_engine
+from app.queues.event_producer import ingested_at
+from app.queues.transport import QueueMessage, event_transport
 
 logger = logging.getLogger(__name__)
 
-async def consume_events():
+async def consume_events(
+    batch_size: int = REACTOR_BATCH_SIZE,
+    handler: Optional[Callable[[List[QueueMessage]], Awaitable[None]]] = None,
+):
+    """Read batches from the event transport and pass them to `handler` (handle_messages by default)."""
+    handler = handler or handle_messages
+    backoff = 0.0
+    ready = False
+    next_claim = 0.0
     while True:
         try:
-            _, event_data = await redis_client.blpop(EVENT_QUEUE)
-            event = json.loads(event_data)
-            logger.info(f"⚡ Event received by reactor: {event}")
-
-            # TODO: process the event, call consequences, etc.
-            await handle_event(event)
+            if not ready:
+                await event_transport.setup()
+                ready = True
 
+            messages = await event_transport.read(batch_size)
+            if time.monotonic() >= next_claim:
+                messages.extend(await event_transport.claim_stale(batch_size))
+                next_claim = time.monotonic() + EVENT_STREAM_CLAIM_INTERVAL_SECONDS
+            if not messages:
+                continue
+            logger.info(f"⚡ {len(messages)} event(s) received by reactor")
+            await handler(messages)
+            backoff = 0.0
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            logger.error(f"❌ Error processing event: {e}")
-        await asyncio.sleep(0.1)  # avoid tight loop
+            # Only back off after errors so a healthy queue is drained at full speed
+            backoff = min(max(backoff * 2, REACTOR_BACKOFF_MIN_SECONDS), REACTOR_BACKOFF_MAX_SECONDS)
+            logger.error(f"❌ Error processing events, retrying in {backoff:.1f}s: {e}")
+            await asyncio.sleep(backoff)
+
+async def handle_messages(messages: List[QueueMessage]):
+    """Handle a batch read from the transport and acknowledge it once it succeeded."""
+    try:
+        await handle_events([event for _, event in messages])
+    except Exception:
+        # Left pending, to be claimed again until it is moved to the dead-letter stream
+        event_transport.release(message_id for message_id, _ in messages)
+        raise
+    await event_transport.ack(message_id for message_id, _ in messages)
 
 async def handle_event(event: dict):
-    matching_rules = await get_matching_rules(event)
-    
-    if not matching_rules:
-        print("🚫 No matching rules found for this event.")
+    await handle_events([event])
+
+async def handle_events(events: List[dict]):
+    # Events stamped by an older producer have no ingested_at and are left out of the lag metrics
+    picked_up = time.time()
+    for event in events:
+        stamp = ingested_at(event)
+        if stamp is not None:
+            EVENT_QUEUE_WAIT_SECONDS.observe(picked_up - stamp)
+
+    # Rules are refreshed at most once per batch and then matched in memory
+    start = time.perf_counter()
+    await rule_engine.ensure_loaded()
+    matches = rule_engine.match_many(events)
+    RULE_EVALUATION_SECONDS.observe(time.perf_counter() - start)
+    # The live twins are updated for every batch, whether or not a rule fired
+    await record_events(events)
+
+    consequences = []
+    # Ingest time of each consequence's event, by position
+    ingested = []
+    for event, rules in zip(events, matches):
+        for rule in rules:
+            logger.debug(f"⚙️  Executing action: {rule.action} on device {rule.target_device_id}")
+            consequences.append(Consequence(
+                event_id=event.get("event_id", "event-auto"),
+                rule_id=str(rule.id),
+                action=rule.action,
+                device_id=rule.target_device_id,
+            ))
+            ingested.append(ingested_at(event))
+
+    if not consequences:
+        logger.info("🚫 No matching rules found for this batch.")
         return
 
-    for rule in matching_rules:
-        consequence = Consequence(
-            event_id=event.get("event_id", "event-auto"),
-            rule_id=str(rule.id),
-            action=rule.action,
-            device_id=rule.target_device_id,
-            status="pending"
-        )
-        await consequence.insert()
-        print(f"📝 Logged consequence: {consequence}")
-
-        # Simulate execution
-        print(f"⚙️  Executing action: {rule.action} on device {rule.target_device_id}")
-        await mark_consequence_as_executed(str(consequence.id))
\ No newline at end of file
+    # Device states are changed first, so a failed dispatch leaves the batch unacknowledged
+    start = time.perf_counter()
+    await dispatch_actions(consequences)
+    executed = time.time()
+    for consequence, stamp in zip(consequences, ingested):
+        if stamp is not None:
+            consequence.latency_seconds = executed - stamp
+    # One observation per event, however many rules it fired
+    for event, rules in zip(events, matches):
+        stamp = ingested_at(event)
+        if rules and stamp is not None:
+            EVENT_TO_ACTION_REACTOR.observe(executed - stamp)
+    # Consequences are written once, already executed, instead of insert + get + save each
+    await create_executed_consequences(consequences)
+    ACTION_PERSIST_SECONDS.observe(time.perf_counter() - start)
+    logger.info(f"📝 Logged {len(consequences)} executed consequence(s)")
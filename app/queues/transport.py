@@ -0,0 +1,236 @@
+import json
+import logging
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from redis.exceptions import ResponseError
+
+from app.constants import (
+    EVENT_QUEUE,
+    EVENT_QUEUE_BACKEND,
+    EVENT_STREAM,
+    EVENT_STREAM_CLAIM_IDLE_MS,
+    EVENT_STREAM_CONSUMER,
+    EVENT_STREAM_DEAD_LETTER,
+    EVENT_STREAM_GROUP,
+    EVENT_STREAM_MAX_DELIVERIES,
+    EVENT_STREAM_MAXLEN,
+    REACTOR_BLOCK_TIMEOUT_SECONDS,
+)
+from app.core.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# (message id used for acknowledgement, decoded event); list mode has no ids
+QueueMessage = Tuple[Optional[str], dict]
+
+
+def _decode(raw: str) -> Optional[dict]:
+    try:
+        return json.loads(raw)
+    except (TypeError, ValueError) as e:
+        logger.error(f"❌ Dropping malformed event {raw!r}: {e}")
+        return None
+
+
+class ListTransport:
+    """RPUSH / BLPOP on the EVENT_QUEUE list. Events are gone once popped."""
+
+    def __init__(self, queue: str = EVENT_QUEUE):
+        self.queue = queue
+
+    async def setup(self):
+        pass
+
+    async def push(self, events: Iterable[dict]):
+        payloads = [json.dumps(event) for event in events]
+        if payloads:
+            await redis_client.rpush(self.queue, *payloads)
+
+    async def read(self, count: int) -> List[QueueMessage]:
+        """Block for the first event, then drain up to count - 1 more without waiting."""
+        popped = await redis_client.blpop(self.queue, timeout=REACTOR_BLOCK_TIMEOUT_SECONDS)
+        if popped is None:
+            return []
+        raw_events = [popped[1]]
+        if count > 1:
+            raw_events.extend(await redis_client.lpop(self.queue, count - 1) or [])
+        return [(None, event) for event in map(_decode, raw_events) if event is not None]
+
+    async def ack(self, message_ids: Iterable[Optional[str]]):
+        pass
+
+    def release(self, message_ids: Iterable[Optional[str]]):
+        pass
+
+    async def touch(self):
+        pass
+
+    async def claim_stale(self, count: int) -> List[QueueMessage]:
+        return []
+
+    async def depth(self) -> int:
+        return await redis_client.llen(self.queue)
+
+
+class StreamTransport:
+    """
+    Redis Streams consumer group on EVENT_STREAM.
+
+    Entries stay pending until acknowledged, so an event handled by a worker
+    that crashes is claimed by another consumer once it has been idle for
+    EVENT_STREAM_CLAIM_IDLE_MS. An entry claimed more than `max_deliveries`
+    times is moved to the `dead_letter` stream instead of being handled
+    again.
+
+    The ids read but not yet acknowledged or released are held: touch()
+    resets their idle time so other replicas leave them alone while they
+    wait in a busy worker's queue, and claim_stale() never returns them.
+    """
+
+    def __init__(
+        self,
+        stream: str = EVENT_STREAM,
+        group: str = EVENT_STREAM_GROUP,
+        consumer: str = EVENT_STREAM_CONSUMER,
+        maxlen: int = EVENT_STREAM_MAXLEN,
+        claim_idle_ms: int = EVENT_STREAM_CLAIM_IDLE_MS,
+        max_deliveries: int = EVENT_STREAM_MAX_DELIVERIES,
+        dead_letter: str = EVENT_STREAM_DEAD_LETTER,
+    ):
+        self.stream = stream
+        self.group = group
+        self.consumer = consumer
+        self.maxlen = maxlen
+        self.claim_idle_ms = claim_idle_ms
+        self.max_deliveries = max_deliveries
+        self.dead_letter = dead_letter
+        self._claim_cursor = "0-0"
+        self._held: Set[str] = set()
+
+    async def setup(self):
+        try:
+            await redis_client.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+            logger.info(f"Created consumer group '{self.group}' on stream '{self.stream}'")
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def push(self, events: Iterable[dict]):
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for event in events:
+                pipe.xadd(self.stream, {"event": json.dumps(event)}, maxlen=self.maxlen, approximate=True)
+            await pipe.execute()
+
+    async def read(self, count: int) -> List[QueueMessage]:
+        response = await redis_client.xreadgroup(
+            self.group,
+            self.consumer,
+            {self.stream: ">"},
+            count=count,
+            block=REACTOR_BLOCK_TIMEOUT_SECONDS * 1000,
+        )
+        if not response:
+            return []
+        entries = response.items() if isinstance(response, dict) else response
+        messages = []
+        for _, stream_entries in entries:
+            messages.extend(await self._decode_entries(stream_entries))
+        self._held.update(message_id for message_id, _ in messages)
+        return messages
+
+    async def ack(self, message_ids: Iterable[Optional[str]]):
+        ids = [message_id for message_id in message_ids if message_id]
+        if ids:
+            await redis_client.xack(self.stream, self.group, *ids)
+            self._held.difference_update(ids)
+
+    def release(self, message_ids: Iterable[Optional[str]]):
+        """Stop holding entries that failed, so they are claimed again once idle."""
+        self._held.difference_update(message_ids)
+
+    async def touch(self):
+        """Reset the idle time of the held entries; JUSTID leaves their delivery count alone."""
+        if self._held:
+            await redis_client.xclaim(
+                self.stream, self.group, self.consumer, min_idle_time=0, message_ids=list(self._held), justid=True,
+            )
+
+    async def claim_stale(self, count: int) -> List[QueueMessage]:
+        """Take over entries other consumers read but never acknowledged."""
+        response = await redis_client.xautoclaim(
+            self.stream,
+            self.group,
+            self.consumer,
+            min_idle_time=self.claim_idle_ms,
+            start_id=self._claim_cursor,
+            count=count,
+        )
+        self._claim_cursor = response[0]
+        entries = [(message_id, fields) for message_id, fields in response[1] if message_id not in self._held]
+        if not entries:
+            return []
+
+        deliveries = await self._deliveries([message_id for message_id, _ in entries])
+        poison = [entry for entry in entries if deliveries.get(entry[0], 0) > self.max_deliveries]
+        if poison:
+            await self._move_to_dead_letter(poison, deliveries)
+            entries = [entry for entry in entries if deliveries.get(entry[0], 0) <= self.max_deliveries]
+
+        messages = await self._decode_entries(entries)
+        self._held.update(message_id for message_id, _ in messages)
+        if messages:
+            logger.warning(f"♻️ Claimed {len(messages)} stale event(s) from stream '{self.stream}'")
+        return messages
+
+    async def depth(self) -> int:
+        return await redis_client.xlen(self.stream)
+
+    async def _deliveries(self, message_ids: List[str]) -> Dict[str, int]:
+        """Times each entry was delivered, from one exact XPENDING per id, pipelined."""
+        # A range query over the claimed ids would also return any other
+        # pending entries of ours in between, and could miss claimed ones.
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for message_id in message_ids:
+                pipe.xpending_range(self.stream, self.group, min=message_id, max=message_id, count=1)
+            responses = await pipe.execute()
+        return {entry["message_id"]: entry["times_delivered"] for pending in responses for entry in pending}
+
+    async def _move_to_dead_letter(self, entries, deliveries: Dict[str, int]):
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for message_id, fields in entries:
+                if fields:
+                    pipe.xadd(
+                        self.dead_letter,
+                        {**fields, "id": message_id, "deliveries": deliveries[message_id]},
+                        maxlen=self.maxlen,
+                        approximate=True,
+                    )
+            pipe.xack(self.stream, self.group, *(message_id for message_id, _ in entries))
+            await pipe.execute()
+        logger.error(
+            f"☠️ Moved {len(entries)} event(s) delivered more than {self.max_deliveries} times "
+            f"from stream '{self.stream}' to '{self.dead_letter}'"
+        )
+
+    async def _decode_entries(self, entries) -> List[QueueMessage]:
+        messages, dropped = [], []
+        for message_id, fields in entries:
+            event = _decode(fields.get("event")) if fields else None
+            if event is None:
+                dropped.append(message_id)
+            else:
+                messages.append((message_id, event))
+        # Acknowledge undecodable or deleted entries so they are not redelivered forever
+        await self.ack(dropped)
+        return messages
+
+
+def build_transport(backend: str = EVENT_QUEUE_BACKEND):
+    if backend == "list":
+        return ListTransport()
+    if backend == "stream":
+        return StreamTransport()
+    raise ValueError(f"Unknown EVENT_QUEUE_BACKEND '{backend}', expected 'list' or 'stream'")
+
+
+event_transport = build_transport()
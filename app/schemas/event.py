@@ -16,3 +16,8 @@ class EventRead(BaseModel):
 
     class Config:
         from_attributes = True
+
+class EventAccepted(BaseModel):
+    id: str
+    status: str = "accepted"
+    consequences_url: str  # poll for the consequences the reactor creates
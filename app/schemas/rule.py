@@ -1,21 +1,38 @@
-from pydantic import BaseModel
-from typing import Dict
+from pydantic import BaseModel, model_validator
+from typing import Dict, Optional
 from datetime import datetime
 
+from app.models.rule import ConditionNode
+from app.services.rule_expression import parse_expression
+
 class RuleCreate(BaseModel):
     name: str
     trigger_type: str  # e.g., "temperature_change"
-    condition: Dict[str, float]  # e.g., {"temperature": 28.0}
-    operator: str  # e.g., ">", "<", "=="
+    condition: Dict[str, float] = {}  # e.g., {"temperature": 28.0}
+    operator: Optional[str] = None  # e.g., ">", "<", "=="
+    condition_tree: Optional[ConditionNode] = None  # e.g., {"op": "and", "conditions": [...]}
+    expression: Optional[str] = None  # e.g., "temperature > 28 and humidity < 40"
     target_device_id: str
     action: str  # e.g., "turn_on"
 
+    @model_validator(mode="after")
+    def check_condition(self):
+        if self.expression is not None:
+            if self.condition_tree is not None:
+                raise ValueError("Give either expression or condition_tree, not both")
+            self.condition_tree = parse_expression(self.expression)
+        if self.condition_tree is None and not (self.condition and self.operator):
+            raise ValueError("Either expression, condition_tree or condition with operator is required")
+        return self
+
 class RuleRead(BaseModel):
     id: str
     name: str
     trigger_type: str
     condition: Dict[str, float]
-    operator: str
+    operator: Optional[str]
+    condition_tree: Optional[ConditionNode] = None
+    expression: Optional[str] = None
     target_device_id: str
     action: str
     created_at: datetime
@@ -0,0 +1,67 @@
+# services/action_dispatcher.py
+import logging
+import time
+from typing import Dict, Iterable
+
+from beanie import PydanticObjectId
+from fastapi import HTTPException
+from pymongo import UpdateOne
+
+from app.models.consequence import Consequence
+from app.models.device import Device
+from app.services.device_twin import record_states
+from app.services.mqtt_publisher import mqtt_publisher
+
+logger = logging.getLogger(__name__)
+
+# Rule actions that change a device's state
+ACTION_STATES = {"turn_on": "on", "turn_off": "off"}
+
+
+def coalesce_actions(consequences: Iterable[Consequence]) -> Dict[str, str]:
+    """
+    Desired state per target device. When several consequences of a batch
+    target the same device, the last one wins. Unknown actions and invalid
+    device ids are skipped.
+    """
+    states: Dict[str, str] = {}
+    for consequence in consequences:
+        state = ACTION_STATES.get(consequence.action)
+        if state is None:
+            logger.debug(f"Action '{consequence.action}' does not change device state, skipping")
+            continue
+        if not PydanticObjectId.is_valid(consequence.device_id):
+            logger.warning(f"Skipping action '{consequence.action}' on invalid device id {consequence.device_id!r}")
+            continue
+        states[consequence.device_id] = state
+    return states
+
+
+async def dispatch_actions(consequences: Iterable[Consequence]) -> int:
+    """
+    Apply the `turn_on` / `turn_off` actions of a batch of consequences to
+    the devices with one unordered bulk_write, and return how many devices
+    changed state.
+
+    Each update only matches a device that is not already in the desired
+    state, so no-op writes are skipped by MongoDB and replaying a batch is
+    harmless. The states are then published to the devices' control topics
+    without waiting for the broker.
+    """
+    states = coalesce_actions(consequences)
+    if not states:
+        return 0
+    try:
+        operations = [
+            UpdateOne({"_id": PydanticObjectId(device_id), "state": {"$ne": state}}, {"$set": {"state": state}})
+            for device_id, state in states.items()
+        ]
+        result = await Device.get_pymongo_collection().bulk_write(operations, ordered=False)
+        await record_states(states, time.time())
+        # Commands go to every target, so a device that drifted from its stored state is corrected too
+        mqtt_publisher.publish_states(states)
+        logger.info(f"🔌 Dispatched {len(states)} device action(s), {result.modified_count} state change(s)")
+        return result.modified_count
+    except Exception as e:
+        logger.error(f"Error dispatching actions to {len(states)} device(s): {e}")
+        raise HTTPException(status_code=500, detail=f"Error dispatching actions: {str(e)}")
@@ -1,5 +1,7 @@
 import datetime
+from typing import List
 from app.models.consequence import Consequence
+from app.services.write_buffer import consequence_buffer
 from fastapi import HTTPException
 from beanie import PydanticObjectId
 import logging
@@ -13,6 +15,13 @@ async def get_all_consequences() -> list[Consequence]:
         logger.error(f"Error fetching consequences: {e}")
         raise HTTPException(status_code=500, detail="Error fetching consequences")
 
+async def get_consequences_by_event(event_id: str) -> list[Consequence]:
+    try:
+        return await Consequence.find(Consequence.event_id == event_id).to_list()
+    except Exception as e:
+        logger.error(f"Error fetching consequences for event {event_id}: {e}")
+        raise HTTPException(status_code=500, detail="Error fetching consequences")
+
 async def get_consequence_by_id(consequence_id: str) -> Consequence:
     try:
         consequence = await Consequence.get(PydanticObjectId(consequence_id))
@@ -33,3 +42,36 @@ async def mark_consequence_as_executed(consequence_id: str) -> Consequence:
     except Exception as e:
         logger.error(f"Error marking consequence {consequence_id} as executed: {e}")
         raise HTTPException(status_code=500, detail=f"Error updating consequence: {str(e)}")
+
+async def create_executed_consequences(consequences: List[Consequence]) -> List[Consequence]:
+    """Queue already-executed consequences on the write-behind buffer (one insert_many per flush)."""
+    if not consequences:
+        return consequences
+    try:
+        executed_at = datetime.datetime.utcnow()
+        for consequence in consequences:
+            consequence.status = "executed"
+            consequence.executed_at = executed_at
+        await consequence_buffer.put_many(consequences)
+        return consequences
+    except Exception as e:
+        logger.error(f"Error inserting {len(consequences)} consequences: {e}")
+        raise HTTPException(status_code=500, detail=f"Error inserting consequences: {str(e)}")
+
+async def update_consequences_status(consequence_ids: List[str], status: str) -> int:
+    """Move many consequences to `status` with one update_many; returns the number modified."""
+    if not consequence_ids:
+        return 0
+    try:
+        update = {"status": status}
+        if status == "executed":
+            update["executed_at"] = datetime.datetime.utcnow()
+        object_ids = [PydanticObjectId(consequence_id) for consequence_id in consequence_ids]
+        result = await Consequence.find({"_id": {"$in": object_ids}}).update({"$set": update})
+        return result.modified_count if result else 0
+    except Exception as e:
+        logger.error(f"Error updating {len(consequence_ids)} consequences to '{status}': {e}")
+        raise HTTPException(status_code=500, detail=f"Error updating consequences: {str(e)}")
+
+async def mark_consequences_as_executed(consequence_ids: List[str]) -> int:
+    return await update_consequences_status(consequence_ids, "executed")
@@ -1,9 +1,12 @@
 import logging
+import time
 from typing import Literal, Optional, List
 
 from bson import ObjectId
 from app.models.device import Device
 from app.schemas.device import DeviceCreate, DeviceUpdate
+from app.services.device_twin import delete_twin, record_state
+from app.services.mqtt_publisher import mqtt_publisher
 from beanie import PydanticObjectId
 from fastapi import HTTPException, status
 
@@ -17,6 +20,7 @@ async def create_device(device_in: DeviceCreate) -> Device:
         logger.info("Creating new device...")
         device = Device(**device_in.dict())
         await device.insert()
+        await record_state(str(device.id), device.state, time.time())
         logger.info(f"Device created successfully with ID: {device.id}")
         return device
     except Exception as e:
@@ -87,6 +91,9 @@ async def update_device(device_id: str, device_in: DeviceUpdate) -> Optional[Dev
             setattr(device, key, value)
 
         await device.save()
+        if "state" in device_data:
+            await record_state(str(device.id), device.state, time.time())
+            mqtt_publisher.publish_states({str(device.id): device.state})
         logger.info(f"Device {device_id} updated successfully")
         return device
     except Exception as e:
@@ -109,6 +116,7 @@ async def delete_device(device_id: str) -> bool:
                 detail="Device not found"
             )
         await device.delete()
+        await delete_twin(str(device.id))
         logger.info(f"Device {device_id} deleted successfully")
         return True
     except Exception as e:
@@ -139,4 +147,6 @@ async def set_device_state(device_id: str, state: Literal["on", "off"]) -> Devic
     device.state = state
     device.registered_at = device.registered_at   # preserve existing timestamp
     await device.save()
+    await record_state(str(device.id), state, time.time())
+    mqtt_publisher.publish_states({str(device.id): state})
     return device
\ No newline at end of file
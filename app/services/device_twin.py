@@ -0,0 +1,116 @@
+# services/device_twin.py
+import logging
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Union
+
+from app.constants import DEVICE_TWIN_PREFIX
+from app.core.redis_client import redis_client
+from app.models.event import Event
+from app.services.rule_engine import event_device, normalize_event
+from app.services.rule_index import is_number
+from app.services.window_state import event_time
+
+logger = logging.getLogger(__name__)
+
+# Hash fields: "<key>" / "<key>:ts" per data key, plus "state" / "state:ts"
+TIMESTAMP_SUFFIX = ":ts"
+STATE_FIELD = "state"
+
+
+def twin_key(device_id: str) -> str:
+    return f"{DEVICE_TWIN_PREFIX}{device_id}"
+
+
+def twin_fields(event: Union[Event, Mapping[str, Any]]) -> Dict[str, Any]:
+    """Latest-value fields an event contributes to its device's twin (numeric data keys only)."""
+    _, values = normalize_event(event)
+    timestamp = event_time(event)
+    fields: Dict[str, Any] = {}
+    for key, value in values.items():
+        if is_number(value):
+            fields[key] = value
+            fields[key + TIMESTAMP_SUFFIX] = timestamp
+    return fields
+
+
+async def record_events(events: Iterable[Union[Event, Mapping[str, Any]]]) -> None:
+    """
+    Write the latest readings of a batch of events to the device twins with
+    one pipelined round trip. Failures are logged and never block ingestion.
+    """
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            queued = 0
+            for event in events:
+                device_id = event_device(event)
+                fields = twin_fields(event)
+                if device_id is None or not fields:
+                    continue
+                pipe.hset(twin_key(device_id), mapping=fields)
+                queued += 1
+            if queued:
+                await pipe.execute()
+    except Exception as e:
+        logger.error(f"❌ Failed to update device twins: {e}")
+
+
+async def record_state(device_id: str, state: str, timestamp: Optional[float] = None) -> None:
+    try:
+        fields = {STATE_FIELD: state}
+        if timestamp is not None:
+            fields[STATE_FIELD + TIMESTAMP_SUFFIX] = timestamp
+        await redis_client.hset(twin_key(device_id), mapping=fields)
+    except Exception as e:
+        logger.error(f"❌ Failed to update twin state of device {device_id}: {e}")
+
+
+async def record_states(states: Mapping[str, str], timestamp: Optional[float] = None) -> None:
+    """Write the state of many devices with one pipelined round trip."""
+    if not states:
+        return
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for device_id, state in states.items():
+                fields = {STATE_FIELD: state}
+                if timestamp is not None:
+                    fields[STATE_FIELD + TIMESTAMP_SUFFIX] = timestamp
+                pipe.hset(twin_key(device_id), mapping=fields)
+            await pipe.execute()
+    except Exception as e:
+        logger.error(f"❌ Failed to update twin state of {len(states)} device(s): {e}")
+
+
+async def delete_twin(device_id: str) -> None:
+    try:
+        await redis_client.delete(twin_key(device_id))
+    except Exception as e:
+        logger.error(f"❌ Failed to delete twin of device {device_id}: {e}")
+
+
+def parse_twin(raw: Mapping[str, str]) -> dict:
+    """Turn a twin hash into {"state", "state_updated_at", "readings": {key: {"value", "timestamp"}}}."""
+    readings: Dict[str, dict] = {}
+    for field, value in raw.items():
+        if field.endswith(TIMESTAMP_SUFFIX) or field == STATE_FIELD:
+            continue
+        timestamp = raw.get(field + TIMESTAMP_SUFFIX)
+        readings[field] = {
+            "value": float(value),
+            "timestamp": float(timestamp) if timestamp is not None else None,
+        }
+    state_updated_at = raw.get(STATE_FIELD + TIMESTAMP_SUFFIX)
+    return {
+        "state": raw.get(STATE_FIELD),
+        "state_updated_at": float(state_updated_at) if state_updated_at is not None else None,
+        "readings": readings,
+    }
+
+
+async def get_live_states(device_ids: List[str]) -> Dict[str, dict]:
+    """Live twin of every device in `device_ids`, read with one pipelined round trip."""
+    if not device_ids:
+        return {}
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for device_id in device_ids:
+            pipe.hgetall(twin_key(device_id))
+        hashes = await pipe.execute()
+    return {device_id: parse_twin(raw or {}) for device_id, raw in zip(device_ids, hashes)}
@@ -2,22 +2,67 @@
 from app.models.event import Event
 from app.schemas.event import EventCreate
 from fastapi import HTTPException
+from typing import List
 import logging
+import time
 
+from app.queues.event_producer import stamp_ingest
+from app.queues.transport import event_transport
+from app.services.device_twin import record_events
 from app.services.reactor_service import process_event
+from app.services.write_buffer import event_buffer
 
 logger = logging.getLogger(__name__)
 
 async def log_event(event_in: EventCreate) -> Event:
     try:
+        ingested_at = time.time()
         event = Event(**event_in.dict())
-        await event.insert()
+        # Buffered write: the id is assigned now, the insert happens in the next flush
+        await event_buffer.put(event)
+        await record_events([event])
         logger.info(f"Logged event for device {event.device_id} of type {event.event_type}")
         
          # 🧠 Trigger the reactor
-        await process_event(event)
+        await process_event(event, ingested_at)
         
         return event
     except Exception as e:
         logger.error(f"Error logging event: {e}")
         raise HTTPException(status_code=500, detail=f"Error logging event: {str(e)}")
+
+def to_queue_event(event: Event) -> dict:
+    """Flatten an Event into the shape the reactor matches rules against."""
+    return stamp_ingest({
+        **event.data,
+        "event_id": str(event.id),
+        "type": event.event_type,
+        "device_id": event.device_id,
+        "timestamp": event.timestamp.isoformat(),
+    })
+
+async def ingest_event(event_in: EventCreate) -> Event:
+    """Persist the event and leave rule evaluation to the reactor worker."""
+    try:
+        event = Event(**event_in.dict())
+        await event_buffer.put(event)
+        await event_transport.push([to_queue_event(event)])
+        logger.info(f"Accepted event {event.id} for device {event.device_id} of type {event.event_type}")
+        return event
+    except Exception as e:
+        logger.error(f"Error ingesting event: {e}")
+        raise HTTPException(status_code=500, detail=f"Error ingesting event: {str(e)}")
+
+async def ingest_events(events_in: List[EventCreate]) -> List[Event]:
+    """Bulk version of ingest_event: one buffered insert_many and one transport push for the batch."""
+    try:
+        events = [Event(**event_in.dict()) for event_in in events_in]
+        if not events:
+            return events
+        await event_buffer.put_many(events)
+        await event_transport.push([to_queue_event(event) for event in events])
+        logger.info(f"Accepted {len(events)} event(s)")
+        return events
+    except Exception as e:
+        logger.error(f"Error ingesting {len(events_in)} event(s): {e}")
+        raise HTTPException(status_code=500, detail=f"Error ingesting events: {str(e)}")
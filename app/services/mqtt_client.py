@@ -2,18 +2,35 @@ import os
 import paho.mqtt.client as mqtt
 from dotenv import load_dotenv
 
+from app.services.topic_trie import TopicTrie
+
 # Load environment variables from .env file
 load_dotenv()
 
 MQTT_BROKER = os.getenv("MQTT_BROKER", "mqtt")
 MQTT_PORT = int(os.getenv("MQTT_PORT", 1883))
 
+
+# Handle device logic
+def handle_control(topic, payload):
+    device_id = topic.split("/")[1]
+    if payload == "on":
+        print(f"💡 Turning ON {device_id}")
+    elif payload == "off":
+        print(f"💡 Turning OFF {device_id}")
+
+
+# Topic filters and their handlers, matched with one trie lookup per message
+router = TopicTrie()
+router.add("device/+/control", handle_control)
+
 # When connected to the broker
 def on_connect(client, userdata, flags, rc):
     if rc == 0:
         print("✅ Connected to MQTT Broker!")
-        # Subscribe to device control topic
-        client.subscribe("device/light_1/control")
+        # Subscribe to every routed topic
+        for topic_filter in router.filters():
+            client.subscribe(topic_filter)
     else:
         print("❌ Failed to connect, return code", rc)
 
@@ -23,19 +40,19 @@ def on_message(client, userdata, msg):
     payload = msg.payload.decode()
 
     print(f"📥 Message received on {topic}: {payload}")
+    router.dispatch(topic, payload)
+
+def main():
+    # Create MQTT client and attach callbacks
+    client = mqtt.Client()
+    client.on_connect = on_connect
+    client.on_message = on_message
+
+    # Connect to the broker and start listening
+    client.connect(MQTT_BROKER, MQTT_PORT, 60)
+    client.loop_forever()
+
 
-    # Handle device logic
-    if topic == "device/light_1/control":
-        if payload == "on":
-            print("💡 Turning ON light_1")
-        elif payload == "off":
-            print("💡 Turning OFF light_1")
-
-# Create MQTT client and attach callbacks
-client = mqtt.Client()
-client.on_connect = on_connect
-client.on_message = on_message
-
-# Connect to the broker and start listening
-client.connect(MQTT_BROKER, MQTT_PORT, 60)
-client.loop_forever()
+# Only block when run as a script, importing this module must not
+if __name__ == "__main__":
+    main()
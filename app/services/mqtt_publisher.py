@@ -0,0 +1,182 @@
+# services/mqtt_publisher.py
+import asyncio
+import logging
+from typing import Dict, Mapping, Optional, Tuple
+
+import paho.mqtt.client as mqtt
+
+from app.constants import (
+    MQTT_BROKER,
+    MQTT_KEEPALIVE_SECONDS,
+    MQTT_MAX_INFLIGHT,
+    MQTT_PORT,
+    MQTT_QUEUE_SIZE,
+    MQTT_RECONNECT_MAX_SECONDS,
+    MQTT_RECONNECT_MIN_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# (topic, payload, qos)
+OutgoingMessage = Tuple[str, str, int]
+
+
+def control_topic(device_id: str) -> str:
+    return f"device/{device_id}/control"
+
+
+class MqttPublisher:
+    """
+    One persistent MQTT connection shared by the whole app.
+
+    The paho network loop runs in its own thread (loop_start) and reconnects
+    with exponential backoff between `reconnect_min` and `reconnect_max`
+    seconds. publish() never waits on the network: messages go to a bounded
+    queue drained by a sender task, which keeps at most `max_inflight` QoS 1
+    messages unacknowledged and frees a slot on each PUBACK. Messages
+    published while the broker is down are resent by paho on reconnect.
+
+    While the publisher is not started (tests, scripts) messages are dropped.
+    """
+
+    def __init__(
+        self,
+        host: str = MQTT_BROKER,
+        port: int = MQTT_PORT,
+        keepalive: int = MQTT_KEEPALIVE_SECONDS,
+        max_inflight: int = MQTT_MAX_INFLIGHT,
+        queue_size: int = MQTT_QUEUE_SIZE,
+        reconnect_min: int = MQTT_RECONNECT_MIN_SECONDS,
+        reconnect_max: int = MQTT_RECONNECT_MAX_SECONDS,
+    ):
+        self.host = host
+        self.port = port
+        self.keepalive = keepalive
+        self.max_inflight = max_inflight
+        self.queue_size = queue_size
+        self.reconnect_min = reconnect_min
+        self.reconnect_max = reconnect_max
+        self.client: Optional[mqtt.Client] = None
+        self.connected = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._window: Optional[asyncio.Semaphore] = None
+        self._inflight: Dict[int, OutgoingMessage] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.published = 0
+        self.acked = 0
+        self.dropped = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def publish(self, topic: str, payload: str, qos: int = 1) -> bool:
+        """Queue a message without waiting; returns False if it was dropped."""
+        if not self.running:
+            logger.debug(f"MQTT publisher not started, dropping message to {topic}")
+            self.dropped += 1
+            return False
+        try:
+            self._queue.put_nowait((topic, payload, qos))
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"⚠️ MQTT publish queue full, dropping message to {topic}")
+            return False
+
+    def publish_states(self, states: Mapping[str, str]) -> None:
+        """Send the desired state of each device to its control topic."""
+        for device_id, state in states.items():
+            self.publish(control_topic(device_id), state)
+
+    # paho callbacks run in the network thread and hand over to the event loop
+    def _on_connect(self, client, userdata, flags, rc):
+        self._loop.call_soon_threadsafe(self._set_connected, rc == 0)
+        if rc == 0:
+            logger.info(f"✅ MQTT publisher connected to {self.host}:{self.port}")
+        else:
+            logger.error(f"❌ MQTT publisher connection refused, return code {rc}")
+
+    def _on_disconnect(self, client, userdata, rc):
+        self._loop.call_soon_threadsafe(self._set_connected, False)
+        if rc != 0:
+            logger.warning(f"⚠️ MQTT publisher disconnected (rc={rc}), reconnecting")
+
+    def _on_publish(self, client, userdata, mid):
+        self._loop.call_soon_threadsafe(self._acknowledge, mid)
+
+    def _set_connected(self, connected: bool):
+        self.connected = connected
+
+    def _acknowledge(self, mid: int):
+        # Scheduled on the loop, so it always runs after _send registered the mid
+        if self._inflight.pop(mid, None) is not None:
+            self.acked += 1
+            self._window.release()
+
+    async def _send(self):
+        while True:
+            topic, payload, qos = await self._queue.get()
+            await self._window.acquire()
+            info = self.client.publish(topic, payload, qos=qos)
+            if info.rc not in (mqtt.MQTT_ERR_SUCCESS, mqtt.MQTT_ERR_NO_CONN):
+                # Anything but "queued until reconnect" means paho did not keep the message
+                self._window.release()
+                self.dropped += 1
+                logger.error(f"❌ MQTT publish to {topic} failed: {mqtt.error_string(info.rc)}")
+                continue
+            self._inflight[info.mid] = (topic, payload, qos)
+            self.published += 1
+
+    def start(self):
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._window = asyncio.Semaphore(self.max_inflight)
+        self.client = mqtt.Client()
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.on_publish = self._on_publish
+        self.client.max_inflight_messages_set(self.max_inflight)
+        self.client.reconnect_delay_set(min_delay=self.reconnect_min, max_delay=self.reconnect_max)
+        # connect_async + loop_start: the network thread connects, and keeps retrying, without blocking startup
+        self.client.connect_async(self.host, self.port, self.keepalive)
+        self.client.loop_start()
+        self._task = asyncio.create_task(self._send())
+
+    async def stop(self, timeout: float = 5.0):
+        """Give queued and unacknowledged messages up to `timeout` seconds, then disconnect."""
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._drain(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Stopping MQTT publisher with {self._queue.qsize() + len(self._inflight)} message(s) undelivered")
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        self.client.disconnect()
+        # loop_stop joins the network thread
+        await asyncio.to_thread(self.client.loop_stop)
+        self._inflight.clear()
+        self.connected = False
+
+    async def _drain(self):
+        while not self._queue.empty() or self._inflight:
+            await asyncio.sleep(0.05)
+
+    def stats(self) -> dict:
+        return {
+            "connected": self.connected,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "inflight": len(self._inflight),
+            "max_inflight": self.max_inflight,
+            "published": self.published,
+            "acked": self.acked,
+            "dropped": self.dropped,
+        }
+
+
+mqtt_publisher = MqttPublisher()
@@ -1,6 +1,12 @@
-from app.models.rule import Rule
+import time
+from typing import Optional
+
+from app.core.metrics import EVENT_TO_ACTION_SYNC
 from app.models.event import Event
 from app.models.consequence import Consequence
+from app.services.action_dispatcher import dispatch_actions
+from app.services.consequence_service import create_executed_consequences
+from app.services.rule_engine import OPERATORS, rule_engine
 from fastapi import HTTPException
 import logging
 
@@ -8,41 +14,44 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)  # 👈 make sure logs are visible
 
 def compare(value: float, operator: str, target: float) -> bool:
-    if operator == ">":
-        return value > target
-    if operator == "<":
-        return value < target
-    if operator == "==":
-        return value == target
-    return False
-
-async def process_event(event: Event):
+    """One comparison with the rule engine's OPERATORS; unknown operators never match."""
+    op = OPERATORS.get(operator)
+    return op is not None and op(value, target)
+
+async def process_event(event: Event, ingested_at: Optional[float] = None):
+    """`ingested_at` (epoch seconds) times the path from ingest to the applied actions."""
     try:
         logger.info(f"🔁 Reactor triggered for event type: {event.event_type}")
         
-        # ✅ Step 1: Get matching rules
-        rules = await Rule.find(Rule.trigger_type == event.event_type).to_list()
-        logger.info(f"Found {len(rules)} rule(s) matching event type '{event.event_type}'")
+        # ✅ Step 1: Get matching rules from the shared rule engine
+        await rule_engine.ensure_loaded()
+        rules = rule_engine.match(event)
+        logger.info(f"Found {len(rules)} rule(s) triggered by event type '{event.event_type}'")
 
+        consequences = []
         for rule in rules:
-            logger.info(f"Evaluating rule: {rule.name} for device {rule.target_device_id}")
-            for key, threshold in rule.condition.items():
-                event_value = event.data.get(key)
-                logger.info(f"Condition: event[{key}] = {event_value}, rule {rule.operator} {threshold}")
-
-                if event_value is not None and compare(event_value, rule.operator, threshold):
-                    logger.info(f"✅ Rule '{rule.name}' triggered by event {event.id} (value: {event_value})")
-
-                    consequence = Consequence(
-                        event_id=str(event.id),
-                        rule_id=str(rule.id),
-                        action=rule.action,
-                        device_id=rule.target_device_id,
-                        status="pending"
-                    )
-
-                    await consequence.insert()
-                    logger.info(f"📦 Consequence created for device {rule.target_device_id}")
+            logger.info(f"✅ Rule '{rule.name}' triggered by event {event.id}")
+
+            consequences.append(Consequence(
+                event_id=str(event.id),
+                rule_id=str(rule.id),
+                action=rule.action,
+                device_id=rule.target_device_id,
+            ))
+
+        if not consequences:
+            return
+
+        # ✅ Step 2: Apply the actions, one state change per target device
+        await dispatch_actions(consequences)
+        if ingested_at is not None:
+            latency = time.time() - ingested_at
+            EVENT_TO_ACTION_SYNC.observe(latency)
+            for consequence in consequences:
+                consequence.latency_seconds = latency
+        # ✅ Step 3: Record them as executed, as the reactor worker does; a failed dispatch records nothing
+        await create_executed_consequences(consequences)
+        logger.info(f"📦 {len(consequences)} consequence(s) executed")
 
     except Exception as e:
         logger.error(f"🚨 Error in reactor: {e}")
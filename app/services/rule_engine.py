@@ -0,0 +1,526 @@
+# services/rule_engine.py
+import asyncio
+import logging
+import operator
+import time
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Set, Tuple, Union
+
+from app.constants import (
+    REACTOR_VECTORIZE_MIN_BATCH,
+    RULE_INDEX_TTL_SECONDS,
+    RULE_REORDER_INTERVAL_EVENTS,
+)
+from app.core.metrics import RULE_EVALUATIONS, RULE_MATCHES
+from app.models.event import Event
+from app.models.rule import ConditionGroup, ConditionLeaf, Rule
+from app.services.rule_expression import parse_expression
+from app.services.rule_index import ConditionIndex, is_number
+from app.services.vectorized_rules import match_batch
+from app.services.window_state import WindowStore, aggregate_key, event_time, window_store
+
+logger = logging.getLogger(__name__)
+
+OPERATORS = {
+    ">": operator.gt,
+    "<": operator.lt,
+    "==": operator.eq,
+    ">=": operator.ge,
+    "<=": operator.le
+}
+
+# How often a leaf is assumed to hold until it has been observed on
+# MIN_OBSERVED_EVENTS events of its trigger type.
+OPERATOR_PRIORS = {"==": 0.05, ">": 0.5, "<": 0.5, ">=": 0.5, "<=": 0.5}
+MIN_OBSERVED_EVENTS = 100
+
+# (event type, values the conditions are evaluated against)
+NormalizedEvent = Tuple[Optional[str], Mapping[str, Any]]
+
+# (aggregate, source key, window seconds) of a windowed condition
+Aggregate = Tuple[str, str, float]
+
+
+def normalize_event(event: Union[Event, Mapping[str, Any]]) -> NormalizedEvent:
+    """
+    Bring the two event shapes the engine sees into one form:
+    Event documents ({event_type, data}) from the HTTP path, and flat queue
+    events ({"type", <key>: <value>, ...}) from the Redis reactor.
+    """
+    if isinstance(event, Mapping):
+        event_type = event.get("type", event.get("event_type"))
+        data = event.get("data")
+        return event_type, data if isinstance(data, Mapping) else event
+    return event.event_type, event.data
+
+
+def event_device(event: Union[Event, Mapping[str, Any]]) -> Optional[str]:
+    device_id = event.get("device_id") if isinstance(event, Mapping) else getattr(event, "device_id", None)
+    return str(device_id) if device_id is not None else None
+
+
+class Leaf:
+    """
+    One `key <operator> value` comparison. The engine interns leaves, so a
+    comparison shared by many rules is evaluated once per event. Windowed
+    leaves compare the derived key aggregate_key(*aggregate) instead.
+    """
+
+    __slots__ = ("trigger_type", "key", "operator", "value", "aggregate", "compare", "refs", "direct", "anchored", "hits")
+
+    def __init__(self, trigger_type: str, key: str, operator: str, value: float, aggregate: Optional[Aggregate] = None):
+        self.trigger_type = trigger_type
+        self.key = key
+        self.operator = operator
+        self.value = value
+        self.aggregate = aggregate
+        self.compare = OPERATORS.get(operator)
+        self.refs = 0
+        # Rules whose whole condition is this leaf, fired without evaluation
+        self.direct: Dict[str, Rule] = {}
+        # Compound rules evaluated whenever this leaf holds, by rule id
+        self.anchored: Dict[str, "CompiledRule"] = {}
+        self.hits = 0
+
+    def holds(self, true_leaves: set) -> bool:
+        return self in true_leaves
+
+    def test(self, values: Mapping[str, Any]) -> bool:
+        value = values.get(self.key)
+        return self.compare is not None and is_number(value) and self.compare(value, self.value)
+
+    def probability(self, seen: int) -> float:
+        if seen < MIN_OBSERVED_EVENTS:
+            return OPERATOR_PRIORS.get(self.operator, 0.5)
+        return self.hits / seen
+
+    def anchors(self, seen: int) -> List["Leaf"]:
+        return [self]
+
+    def reorder(self, seen: int) -> None:
+        pass
+
+
+class Group:
+    """AND (`any=False`) or OR (`any=True`) of child nodes, evaluated with short-circuit."""
+
+    __slots__ = ("any", "children")
+
+    def __init__(self, any: bool, children: list):
+        self.any = any
+        self.children = children
+
+    def holds(self, true_leaves: set) -> bool:
+        if self.any:
+            for child in self.children:
+                if child.holds(true_leaves):
+                    return True
+            return False
+        for child in self.children:
+            if not child.holds(true_leaves):
+                return False
+        return True
+
+    def test(self, values: Mapping[str, Any]) -> bool:
+        if self.any:
+            return any(child.test(values) for child in self.children)
+        return all(child.test(values) for child in self.children)
+
+    def probability(self, seen: int) -> float:
+        p = 1.0
+        for child in self.children:
+            p *= (1.0 - child.probability(seen)) if self.any else child.probability(seen)
+        return 1.0 - p if self.any else p
+
+    def anchors(self, seen: int) -> List[Leaf]:
+        """
+        Leaves under which the rule must be registered so it is evaluated
+        whenever it can hold: all anchors of an OR's children, but only the
+        rarest child of an AND, since every child of an AND has to hold.
+        """
+        if self.any:
+            leaves = {}
+            for child in self.children:
+                for leaf in child.anchors(seen):
+                    leaves[id(leaf)] = leaf
+            return list(leaves.values())
+        candidates = [child.anchors(seen) for child in self.children]
+        return min(candidates, key=lambda leaves: sum(leaf.probability(seen) for leaf in leaves))
+
+    def reorder(self, seen: int) -> None:
+        # AND checks the child most likely to fail first, OR the one most likely to hold
+        for child in self.children:
+            child.reorder(seen)
+        self.children.sort(key=lambda child: child.probability(seen), reverse=self.any)
+
+
+Node = Union[Leaf, Group]
+Intern = Callable[..., Leaf]
+
+
+def compile_condition(rule: Rule, intern: Intern = Leaf) -> Optional[Node]:
+    """
+    Build the evaluation tree of `rule`: its condition_tree (parsed from its
+    expression if only that was stored), or for legacy rules an OR of
+    `key <operator> threshold` leaves, so the rule fires once however many
+    keys match. Returns None for rules without conditions.
+    """
+    tree = getattr(rule, "condition_tree", None)
+    expression = getattr(rule, "expression", None)
+    if tree is None and isinstance(expression, str):
+        tree = parse_expression(expression)
+    if isinstance(tree, (ConditionGroup, ConditionLeaf)):
+        return _compile_node(tree, rule.trigger_type, intern)
+    leaves = [
+        intern(rule.trigger_type, key, rule.operator, threshold)
+        for key, threshold in (rule.condition or {}).items()
+    ]
+    return _simplify(True, leaves)
+
+
+def _compile_node(node, trigger_type: str, intern: Intern) -> Optional[Node]:
+    if isinstance(node, ConditionLeaf):
+        if node.aggregate is None:
+            return intern(trigger_type, node.key, node.operator, node.value)
+        aggregate = (node.aggregate, node.key, node.window_seconds)
+        return intern(trigger_type, aggregate_key(*aggregate), node.operator, node.value, aggregate)
+    any_ = node.op == "or"
+    children = []
+    for child in node.conditions:
+        compiled = _compile_node(child, trigger_type, intern)
+        # (a AND (b AND c)) is evaluated as (a AND b AND c)
+        if isinstance(compiled, Group) and compiled.any == any_:
+            children.extend(compiled.children)
+        elif compiled is not None:
+            children.append(compiled)
+    return _simplify(any_, children)
+
+
+def _simplify(any_: bool, children: list) -> Optional[Node]:
+    # Interned leaves are shared objects, so duplicates are found by identity
+    unique = list({id(child): child for child in children}.values())
+    if not unique:
+        return None
+    if len(unique) == 1:
+        return unique[0]
+    return Group(any_, unique)
+
+
+class CompiledRule:
+    """
+    A Rule compiled once into a reusable predicate: its conditions become a
+    tree of interned leaves that is evaluated with short-circuit AND/OR.
+    """
+
+    __slots__ = ("rule", "id", "trigger_type", "root", "leaves", "anchors", "shared")
+
+    def __init__(self, rule: Rule, intern: Intern = Leaf):
+        self.rule = rule
+        self.id = str(rule.id)
+        self.trigger_type = rule.trigger_type
+        self.root = compile_condition(rule, intern)
+        self.leaves: List[Leaf] = []
+        if self.root is not None:
+            self._collect(self.root)
+        self.anchors: List[Leaf] = []
+        # Rules anchored under several leaves must only be evaluated once per event
+        self.shared = False
+
+    def _collect(self, node: Node) -> None:
+        if isinstance(node, Leaf):
+            if node not in self.leaves:
+                self.leaves.append(node)
+        else:
+            for child in node.children:
+                self._collect(child)
+
+    def __call__(self, event_type: Optional[str], values: Mapping[str, Any]) -> bool:
+        if event_type != self.trigger_type or self.root is None:
+            return False
+        return self.root.test(values)
+
+
+class RuleEngine:
+    """
+    The single rule evaluator shared by the HTTP path (reactor_service) and
+    the Redis reactor worker.
+
+    Rules are compiled once into CompiledRule trees whose leaves are interned
+    and kept in a ConditionIndex. An event is matched by looking up the
+    leaves it satisfies (one bisect per distinct key and operator), then
+    evaluating only the rules anchored under those leaves. Rules are loaded
+    lazily from MongoDB, updated in place on rule writes, and reloaded after
+    RULE_INDEX_TTL_SECONDS so writes made by other replicas are picked up.
+
+    Windowed conditions are served from `windows`: before matching, each
+    event updates the windows its trigger type's rules refer to, and the
+    aggregates are added to the event values under their derived keys.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = RULE_INDEX_TTL_SECONDS,
+        vectorize_min_batch: int = REACTOR_VECTORIZE_MIN_BATCH,
+        reorder_interval: int = RULE_REORDER_INTERVAL_EVENTS,
+        windows: WindowStore = window_store,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.vectorize_min_batch = vectorize_min_batch
+        self.reorder_interval = reorder_interval
+        self.windows = windows
+        self.index = ConditionIndex()
+        self._rules: Dict[str, CompiledRule] = {}
+        self._leaves: Dict[tuple, Leaf] = {}
+        # trigger type -> source key -> window seconds -> [(aggregate, derived key)]
+        self._window_specs: Dict[str, Dict[str, Dict[float, List[Tuple[str, str]]]]] = {}
+        # Compiled rules per trigger type, by rule id
+        self._by_type: Dict[Optional[str], Dict[str, CompiledRule]] = {}
+        # Events seen per trigger type that has rules, the denominator of leaf
+        # selectivity, and events since that type's rules were last reordered
+        self._seen: Dict[Optional[str], int] = {}
+        self._since_reorder: Dict[Optional[str], int] = {}
+        self._reorder_scheduled: Set[Optional[str]] = set()
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def __len__(self) -> int:
+        return len(self._rules)
+
+    def _is_stale(self) -> bool:
+        if self._loaded_at is None:
+            return True
+        if self.ttl_seconds <= 0:
+            return False
+        return time.monotonic() - self._loaded_at > self.ttl_seconds
+
+    async def ensure_loaded(self) -> None:
+        if not self._is_stale():
+            return
+        async with self._lock:
+            # Another task may have reloaded while we were waiting
+            if self._is_stale():
+                await self.reload()
+
+    async def reload(self) -> None:
+        self.load(await Rule.find_all().to_list())
+
+    def load(self, rules: Sequence[Rule]) -> None:
+        """Compile `rules` and replace the engine contents with them."""
+        previous = self._leaves
+        previous_seen = self._seen
+        self._rules = {}
+        self._leaves = {}
+        self._by_type = {}
+        self._seen = {}
+        self._since_reorder = {}
+        compiled = [self._compile(rule, previous) for rule in rules]
+        for trigger_type in self._seen:
+            self._seen[trigger_type] = previous_seen.get(trigger_type, 0)
+        self.index.load(self._leaves.values())
+        self._build_window_specs()
+        for rule in compiled:
+            self._anchor(rule)
+        self._loaded_at = time.monotonic()
+        logger.info(f"Rule engine loaded with {len(self._rules)} rule(s) over {len(self._leaves)} distinct condition(s)")
+
+    def invalidate(self) -> None:
+        """Drop all compiled rules; the next lookup reloads them from MongoDB."""
+        self.index = ConditionIndex()
+        self._rules = {}
+        self._leaves = {}
+        self._window_specs = {}
+        self._by_type = {}
+        self._seen = {}
+        self._since_reorder = {}
+        self._loaded_at = None
+
+    def add(self, rule: Rule) -> None:
+        # Nothing to update until the engine has been loaded; the first
+        # lookup will read the new rule from MongoDB anyway.
+        if not self.loaded:
+            return
+        # Removing a type's only rule forgets its event count; replacing that rule should not
+        seen = self._seen.get(rule.trigger_type, 0)
+        self.remove(str(rule.id))
+        known = set(self._leaves)
+        compiled = self._compile(rule)
+        self._seen[compiled.trigger_type] = max(self._seen[compiled.trigger_type], seen)
+        added = [leaf for key, leaf in self._leaves.items() if key not in known]
+        for leaf in added:
+            self.index.add(leaf)
+        if any(leaf.aggregate for leaf in added):
+            self._build_window_specs()
+        self._anchor(compiled)
+
+    def remove(self, rule_id: str) -> None:
+        compiled = self._rules.pop(rule_id, None)
+        if compiled is None:
+            return
+        self._unanchor(compiled)
+        same_type = self._by_type[compiled.trigger_type]
+        del same_type[rule_id]
+        if not same_type:
+            del self._by_type[compiled.trigger_type]
+            del self._seen[compiled.trigger_type]
+            del self._since_reorder[compiled.trigger_type]
+        windows_changed = False
+        for leaf in compiled.leaves:
+            leaf.refs -= 1
+            if leaf.refs == 0:
+                del self._leaves[(leaf.trigger_type, leaf.key, leaf.operator, leaf.value)]
+                self.index.remove(leaf)
+                windows_changed = windows_changed or leaf.aggregate is not None
+        if windows_changed:
+            self._build_window_specs()
+
+    def compiled(self, rule_id: str) -> Optional[CompiledRule]:
+        return self._rules.get(rule_id)
+
+    def match(self, event: Union[Event, Mapping[str, Any]]) -> List[Rule]:
+        """Rules whose conditions hold for one event, each listed once."""
+        event_type, values = self._prepare(event)
+        return self._fire(event_type, self.index.match(event_type, values))
+
+    def match_many(self, events: Sequence[Union[Event, Mapping[str, Any]]]) -> List[List[Rule]]:
+        """match() for a batch, vectorized once the batch is large enough to pay off."""
+        if len(events) < self.vectorize_min_batch:
+            return [self.match(event) for event in events]
+        normalized = [self._prepare(event) for event in events]
+        matches = match_batch(self.index, normalized)
+        return [self._fire(event_type, leaves) for (event_type, _), leaves in zip(normalized, matches)]
+
+    def _prepare(self, event: Union[Event, Mapping[str, Any]]) -> NormalizedEvent:
+        """Normalize the event and add the windowed aggregates its rules refer to."""
+        event_type, values = normalize_event(event)
+        specs = self._window_specs.get(event_type)
+        if not specs:
+            return event_type, values
+        device_id = event_device(event)
+        if device_id is None:
+            return event_type, values
+
+        timestamp = event_time(event)
+        derived = dict(values)
+        for key, windows in specs.items():
+            value = values.get(key)
+            if not is_number(value):
+                continue
+            for window_seconds, aggregates in windows.items():
+                window = self.windows.observe(device_id, key, window_seconds, timestamp, value)
+                for aggregate, derived_key in aggregates:
+                    result = window.value(aggregate)
+                    if result is not None:
+                        derived[derived_key] = result
+        return event_type, derived
+
+    def _build_window_specs(self) -> None:
+        specs: Dict[str, Dict[str, Dict[float, List[Tuple[str, str]]]]] = {}
+        for leaf in self._leaves.values():
+            if leaf.aggregate is None:
+                continue
+            aggregate, key, window_seconds = leaf.aggregate
+            aggregates = specs.setdefault(leaf.trigger_type, {}).setdefault(key, {}).setdefault(window_seconds, [])
+            if (aggregate, leaf.key) not in aggregates:
+                aggregates.append((aggregate, leaf.key))
+        self._window_specs = specs
+
+    def reorder(self, trigger_type: Optional[str]) -> None:
+        """Re-sort one trigger type's AND/OR children and re-pick anchors from the observed leaf selectivity."""
+        self._reorder_scheduled.discard(trigger_type)
+        rules = self._by_type.get(trigger_type)
+        if rules is None:
+            return
+        seen = self._seen[trigger_type]
+        for compiled in rules.values():
+            if compiled.root is None:
+                continue
+            compiled.root.reorder(seen)
+            self._unanchor(compiled)
+            self._anchor(compiled)
+        self._since_reorder[trigger_type] = 0
+
+    def _schedule_reorder(self, trigger_type: Optional[str]) -> None:
+        # Reordered after the current batch rather than while matching it
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.reorder(trigger_type)
+            return
+        self._reorder_scheduled.add(trigger_type)
+        loop.call_soon(self.reorder, trigger_type)
+
+    def _fire(self, event_type: Optional[str], true_leaves: list) -> List[Rule]:
+        RULE_EVALUATIONS.inc()
+        # Types without rules have no leaves to hold, so they are not counted
+        seen = self._seen.get(event_type)
+        if seen is not None:
+            self._seen[event_type] = seen + 1
+            since = self._since_reorder[event_type] + 1
+            self._since_reorder[event_type] = since
+            if self.reorder_interval and since >= self.reorder_interval and event_type not in self._reorder_scheduled:
+                self._schedule_reorder(event_type)
+        if not true_leaves:
+            return []
+
+        true_set = None
+        fired: List[Rule] = []
+        evaluated = set()
+        for leaf in true_leaves:
+            leaf.hits += 1
+            fired.extend(leaf.direct.values())
+            if not leaf.anchored:
+                continue
+            if true_set is None:
+                true_set = set(true_leaves)
+            for compiled in leaf.anchored.values():
+                if compiled.shared:
+                    if compiled in evaluated:
+                        continue
+                    evaluated.add(compiled)
+                if compiled.root.holds(true_set):
+                    fired.append(compiled.rule)
+        RULE_MATCHES.inc(len(fired))
+        return fired
+
+    def _compile(self, rule: Rule, previous: Optional[Dict[tuple, Leaf]] = None) -> CompiledRule:
+        def intern(trigger_type: str, key: str, operator: str, value: float, aggregate: Optional[Aggregate] = None) -> Leaf:
+            leaf_key = (trigger_type, key, operator, value)
+            leaf = self._leaves.get(leaf_key)
+            if leaf is None:
+                leaf = self._leaves[leaf_key] = Leaf(trigger_type, key, operator, value, aggregate)
+                if previous and leaf_key in previous:
+                    # Keep the observed selectivity across reloads
+                    leaf.hits = previous[leaf_key].hits
+            return leaf
+
+        compiled = CompiledRule(rule, intern)
+        for leaf in compiled.leaves:
+            leaf.refs += 1
+        self._rules[compiled.id] = compiled
+        self._by_type.setdefault(compiled.trigger_type, {})[compiled.id] = compiled
+        self._seen.setdefault(compiled.trigger_type, 0)
+        self._since_reorder.setdefault(compiled.trigger_type, 0)
+        return compiled
+
+    def _anchor(self, compiled: CompiledRule) -> None:
+        if compiled.root is None:
+            return
+        compiled.anchors = compiled.root.anchors(self._seen.get(compiled.trigger_type, 0))
+        compiled.shared = len(compiled.anchors) > 1
+        if isinstance(compiled.root, Leaf):
+            compiled.root.direct[compiled.id] = compiled.rule
+            return
+        for leaf in compiled.anchors:
+            leaf.anchored[compiled.id] = compiled
+
+    def _unanchor(self, compiled: CompiledRule) -> None:
+        for leaf in compiled.anchors:
+            leaf.direct.pop(compiled.id, None)
+            leaf.anchored.pop(compiled.id, None)
+        compiled.anchors = []
+
+
+rule_engine = RuleEngine()
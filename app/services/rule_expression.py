@@ -0,0 +1,87 @@
+# services/rule_expression.py
+import ast
+import math
+
+from app.models.rule import ConditionGroup, ConditionLeaf, ConditionNode
+from app.services.rule_index import is_number
+from app.services.window_state import aggregate_key
+
+MAX_EXPRESSION_LENGTH = 2000
+
+COMPARISONS = {ast.Gt: ">", ast.Lt: "<", ast.Eq: "==", ast.GtE: ">=", ast.LtE: "<="}
+# `28 < temperature` is read as `temperature > 28`
+MIRRORED = {">": "<", "<": ">", "==": "==", ">=": "<=", "<=": ">="}
+AGGREGATE_FUNCTIONS = ("avg", "sum", "min", "max", "count")
+
+
+class ExpressionError(ValueError):
+    pass
+
+
+def parse_expression(expression: str) -> ConditionNode:
+    """
+    Parse a rule expression such as `temperature > 28 and humidity < 40` into
+    a condition tree.
+
+    Only a whitelist of Python syntax is accepted: `and` / `or`, the
+    comparisons > < == >= <= (chains like `18 < temperature < 25` included)
+    between a key and a number, and windowed aggregates written as
+    `avg(temperature, 300)`. Anything else is rejected.
+    """
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise ExpressionError(f"Expression longer than {MAX_EXPRESSION_LENGTH} characters")
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ExpressionError(f"Invalid expression: {e.msg}") from None
+    return _to_condition(tree.body)
+
+
+def _to_condition(node: ast.AST) -> ConditionNode:
+    if isinstance(node, ast.BoolOp):
+        op = "and" if isinstance(node.op, ast.And) else "or"
+        return ConditionGroup(op=op, conditions=[_to_condition(value) for value in node.values])
+    if isinstance(node, ast.Compare):
+        operands = [node.left, *node.comparators]
+        leaves = [
+            _to_leaf(left, op, right)
+            for left, op, right in zip(operands, node.ops, operands[1:])
+        ]
+        return leaves[0] if len(leaves) == 1 else ConditionGroup(op="and", conditions=leaves)
+    raise ExpressionError(f"Unsupported syntax '{ast.unparse(node)}'")
+
+
+def _to_leaf(left: ast.AST, op: ast.cmpop, right: ast.AST) -> ConditionLeaf:
+    operator = COMPARISONS.get(type(op))
+    if operator is None:
+        raise ExpressionError(f"Unsupported comparison '{type(op).__name__}'")
+    left_operand, right_operand = _operand(left), _operand(right)
+    if isinstance(left_operand, float) and isinstance(right_operand, dict):
+        left_operand, right_operand, operator = right_operand, left_operand, MIRRORED[operator]
+    if not (isinstance(left_operand, dict) and isinstance(right_operand, float)):
+        raise ExpressionError(f"'{ast.unparse(left)} {operator} {ast.unparse(right)}' must compare a key with a number")
+    return ConditionLeaf(operator=operator, value=right_operand, **left_operand)
+
+
+def _operand(node: ast.AST):
+    """A number as float, or a key as ConditionLeaf fields."""
+    if isinstance(node, ast.Constant) and is_number(node.value) and math.isfinite(node.value):
+        return float(node.value)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        value = _operand(node.operand)
+        if isinstance(value, float):
+            return -value if isinstance(node.op, ast.USub) else value
+    if isinstance(node, ast.Name):
+        return {"key": node.id}
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id in AGGREGATE_FUNCTIONS
+        and not node.keywords
+        and len(node.args) == 2
+        and isinstance(node.args[0], ast.Name)
+    ):
+        window_seconds = _operand(node.args[1])
+        if isinstance(window_seconds, float) and window_seconds > 0:
+            return {"key": node.args[0].id, "aggregate": node.func.id, "window_seconds": window_seconds}
+    raise ExpressionError(f"Unsupported operand '{ast.unparse(node)}'")
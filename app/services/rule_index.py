@@ -0,0 +1,161 @@
+# services/rule_index.py
+import logging
+import math
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ThresholdIndex:
+    """
+    Entries sharing a (trigger_type, key, operator) triple, kept sorted by
+    threshold so an event value is matched with a bisect plus a slice.
+    """
+
+    __slots__ = ("thresholds", "entries", "array_cache")
+
+    def __init__(self):
+        self.thresholds: List[float] = []
+        self.entries: list = []
+        # Derived representation (e.g. a NumPy array) owned by the caller
+        # that built it; reset on every mutation.
+        self.array_cache = None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, threshold: float, entry) -> None:
+        i = bisect_right(self.thresholds, threshold)
+        self.thresholds.insert(i, threshold)
+        self.entries.insert(i, entry)
+        self.array_cache = None
+
+    def append(self, threshold: float, entry) -> None:
+        """Append without keeping order; call sort() once after bulk loads."""
+        self.thresholds.append(threshold)
+        self.entries.append(entry)
+        self.array_cache = None
+
+    def sort(self) -> None:
+        order = sorted(range(len(self.thresholds)), key=self.thresholds.__getitem__)
+        self.thresholds = [self.thresholds[i] for i in order]
+        self.entries = [self.entries[i] for i in order]
+        self.array_cache = None
+
+    def remove(self, threshold: float, entry) -> bool:
+        lo = bisect_left(self.thresholds, threshold)
+        hi = bisect_right(self.thresholds, threshold, lo)
+        for i in range(lo, hi):
+            if self.entries[i] is entry:
+                del self.thresholds[i]
+                del self.entries[i]
+                self.array_cache = None
+                return True
+        return False
+
+    def match(self, operator: str, value: float) -> list:
+        """Entries whose `value <operator> threshold` comparison holds."""
+        thresholds = self.thresholds
+        if operator == ">":
+            return self.entries[:bisect_left(thresholds, value)]
+        if operator == ">=":
+            return self.entries[:bisect_right(thresholds, value)]
+        if operator == "<":
+            return self.entries[bisect_right(thresholds, value):]
+        if operator == "<=":
+            return self.entries[bisect_left(thresholds, value):]
+        if operator == "==":
+            lo = bisect_left(thresholds, value)
+            return self.entries[lo:bisect_right(thresholds, value, lo)]
+        return []
+
+
+SUPPORTED_OPERATORS = (">", "<", "==", ">=", "<=")
+
+# condition key -> operator -> sorted thresholds
+KeyIndex = Dict[str, Dict[str, ThresholdIndex]]
+
+
+def is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and not math.isnan(value)
+
+
+class ConditionIndex:
+    """
+    Index of condition leaves keyed by trigger type, condition key and
+    operator, with thresholds held in sorted ThresholdIndex arrays.
+
+    Entries only need `trigger_type`, `key`, `operator` and `value`; the
+    rule engine stores its interned leaves here, so matching an event costs
+    one bisect per distinct (key, operator) pair however many rules share it.
+    """
+
+    def __init__(self):
+        self._size = 0
+        self._by_trigger: Dict[str, KeyIndex] = {}
+
+    def __len__(self) -> int:
+        return self._size
+
+    def load(self, leaves: Iterable) -> None:
+        """Replace the index contents with `leaves`."""
+        self._size = 0
+        self._by_trigger = {}
+        for leaf in leaves:
+            self._insert(leaf, bulk=True)
+        for by_key in self._by_trigger.values():
+            for by_operator in by_key.values():
+                for index in by_operator.values():
+                    index.sort()
+
+    def add(self, leaf) -> None:
+        self._insert(leaf)
+
+    def remove(self, leaf) -> bool:
+        by_key = self._by_trigger.get(leaf.trigger_type, {})
+        by_operator = by_key.get(leaf.key, {})
+        index = by_operator.get(leaf.operator)
+        if index is None or not index.remove(leaf.value, leaf):
+            return False
+        self._size -= 1
+        if not index:
+            del by_operator[leaf.operator]
+        if not by_operator:
+            del by_key[leaf.key]
+        if not by_key:
+            self._by_trigger.pop(leaf.trigger_type, None)
+        return True
+
+    def groups(self, trigger_type: Optional[str]) -> KeyIndex:
+        """Condition key -> operator -> ThresholdIndex for one trigger type."""
+        return self._by_trigger.get(trigger_type, {})
+
+    def match(self, trigger_type: Optional[str], values: Mapping[str, float]) -> list:
+        """Leaves of `trigger_type` satisfied by `values`. Non-numeric values never match."""
+        by_key = self._by_trigger.get(trigger_type)
+        if not by_key:
+            return []
+        matched = []
+        for key, value in values.items():
+            by_operator = by_key.get(key)
+            if by_operator is None or not is_number(value):
+                continue
+            for operator, index in by_operator.items():
+                matched.extend(index.match(operator, value))
+        return matched
+
+    def _insert(self, leaf, bulk: bool = False) -> None:
+        if leaf.operator not in SUPPORTED_OPERATORS or not is_number(leaf.value):
+            logger.warning(f"Condition {leaf.key} {leaf.operator} {leaf.value!r} is not supported and will never match")
+            return
+        index = (
+            self._by_trigger.setdefault(leaf.trigger_type, {})
+            .setdefault(leaf.key, {})
+            .setdefault(leaf.operator, ThresholdIndex())
+        )
+        if bulk:
+            index.append(leaf.value, leaf)
+        else:
+            index.add(leaf.value, leaf)
+        self._size += 1
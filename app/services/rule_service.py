@@ -1,42 +1,26 @@
 from app.models.rule import Rule
 from app.schemas.rule import RuleCreate
+from app.services.rule_engine import OPERATORS, rule_engine
 from fastapi import HTTPException
 import logging
 from typing import List
-import operator
 logger = logging.getLogger(__name__)
 
 
-OPERATORS = {
-    ">": operator.gt,
-    "<": operator.lt,
-    "==": operator.eq,
-    ">=": operator.ge,
-    "<=": operator.le
-}
 async def get_matching_rules(event: dict) -> List[Rule]:
-    all_rules = await Rule.find_all().to_list()
-    matched_rules = []
+    await rule_engine.ensure_loaded()
+    return match_rules(event)
 
-    for rule in all_rules:
-        if rule.trigger_type != event.get("type"):
-            continue
-        
-        # Example: rule.condition = {"temperature": 28.0}
-        for key, value in rule.condition.items():
-            if key not in event:
-                continue
-            event_value = event[key]
-            op = OPERATORS.get(rule.operator)
-            if op and op(event_value, value):
-                matched_rules.append(rule)
-
-    return matched_rules
+def match_rules(event: dict) -> List[Rule]:
+    """Match a queued event against the already-loaded rule engine."""
+    # Example: rule.condition = {"temperature": 28.0}
+    return rule_engine.match(event)
 
 async def create_rule(rule_in: RuleCreate) -> Rule:
     try:
         rule = Rule(**rule_in.dict())
         await rule.insert()
+        rule_engine.add(rule)
         logger.info(f"Created rule: {rule.name}")
         return rule
     except Exception as e:
@@ -58,6 +42,7 @@ async def delete_rule_by_id(rule_id: str) -> bool:
         if not rule:
             raise HTTPException(status_code=404, detail="Rule not found")
         await rule.delete()
+        rule_engine.remove(str(rule.id))
         return True
     except Exception as e:
         logger.error(f"Error deleting rule: {e}")
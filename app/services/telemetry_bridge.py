@@ -0,0 +1,229 @@
+# services/telemetry_bridge.py
+import asyncio
+import json
+import logging
+import time
+from typing import List, Optional, Tuple
+
+import paho.mqtt.client as mqtt
+from pydantic import ValidationError
+
+from app.constants import (
+    MQTT_BROKER,
+    MQTT_KEEPALIVE_SECONDS,
+    MQTT_PORT,
+    MQTT_RECONNECT_MAX_SECONDS,
+    MQTT_RECONNECT_MIN_SECONDS,
+    MQTT_TELEMETRY_BATCH_SIZE,
+    MQTT_TELEMETRY_FLUSH_INTERVAL_SECONDS,
+    MQTT_TELEMETRY_MAX_PENDING,
+    MQTT_TELEMETRY_QOS,
+    MQTT_TELEMETRY_TOPIC,
+)
+from app.schemas.event import EventCreate
+from app.services.event_service import ingest_events
+from app.services.topic_trie import TopicTrie
+
+logger = logging.getLogger(__name__)
+
+# Keys of a flat payload that are not readings
+RESERVED_KEYS = ("device_id", "event_type", "type", "data", "timestamp", "meta")
+
+# (topic, payload)
+Telemetry = Tuple[str, bytes]
+
+
+def decode_telemetry(topic_filter: str, topic: str, payload: bytes) -> EventCreate:
+    """
+    Decode a telemetry message into an EventCreate.
+
+    The payload is JSON, either shaped like POST /api/monitor/
+    (`{"event_type": ..., "data": {...}}`) or flat like a queue event
+    (`{"type": ..., "temperature": 21.5}`). The device id comes from the
+    topic level matched by "+" in `topic_filter`, or from the payload when
+    the filter has no "+".
+    """
+    body = json.loads(payload)
+    if not isinstance(body, dict):
+        raise ValueError("Telemetry payload must be a JSON object")
+    filter_levels = topic_filter.split("/")
+    device_id = body.get("device_id")
+    if "+" in filter_levels:
+        levels = topic.split("/")
+        device_id = levels[filter_levels.index("+")]
+    data = body.get("data")
+    if data is None:
+        data = {key: value for key, value in body.items() if key not in RESERVED_KEYS}
+    return EventCreate(
+        device_id=device_id,
+        event_type=body.get("event_type") or body.get("type"),
+        data=data,
+    )
+
+
+class TelemetryBridge:
+    """
+    MQTT subscriber that takes sensor readings off the HTTP stack.
+
+    Messages on `topic` are received by the paho network thread and handed
+    to the event loop, where they are decoded and ingested in batches of
+    `batch_size` (or every `flush_interval` seconds): one buffered
+    insert_many into `events` and one push onto the reactor queue per batch.
+    Undecodable messages are counted and skipped; once `max_pending`
+    readings are waiting, new ones are dropped instead of growing memory.
+    """
+
+    def __init__(
+        self,
+        topic: str = MQTT_TELEMETRY_TOPIC,
+        qos: int = MQTT_TELEMETRY_QOS,
+        host: str = MQTT_BROKER,
+        port: int = MQTT_PORT,
+        batch_size: int = MQTT_TELEMETRY_BATCH_SIZE,
+        flush_interval: float = MQTT_TELEMETRY_FLUSH_INTERVAL_SECONDS,
+        max_pending: int = MQTT_TELEMETRY_MAX_PENDING,
+    ):
+        self.topic = topic
+        self.qos = qos
+        self.host = host
+        self.port = port
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max(max_pending, batch_size)
+        self.router = TopicTrie()
+        self.router.add(topic, self.receive)
+        self.client: Optional[mqtt.Client] = None
+        self.connected = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: List[Telemetry] = []
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.received = 0
+        self.ingested = 0
+        self.invalid = 0
+        self.dropped = 0
+        self.failed = 0
+        self.last_flush_seconds = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    # paho callbacks run in the network thread and hand over to the event loop
+    def _on_connect(self, client, userdata, flags, rc):
+        if rc == 0:
+            # Subscribing on every connect restores the subscriptions after a reconnect
+            for topic_filter in self.router.filters():
+                client.subscribe(topic_filter, qos=self.qos)
+            logger.info(f"✅ Telemetry bridge subscribed to {self.router.filters()} on {self.host}:{self.port}")
+        else:
+            logger.error(f"❌ Telemetry bridge connection refused, return code {rc}")
+        self._loop.call_soon_threadsafe(self._set_connected, rc == 0)
+
+    def _on_disconnect(self, client, userdata, rc):
+        self._loop.call_soon_threadsafe(self._set_connected, False)
+        if rc != 0:
+            logger.warning(f"⚠️ Telemetry bridge disconnected (rc={rc}), reconnecting")
+
+    def _on_message(self, client, userdata, message):
+        self._loop.call_soon_threadsafe(self.router.dispatch, message.topic, message.payload)
+
+    def _set_connected(self, connected: bool):
+        self.connected = connected
+
+    def receive(self, topic: str, payload: bytes):
+        self.received += 1
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        self._pending.append((topic, payload))
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    def decode(self, batch: List[Telemetry]) -> List[EventCreate]:
+        events = []
+        for topic, payload in batch:
+            try:
+                events.append(decode_telemetry(self.topic, topic, payload))
+            except (ValueError, ValidationError) as e:
+                # json.JSONDecodeError is a ValueError
+                self.invalid += 1
+                logger.warning(f"⚠️ Skipping invalid telemetry on {topic}: {e}")
+        return events
+
+    async def flush(self):
+        while self._pending:
+            batch = self._pending[:self.batch_size]
+            del self._pending[:self.batch_size]
+            events = self.decode(batch)
+            if not events:
+                continue
+            start = time.perf_counter()
+            try:
+                await ingest_events(events)
+                self.ingested += len(events)
+            except asyncio.CancelledError:
+                # Stopped mid-ingest: the final flush in stop() takes the batch
+                # again, and decodes it again, so its invalid readings are uncounted.
+                self._pending[:0] = batch
+                self.invalid -= len(batch) - len(events)
+                raise
+            except Exception as e:
+                # The broker already considers these delivered, so they are not retried
+                self.failed += len(events)
+                logger.error(f"❌ Ingesting {len(events)} telemetry reading(s) failed: {e}")
+            self.last_flush_seconds = time.perf_counter() - start
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self.client = mqtt.Client()
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.on_message = self._on_message
+        self.client.reconnect_delay_set(min_delay=MQTT_RECONNECT_MIN_SECONDS, max_delay=MQTT_RECONNECT_MAX_SECONDS)
+        self.client.connect_async(self.host, self.port, MQTT_KEEPALIVE_SECONDS)
+        self.client.loop_start()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Disconnect, then ingest whatever was already received."""
+        if not self.running:
+            return
+        self.client.disconnect()
+        # loop_stop joins the network thread, after which no message can arrive
+        await asyncio.to_thread(self.client.loop_stop)
+        self.connected = False
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "topic": self.topic,
+            "connected": self.connected,
+            "depth": len(self._pending),
+            "received": self.received,
+            "ingested": self.ingested,
+            "invalid": self.invalid,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "last_flush_seconds": self.last_flush_seconds,
+        }
+
+
+telemetry_bridge = TelemetryBridge()
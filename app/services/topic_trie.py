@@ -0,0 +1,121 @@
+# services/topic_trie.py
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Called with (topic, payload)
+Handler = Callable[[str, Any], Any]
+Route = Tuple[str, Handler]
+
+
+def validate_filter(topic_filter: str) -> List[str]:
+    """Split an MQTT topic filter into levels, rejecting misplaced wildcards."""
+    levels = topic_filter.split("/")
+    for i, level in enumerate(levels):
+        if "#" in level and (level != "#" or i != len(levels) - 1):
+            raise ValueError(f"'#' must be a whole level at the end of '{topic_filter}'")
+        if "+" in level and level != "+":
+            raise ValueError(f"'+' must be a whole level in '{topic_filter}'")
+    return levels
+
+
+class _Node:
+    __slots__ = ("children", "routes")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.routes: List[Route] = []
+
+
+class TopicTrie:
+    """
+    MQTT topic filters (with `+` and `#` wildcards) mapped to handlers.
+
+    Filters are stored one level per node, so matching a topic walks its
+    levels once and only branches into the `+` and `#` children present at
+    each level: the cost depends on the topic depth and the wildcards that
+    can apply, not on how many filters are registered. As in MQTT, `a/#`
+    also matches `a`, and wildcards in the first level do not match topics
+    starting with `$`.
+    """
+
+    def __init__(self):
+        self._root = _Node()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, topic_filter: str, handler: Handler) -> None:
+        node = self._root
+        for level in validate_filter(topic_filter):
+            node = node.children.setdefault(level, _Node())
+        node.routes.append((topic_filter, handler))
+        self._size += 1
+
+    def remove(self, topic_filter: str, handler: Optional[Handler] = None) -> bool:
+        """Remove the routes of `topic_filter` (only `handler`'s if given); returns whether any were removed."""
+        path = [self._root]
+        for level in validate_filter(topic_filter):
+            node = path[-1].children.get(level)
+            if node is None:
+                return False
+            path.append(node)
+        node = path[-1]
+        kept = [route for route in node.routes if handler is not None and route[1] != handler]
+        removed = len(node.routes) - len(kept)
+        node.routes = kept
+        self._size -= removed
+        # Prune the branch back up to the first node that is still needed
+        levels = topic_filter.split("/")
+        for depth in range(len(levels), 0, -1):
+            child = path[depth]
+            if child.routes or child.children:
+                break
+            del path[depth - 1].children[levels[depth - 1]]
+        return removed > 0
+
+    def filters(self) -> List[str]:
+        """Every registered filter once, e.g. to subscribe to them."""
+        found: List[str] = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            # A filter's levels are its path, so every route of a node has the same filter
+            if node.routes:
+                found.append(node.routes[0][0])
+            stack.extend(node.children.values())
+        return found
+
+    def match(self, topic: str) -> List[Route]:
+        routes: List[Route] = []
+        nodes = [self._root]
+        for i, level in enumerate(topic.split("/")):
+            wildcards = not (i == 0 and level.startswith("$"))
+            matched = []
+            for node in nodes:
+                if wildcards:
+                    rest = node.children.get("#")
+                    if rest is not None:
+                        routes.extend(rest.routes)
+                    single = node.children.get("+")
+                    if single is not None:
+                        matched.append(single)
+                exact = node.children.get(level)
+                if exact is not None:
+                    matched.append(exact)
+            nodes = matched
+            if not nodes:
+                return routes
+        for node in nodes:
+            routes.extend(node.routes)
+            # "a/#" also matches "a" itself
+            rest = node.children.get("#")
+            if rest is not None:
+                routes.extend(rest.routes)
+        return routes
+
+    def dispatch(self, topic: str, payload: Any) -> int:
+        """Call every handler whose filter matches `topic`; returns how many were called."""
+        routes = self.match(topic)
+        for _, handler in routes:
+            handler(topic, payload)
+        return len(routes)
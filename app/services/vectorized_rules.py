@@ -0,0 +1,76 @@
+# services/vectorized_rules.py
+from collections import defaultdict
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.rule_index import ConditionIndex, ThresholdIndex, is_number
+
+# Thresholds are sorted, so each event's row of the events x thresholds match
+# matrix is one contiguous run: `value > t` holds for a prefix of the array,
+# `value < t` for a suffix and `value == t` for a range. np.searchsorted finds
+# the run boundaries of the whole batch in one call; (side, run) per operator.
+MATCH_RUNS = {
+    ">": ("left", "prefix"),
+    ">=": ("right", "prefix"),
+    "<": ("right", "suffix"),
+    "<=": ("left", "suffix"),
+    "==": ("left", "range"),
+}
+
+
+def _thresholds_array(index: ThresholdIndex) -> np.ndarray:
+    if index.array_cache is None:
+        index.array_cache = np.asarray(index.thresholds, dtype=np.float64)
+    return index.array_cache
+
+
+def match_batch(
+    index: ConditionIndex,
+    events: Sequence[Tuple[Optional[str], Mapping[str, Any]]],
+) -> List[list]:
+    """
+    Vectorized equivalent of calling ConditionIndex.match on every
+    (event type, values) pair.
+
+    For each (trigger_type, key, operator) group the batch's values are
+    stacked into one array and compared against the group's sorted
+    thresholds in a single NumPy pass. Returns the satisfied entries per
+    event, aligned with `events`.
+    """
+    results: List[list] = [[] for _ in events]
+
+    positions_by_type: Dict[Optional[str], List[int]] = defaultdict(list)
+    for position, (event_type, _) in enumerate(events):
+        positions_by_type[event_type].append(position)
+
+    for trigger_type, positions in positions_by_type.items():
+        for key, by_operator in index.groups(trigger_type).items():
+            rows = [p for p in positions if is_number(events[p][1].get(key))]
+            if not rows:
+                continue
+            values = np.fromiter((events[p][1][key] for p in rows), dtype=np.float64, count=len(rows))
+
+            for operator, thresholds in by_operator.items():
+                if operator not in MATCH_RUNS:
+                    continue
+                side, run = MATCH_RUNS[operator]
+                threshold_array = _thresholds_array(thresholds)
+                entries = thresholds.entries
+                cuts = np.searchsorted(threshold_array, values, side=side).tolist()
+
+                if run == "prefix":
+                    for row, cut in zip(rows, cuts):
+                        if cut:
+                            results[row].extend(entries[:cut])
+                elif run == "suffix":
+                    for row, cut in zip(rows, cuts):
+                        if cut != len(entries):
+                            results[row].extend(entries[cut:])
+                else:
+                    ends = np.searchsorted(threshold_array, values, side="right").tolist()
+                    for row, start, end in zip(rows, cuts, ends):
+                        if start != end:
+                            results[row].extend(entries[start:end])
+
+    return results
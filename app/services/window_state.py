@@ -0,0 +1,281 @@
+# services/window_state.py
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, List, Mapping, Optional, Set, Tuple
+
+from app.constants import (
+    WINDOW_BUCKETS,
+    WINDOW_MAX_SERIES,
+    WINDOW_SNAPSHOT_CHUNK,
+    WINDOW_SNAPSHOT_INTERVAL_SECONDS,
+    WINDOW_SNAPSHOT_KEY,
+)
+from app.core.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# (device_id, condition key, window seconds)
+SeriesKey = Tuple[str, str, float]
+
+
+def aggregate_key(aggregate: str, key: str, window_seconds: float) -> str:
+    """Name under which a windowed aggregate is exposed to rule conditions, e.g. avg(temperature,300)."""
+    return f"{aggregate}({key},{window_seconds:g})"
+
+
+def event_time(event: Any) -> float:
+    """Epoch seconds of an Event document or queue event, falling back to now."""
+    timestamp = event.get("timestamp") if isinstance(event, Mapping) else getattr(event, "timestamp", None)
+    if isinstance(timestamp, datetime):
+        return timestamp.timestamp()
+    if isinstance(timestamp, str):
+        try:
+            return datetime.fromisoformat(timestamp).timestamp()
+        except ValueError:
+            pass
+    return time.time()
+
+
+class SlidingWindow:
+    """
+    Ring of `buckets` time buckets covering `window_seconds`.
+
+    Each bucket keeps the sum, count, min and max of the values that fell in
+    it, and the window keeps a running sum and count, so adding a value is
+    O(1) and reading min/max is O(buckets). The oldest bucket expires as a
+    whole, so the window is exact to within one bucket width.
+    """
+
+    __slots__ = ("window_seconds", "size", "width", "head", "sums", "counts", "mins", "maxs", "total", "count")
+
+    def __init__(self, window_seconds: float, buckets: int = WINDOW_BUCKETS):
+        self.window_seconds = window_seconds
+        self.size = max(1, buckets)
+        self.width = window_seconds / self.size
+        self.head: Optional[int] = None
+        self.sums = [0.0] * self.size
+        self.counts = [0] * self.size
+        self.mins = [0.0] * self.size
+        self.maxs = [0.0] * self.size
+        self.total = 0.0
+        self.count = 0
+
+    def add(self, timestamp: float, value: float) -> None:
+        bucket = int(timestamp // self.width)
+        self._advance(bucket)
+        if bucket <= self.head - self.size:
+            return  # older than the whole window
+        slot = bucket % self.size
+        if self.counts[slot] == 0:
+            self.mins[slot] = self.maxs[slot] = value
+        elif value < self.mins[slot]:
+            self.mins[slot] = value
+        elif value > self.maxs[slot]:
+            self.maxs[slot] = value
+        self.sums[slot] += value
+        self.counts[slot] += 1
+        self.total += value
+        self.count += 1
+
+    def _advance(self, bucket: int) -> None:
+        if self.head is not None and bucket <= self.head:
+            return
+        start = bucket - self.size + 1 if self.head is None else max(self.head + 1, bucket - self.size + 1)
+        for expired in range(start, bucket + 1):
+            slot = expired % self.size
+            self.total -= self.sums[slot]
+            self.count -= self.counts[slot]
+            self.sums[slot] = 0.0
+            self.counts[slot] = 0
+        self.head = bucket
+        if self.count == 0:
+            # Drop the floating point residue of the running sum
+            self.total = 0.0
+
+    def value(self, aggregate: str) -> Optional[float]:
+        if aggregate == "count":
+            return float(self.count)
+        if self.count == 0:
+            return None
+        if aggregate == "sum":
+            return self.total
+        if aggregate == "avg":
+            return self.total / self.count
+        filled = [slot for slot in range(self.size) if self.counts[slot]]
+        if aggregate == "min":
+            return min(self.mins[slot] for slot in filled)
+        if aggregate == "max":
+            return max(self.maxs[slot] for slot in filled)
+        return None
+
+    def to_dict(self) -> dict:
+        return {
+            "window_seconds": self.window_seconds,
+            "head": self.head,
+            "sums": self.sums,
+            "counts": self.counts,
+            "mins": self.mins,
+            "maxs": self.maxs,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SlidingWindow":
+        window = cls(data["window_seconds"], len(data["sums"]))
+        window.head = data["head"]
+        window.sums = data["sums"]
+        window.counts = data["counts"]
+        window.mins = data["mins"]
+        window.maxs = data["maxs"]
+        window.total = sum(window.sums)
+        window.count = sum(window.counts)
+        return window
+
+
+class WindowStore:
+    """
+    Sliding windows per (device, key, window length), kept in memory by the
+    reactor and bounded to `max_series` with least-recently-updated eviction.
+
+    Windows are snapshotted to a Redis hash every `snapshot_interval`
+    seconds and on stop, and restored on start, so a restarted worker does
+    not begin with empty windows. A snapshot only writes the windows
+    updated since the previous one and removes the evicted ones, in chunks
+    of `snapshot_chunk` so the event loop is not held for the whole store.
+    """
+
+    def __init__(
+        self,
+        max_series: int = WINDOW_MAX_SERIES,
+        buckets: int = WINDOW_BUCKETS,
+        snapshot_key: str = WINDOW_SNAPSHOT_KEY,
+        snapshot_interval: float = WINDOW_SNAPSHOT_INTERVAL_SECONDS,
+        snapshot_chunk: int = WINDOW_SNAPSHOT_CHUNK,
+    ):
+        self.max_series = max_series
+        self.buckets = buckets
+        self.snapshot_key = snapshot_key
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_chunk = max(1, snapshot_chunk)
+        self._series: "OrderedDict[SeriesKey, SlidingWindow]" = OrderedDict()
+        # Series to write to / remove from the snapshot hash at the next snapshot
+        self._dirty: Set[SeriesKey] = set()
+        self._removed: Set[SeriesKey] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    def observe(self, device_id: str, key: str, window_seconds: float, timestamp: float, value: float) -> SlidingWindow:
+        series_key = (device_id, key, window_seconds)
+        window = self._series.get(series_key)
+        if window is None:
+            window = self._series[series_key] = SlidingWindow(window_seconds, self.buckets)
+            self._removed.discard(series_key)
+            self.trim(self.max_series)
+        else:
+            self._series.move_to_end(series_key)
+        window.add(timestamp, value)
+        self._dirty.add(series_key)
+        return window
+
+    def get(self, device_id: str, key: str, window_seconds: float) -> Optional[SlidingWindow]:
+        return self._series.get((device_id, key, window_seconds))
+
+    def trim(self, max_series: int) -> int:
+        """Evict least recently updated windows down to `max_series`; returns how many were dropped."""
+        dropped = 0
+        while len(self._series) > max_series:
+            series_key, _ = self._series.popitem(last=False)
+            self._dirty.discard(series_key)
+            self._removed.add(series_key)
+            dropped += 1
+        self.evicted += dropped
+        return dropped
+
+    def clear(self) -> None:
+        self._series.clear()
+        self._dirty.clear()
+        self._removed.clear()
+
+    async def snapshot(self) -> None:
+        dirty: List[SeriesKey] = list(self._dirty)
+        removed: List[SeriesKey] = list(self._removed)
+        self._dirty = set()
+        self._removed = set()
+        written = 0
+        try:
+            for start in range(0, max(len(dirty), len(removed)), self.snapshot_chunk):
+                mapping = {}
+                for series_key in dirty[start:start + self.snapshot_chunk]:
+                    window = self._series.get(series_key)
+                    # Windows evicted while earlier chunks were written are in _removed
+                    if window is not None:
+                        mapping[json.dumps(list(series_key))] = json.dumps(window.to_dict())
+                stale = [json.dumps(list(series_key)) for series_key in removed[start:start + self.snapshot_chunk]]
+                async with redis_client.pipeline(transaction=False) as pipe:
+                    if mapping:
+                        pipe.hset(self.snapshot_key, mapping=mapping)
+                    if stale:
+                        pipe.hdel(self.snapshot_key, *stale)
+                    await pipe.execute()
+                written = start + self.snapshot_chunk
+        except BaseException:
+            # Retry the unwritten chunks at the next snapshot
+            self._dirty.update(series_key for series_key in dirty[written:] if series_key in self._series)
+            self._removed.update(series_key for series_key in removed[written:] if series_key not in self._series)
+            raise
+        logger.info(f"Snapshotted {len(dirty)} window(s) to '{self.snapshot_key}', removed {len(removed)}")
+
+    async def restore(self) -> None:
+        stored = await redis_client.hgetall(self.snapshot_key)
+        malformed = []
+        for raw_key, raw_window in stored.items():
+            try:
+                device_id, key, window_seconds = json.loads(raw_key)
+                self._series[(device_id, key, window_seconds)] = SlidingWindow.from_dict(json.loads(raw_window))
+            except (TypeError, ValueError, KeyError) as e:
+                logger.error(f"❌ Skipping malformed window snapshot {raw_key!r}: {e}")
+                malformed.append(raw_key)
+        if malformed:
+            await redis_client.hdel(self.snapshot_key, *malformed)
+        self.trim(self.max_series)
+        logger.info(f"Restored {len(stored)} window(s) from '{self.snapshot_key}'")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            try:
+                await self.snapshot()
+            except Exception as e:
+                logger.error(f"❌ Window snapshot failed: {e}")
+
+    async def start(self):
+        if self._task is not None:
+            return
+        try:
+            await self.restore()
+        except Exception as e:
+            logger.error(f"❌ Window restore failed, starting with empty windows: {e}")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        try:
+            await self.snapshot()
+        except Exception as e:
+            logger.error(f"❌ Final window snapshot failed: {e}")
+
+    def stats(self) -> dict:
+        return {"series": len(self._series), "max_series": self.max_series, "evicted": self.evicted}
+
+
+window_store = WindowStore()
@@ -0,0 +1,158 @@
+# services/write_buffer.py
+import asyncio
+import logging
+import time
+from typing import Iterable, List, Optional, Type
+
+from beanie import Document, PydanticObjectId
+from pymongo.errors import BulkWriteError
+
+from app.constants import (
+    WRITE_BUFFER_FLUSH_INTERVAL_SECONDS,
+    WRITE_BUFFER_MAX_BATCH,
+    WRITE_BUFFER_MAX_PENDING,
+)
+from app.models.consequence import Consequence
+from app.models.event import Event
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """
+    Collects documents in memory and writes them with insert_many(ordered=False)
+    once max_batch documents are pending or flush_interval has elapsed.
+
+    Documents get their id when buffered, so callers can return it right away
+    and a retried batch cannot insert the same document twice. While the
+    buffer is not started (tests, scripts) put() writes through.
+    """
+
+    def __init__(
+        self,
+        model: Type[Document],
+        max_batch: int = WRITE_BUFFER_MAX_BATCH,
+        flush_interval: float = WRITE_BUFFER_FLUSH_INTERVAL_SECONDS,
+        max_pending: int = WRITE_BUFFER_MAX_PENDING,
+    ):
+        self.model = model
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max(max_pending, max_batch)
+        self._pending: List[Document] = []
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._has_space = asyncio.Event()
+        self._has_space.set()
+        self._task: Optional[asyncio.Task] = None
+        self.flushed = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.last_flush_seconds = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def put(self, document: Document):
+        await self.put_many([document])
+
+    async def put_many(self, documents: Iterable[Document]):
+        documents = list(documents)
+        for document in documents:
+            if document.id is None:
+                document.id = PydanticObjectId()
+        if not self.running:
+            await self._write(documents)
+            return
+
+        while len(self._pending) >= self.max_pending:
+            self._has_space.clear()
+            self._wakeup.set()
+            await self._has_space.wait()
+        self._pending.extend(documents)
+        if len(self._pending) >= self.max_batch:
+            self._wakeup.set()
+
+    async def flush(self):
+        async with self._flush_lock:
+            while self._pending:
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+                try:
+                    await self._write(batch)
+                except asyncio.CancelledError:
+                    # Stopped mid-write: the final flush in stop() writes the
+                    # batch again, and its ids make a repeated insert harmless.
+                    self._pending[:0] = batch
+                    raise
+                except Exception as e:
+                    # Keep the batch for the next flush; put_many blocks once
+                    # max_pending is reached, so an outage cannot grow memory.
+                    self._pending[:0] = batch
+                    logger.error(f"❌ Flushing {len(batch)} {self.model.__name__} document(s) failed: {e}")
+                    raise
+                finally:
+                    if len(self._pending) < self.max_pending:
+                        self._has_space.set()
+
+    async def _write(self, documents: List[Document]):
+        if not documents:
+            return
+        start = time.perf_counter()
+        try:
+            await self.model.insert_many(documents, ordered=False)
+            self.flushed += len(documents)
+        except BulkWriteError as e:
+            # Per-document failures (e.g. duplicates of an already written
+            # retry) will not succeed on another attempt, so drop them.
+            errors = e.details.get("writeErrors", [])
+            self.flushed += len(documents) - len(errors)
+            self.dropped += len(errors)
+            logger.error(f"❌ {len(errors)} {self.model.__name__} document(s) rejected: {errors[:3]}")
+        self.flushes += 1
+        self.last_flush_seconds = time.perf_counter() - start
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                await asyncio.sleep(self.flush_interval)
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the periodic flusher and write whatever is still pending."""
+        if not self.running:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "collection": self.model.__name__,
+            "depth": len(self._pending),
+            "max_pending": self.max_pending,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "last_flush_seconds": self.last_flush_seconds,
+        }
+
+
+event_buffer = WriteBehindBuffer(Event)
+consequence_buffer = WriteBehindBuffer(Consequence)
+write_buffers = [event_buffer, consequence_buffer]
@@ -0,0 +1,94 @@
+import json
+import pytest
+from types import SimpleNamespace
+
+from app.core.query_tracer import (
+    QueryTrace,
+    QueryTracer,
+    SlowQueryStats,
+    command_collection,
+    command_filter,
+    current_query_trace,
+    query_shape,
+)
+
+
+def command_events(command_name, command, duration_ms, request_id=1):
+    started = SimpleNamespace(connection_id=("db", 27017), request_id=request_id, command_name=command_name, command=command)
+    finished = SimpleNamespace(
+        connection_id=("db", 27017),
+        request_id=request_id,
+        command_name=command_name,
+        database_name="smart_house_db",
+        duration_micros=int(duration_ms * 1000),
+    )
+    return started, finished
+
+
+def run_command(tracer, command_name, command, duration_ms, request_id=1):
+    started, finished = command_events(command_name, command, duration_ms, request_id)
+    tracer.started(started)
+    tracer.succeeded(finished)
+
+
+def test_query_shape_hides_values():
+    shape = query_shape({"user_id": "abc", "_id": {"$in": [1, 2, 3]}, "$or": [{"a": 1}, {"b": {"$gt": 2}}]})
+
+    assert shape == {"user_id": "?", "_id": {"$in": "?"}, "$or": [{"a": "?"}, {"b": {"$gt": "?"}}]}
+
+
+def test_command_filter_by_command():
+    assert command_filter("find", {"find": "sensors", "filter": {"user_id": "u"}}) == {"user_id": "u"}
+    assert command_filter("update", {"update": "devices", "updates": [{"q": {"_id": 1}, "u": {}}]}) == {"_id": 1}
+    assert command_filter("aggregate", {"aggregate": "events", "pipeline": [{"$match": {"x": 1}}]}) == [{"$match": {"x": 1}}]
+    assert command_filter("insert", {"insert": "events", "documents": [{}]}) is None
+
+
+def test_command_collection():
+    assert command_collection("find", {"find": "sensors"}, "smart_house_db") == "sensors"
+    # getMore names the cursor id, not the collection
+    assert command_collection("getMore", {"getMore": 8472903, "collection": "events"}, "smart_house_db") == "events"
+    assert command_collection("aggregate", {"aggregate": 1, "pipeline": []}, "smart_house_db") == "smart_house_db"
+
+
+# Commands are charged to the trace in the context, and only slow ones are aggregated by shape
+def test_tracer_counts_round_trips_and_slow_shapes():
+    stats = SlowQueryStats()
+    tracer = QueryTracer(threshold_ms=50, stats=stats)
+    trace = QueryTrace("GET /api/sensors/user/{user_id}")
+    token = current_query_trace.set(trace)
+    try:
+        run_command(tracer, "find", {"find": "devices", "filter": {"user_id": "u1"}}, 5, request_id=1)
+        run_command(tracer, "find", {"find": "sensors", "filter": {"device_id": {"$in": ["a", "b"]}}}, 80, request_id=2)
+        run_command(tracer, "find", {"find": "sensors", "filter": {"device_id": {"$in": ["c"]}}}, 120, request_id=3)
+    finally:
+        current_query_trace.reset(token)
+
+    assert trace.round_trips == 3
+    assert trace.seconds == pytest.approx(0.205)
+    [top] = stats.top()
+    assert top["collection"] == "sensors"
+    assert json.loads(top["shape"]) == {"device_id": {"$in": "?"}}
+    assert top["count"] == 2
+    assert top["max_seconds"] == pytest.approx(0.12)
+    assert top["last_source"] == "GET /api/sensors/user/{user_id}"
+
+
+def test_untraced_commands_and_shape_cap():
+    stats = SlowQueryStats(max_shapes=1)
+    tracer = QueryTracer(threshold_ms=10, stats=stats)
+
+    run_command(tracer, "insert", {"insert": "events", "documents": [{"x": 1}]}, 20, request_id=1)
+    run_command(tracer, "delete", {"delete": "rules", "deletes": [{"q": {"_id": 1}}]}, 20, request_id=2)
+
+    [top] = stats.top()
+    assert top["last_source"] == "background"
+    assert stats.dropped == 1
+
+
+# Request traces are labelled with the route template the router matched
+def test_request_trace_label():
+    scope = {"method": "GET", "path": "/api/dashboard/u1", "route": SimpleNamespace(path="/api/dashboard/{user_id}")}
+
+    assert QueryTrace(scope=scope).label == "GET /api/dashboard/{user_id}"
+    assert QueryTrace(scope={"method": "GET", "path": "/nowhere"}).label == "GET /nowhere"
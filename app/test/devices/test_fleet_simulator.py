@@ -0,0 +1,151 @@
+import json
+import pytest
+import random
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+from beanie import PydanticObjectId
+
+from app.services.action_dispatcher import dispatch_actions
+from app.services.mqtt_publisher import mqtt_publisher
+from app.devices.fleet_simulator import (
+    FleetSimulator,
+    FleetStats,
+    HttpSender,
+    MotionSensor,
+    TemperatureSensor,
+    make_fleet,
+    percentile,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_temperature_drifts_around_base():
+    sensor = TemperatureSensor("t1", rate=1, rng=random.Random(1), base=22.0, drift=0.3)
+    values = [sensor.read()["temperature"] for _ in range(2000)]
+
+    assert 19 < sum(values) / len(values) < 25
+    assert len(set(values)) > 100
+
+
+def test_motion_comes_in_bursts():
+    sensor = MotionSensor("m1", rate=1, rng=random.Random(2), burst_probability=0.05, burst_length=10)
+    readings = [sensor.read()["motion"] for _ in range(2000)]
+    bursts = sum(1 for before, after in zip(readings, readings[1:]) if before == 0 and after == 1)
+
+    assert 0 < sum(readings) < len(readings)
+    # Motion readings cluster into far fewer bursts than readings
+    assert bursts < sum(readings) / 3
+
+
+def test_make_fleet_mix():
+    fleet = make_fleet(1000, rate=1, mix={"temperature": 0.7, "motion": 0.3})
+
+    temperature = sum(isinstance(device, TemperatureSensor) for device in fleet)
+    assert 600 < temperature < 800
+    assert len({device.device_id for device in fleet}) == 1000
+
+
+# Every device reports at its own rate from a single scheduler, in batches
+@pytest.mark.asyncio
+async def test_run_sends_at_configured_rate():
+    clock = FakeClock()
+    fleet = [TemperatureSensor(f"t{i}", rate=2, rng=random.Random(i)) for i in range(10_000)]
+    simulator = FleetSimulator(fleet, max_batch=1000, clock=clock)
+    batches = []
+
+    async def send(batch):
+        batches.append(len(batch))
+
+    await simulator.run(send, duration=3, sleep=clock.sleep)
+
+    assert sum(batches) == 60_000
+    assert max(batches) <= 1000
+
+
+def test_make_fleet_ids():
+    fleet = make_fleet(3, rate=1, mix={"temperature": 1})
+    assert all(PydanticObjectId.is_valid(device.device_id) for device in fleet)
+    assert [device.device_id for device in make_fleet(2, 1, {"motion": 1}, device_ids=["a", "b", "c"])] == ["a", "b"]
+    with pytest.raises(ValueError):
+        make_fleet(2, 1, {"motion": 1}, device_ids=["a"])
+
+
+@pytest.mark.asyncio
+async def test_dispatched_actions_reach_simulated_devices():
+    clock = FakeClock()
+    fleet = make_fleet(3, rate=1, mix={"temperature": 1})
+    simulator = FleetSimulator(fleet, clock=clock)
+    for device in fleet:
+        device.last_sent = 1.0
+    clock.now = 1.5
+    consequences = [SimpleNamespace(action="turn_on", device_id=device.device_id) for device in fleet]
+
+    with patch("app.services.action_dispatcher.Device") as mock_device, \
+            patch("app.services.action_dispatcher.record_states", new_callable=AsyncMock), \
+            patch.object(mqtt_publisher, "publish", side_effect=simulator.router.dispatch):
+        mock_device.get_pymongo_collection.return_value.bulk_write = AsyncMock(
+            return_value=MagicMock(modified_count=3)
+        )
+        assert await dispatch_actions(consequences) == 3
+
+    assert [device.state for device in fleet] == ["on"] * 3
+    assert simulator.stats.commands == 3
+    assert simulator.stats.command_latencies == [0.5] * 3
+
+
+def test_control_records_round_trip_latency():
+    clock = FakeClock()
+    device = TemperatureSensor("t1", rate=1, rng=random.Random(1))
+    simulator = FleetSimulator([device], clock=clock)
+    device.last_sent = 1.0
+    clock.now = 1.25
+
+    simulator.router.dispatch("device/t1/control", b"on")
+    simulator.router.dispatch("device/unknown/control", b"on")
+
+    assert device.state == "on"
+    assert simulator.stats.commands == 1
+    assert simulator.stats.command_latencies == [0.25]
+    assert simulator.stats.summary(1.0)["command_p50_ms"] == 250.0
+
+
+@pytest.mark.asyncio
+async def test_http_sender_posts_monitor_events():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(500 if len(requests) == 3 else 200, json={})
+
+    stats = FleetStats()
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://test")
+    sender = HttpSender(stats, client, mode="async", concurrency=2)
+    device = TemperatureSensor("t1", rate=1, rng=random.Random(1))
+
+    await sender([(device, {"temperature": 21.0})] * 3)
+    await sender.drain()
+    await client.aclose()
+
+    assert requests[0].url.path == "/api/monitor/"
+    assert requests[0].url.params["mode"] == "async"
+    assert json.loads(requests[0].content) == {
+        "device_id": "t1", "event_type": "temperature_change", "data": {"temperature": 21.0},
+    }
+    assert (stats.sent, stats.errors) == (2, 1)
+
+
+def test_percentile():
+    assert percentile([], 0.5) is None
+    assert percentile([float(i) for i in range(100)], 0.99) == 99.0
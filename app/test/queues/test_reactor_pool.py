@@ -0,0 +1,68 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+
+from app.queues.reactor_pool import ReactorPool, ReactorWorker
+
+
+def make_events(device_ids, count):
+    return [{"device_id": device_id, "seq": i} for i in range(count) for device_id in device_ids]
+
+
+def test_same_device_maps_to_same_worker():
+    pool = ReactorPool(size=4)
+    pool.workers = [ReactorWorker(i, 10, 100) for i in range(4)]
+
+    assert pool.worker_for({"device_id": "light_1"}) is pool.worker_for({"device_id": "light_1", "x": 1})
+    assert pool.worker_for({"sensor_id": "abc123"}) is pool.worker_for({"sensor_id": "abc123"})
+
+
+# Events of one device are handled in order even when devices run concurrently
+@pytest.mark.asyncio
+async def test_pool_preserves_per_device_order():
+    handled = []
+
+    async def fake_handle_messages(batch):
+        await asyncio.sleep(0)
+        handled.extend(event for _, event in batch)
+
+    pool = ReactorPool(size=3, batch_size=4, queue_size=100)
+    with patch('app.queues.reactor_pool.handle_messages', fake_handle_messages), \
+         patch('app.queues.reactor_pool.consume_events', lambda *args, **kwargs: asyncio.sleep(3600)):
+        pool.start()
+        events = make_events(["a", "b", "c", "d", "e"], 20)
+        await pool.dispatch([(None, event) for event in events])
+        await pool.stop()
+
+    assert len(handled) == len(events)
+    for device_id in "abcde":
+        seqs = [e["seq"] for e in handled if e["device_id"] == device_id]
+        assert seqs == list(range(20))
+
+    stats = pool.stats()
+    assert stats["processed"] == len(events)
+    assert stats["queue_depth"] == 0
+    assert stats["in_flight"] == 0
+    assert len(stats["workers"]) == 3
+
+
+# Handled and failed events are counted for /metrics as well as in stats()
+@pytest.mark.asyncio
+async def test_worker_records_metrics():
+    from app.core.metrics import REACTOR_FAILED, REACTOR_PROCESSED
+
+    async def flaky_handle_messages(batch):
+        if batch[0][1]["seq"] == 1:
+            raise RuntimeError("boom")
+
+    worker = ReactorWorker(0, batch_size=1, queue_size=10)
+    processed, failed = REACTOR_PROCESSED._value.get(), REACTOR_FAILED._value.get()
+    with patch('app.queues.reactor_pool.handle_messages', flaky_handle_messages):
+        task = asyncio.create_task(worker.run())
+        for seq in range(3):
+            worker.queue.put_nowait((None, {"seq": seq}))
+        await worker.queue.join()
+        task.cancel()
+
+    assert REACTOR_PROCESSED._value.get() - processed == 2
+    assert REACTOR_FAILED._value.get() - failed == 1
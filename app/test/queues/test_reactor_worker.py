@@ -0,0 +1,118 @@
+import time
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from app.queues.reactor_worker import handle_events, handle_messages
+
+EVENT_DATA = {
+    "type": "temperature_change",
+    "event_id": "event_123",
+    "temperature": 30.0
+}
+
+
+@pytest.fixture
+def mock_rule():
+    rule = MagicMock()
+    rule.id = "rule_123"
+    rule.action = "turn_on"
+    rule.target_device_id = "device_123"
+    return rule
+
+
+# Device twins live in Redis, which is not available to these tests
+@pytest.fixture(autouse=True)
+def mock_record_events():
+    with patch('app.queues.reactor_worker.record_events', AsyncMock()) as mock_record:
+        yield mock_record
+
+
+@pytest.fixture(autouse=True)
+def mock_dispatch_actions():
+    with patch('app.queues.reactor_worker.dispatch_actions', AsyncMock()) as mock_dispatch:
+        yield mock_dispatch
+
+
+# A handled batch is acknowledged on the transport
+@pytest.mark.asyncio
+async def test_handle_messages_acks_after_success():
+    with patch('app.queues.reactor_worker.handle_events', AsyncMock()) as mock_handle, \
+         patch('app.queues.reactor_worker.event_transport') as mock_transport:
+        mock_transport.ack = AsyncMock()
+
+        await handle_messages([("1-0", EVENT_DATA), ("2-0", EVENT_DATA)])
+
+        mock_handle.assert_called_once_with([EVENT_DATA, EVENT_DATA])
+        assert list(mock_transport.ack.call_args.args[0]) == ["1-0", "2-0"]
+
+
+# A failed batch is left pending so it can be claimed again
+@pytest.mark.asyncio
+async def test_handle_messages_no_ack_on_failure():
+    with patch('app.queues.reactor_worker.handle_events', AsyncMock(side_effect=Exception("db down"))), \
+         patch('app.queues.reactor_worker.event_transport') as mock_transport:
+        mock_transport.ack = AsyncMock()
+
+        with pytest.raises(Exception):
+            await handle_messages([("1-0", EVENT_DATA)])
+
+        mock_transport.ack.assert_not_called()
+
+
+# Rules are loaded once per batch and consequences are inserted together
+@pytest.mark.asyncio
+async def test_handle_events_batches_consequences(mock_rule, mock_dispatch_actions):
+    with patch('app.queues.reactor_worker.rule_engine') as mock_engine, \
+         patch('app.queues.reactor_worker.Consequence') as mock_consequence, \
+         patch('app.queues.reactor_worker.create_executed_consequences', AsyncMock()) as mock_create:
+
+        mock_engine.ensure_loaded = AsyncMock()
+        mock_engine.match_many.return_value = [[mock_rule]] * 3
+
+        await handle_events([EVENT_DATA, EVENT_DATA, EVENT_DATA])
+
+        mock_engine.ensure_loaded.assert_called_once()
+        mock_create.assert_called_once()
+        assert len(mock_create.call_args.args[0]) == 3
+        # The whole batch is dispatched at once
+        mock_dispatch_actions.assert_called_once_with(mock_create.call_args.args[0])
+        assert mock_consequence.call_args.kwargs["event_id"] == "event_123"
+
+
+@pytest.mark.asyncio
+async def test_handle_events_no_match(mock_record_events, mock_dispatch_actions):
+    with patch('app.queues.reactor_worker.rule_engine') as mock_engine, \
+         patch('app.queues.reactor_worker.create_executed_consequences', AsyncMock()) as mock_create:
+        mock_engine.ensure_loaded = AsyncMock()
+        mock_engine.match_many.return_value = [[]]
+
+        await handle_events([EVENT_DATA])
+
+        # Twins are updated even when no rule fires
+        mock_record_events.assert_called_once_with([EVENT_DATA])
+        mock_dispatch_actions.assert_not_called()
+        mock_create.assert_not_called()
+
+
+# Stamped events record each stage and carry their ingest-to-action latency onto the consequences
+@pytest.mark.asyncio
+async def test_handle_events_records_lag(mock_rule):
+    from app.core.metrics import EVENT_QUEUE_WAIT_SECONDS, EVENT_TO_ACTION_REACTOR
+
+    stamped = {**EVENT_DATA, "meta": {"ingested_at": time.time() - 2.0}}
+    waits_before = EVENT_QUEUE_WAIT_SECONDS._sum.get()
+    totals_before = EVENT_TO_ACTION_REACTOR._sum.get()
+    with patch('app.queues.reactor_worker.rule_engine') as mock_engine, \
+         patch('app.queues.reactor_worker.Consequence', side_effect=lambda **fields: MagicMock(latency_seconds=None)), \
+         patch('app.queues.reactor_worker.create_executed_consequences', AsyncMock()) as mock_create:
+        mock_engine.ensure_loaded = AsyncMock()
+        mock_engine.match_many.return_value = [[mock_rule, mock_rule], [mock_rule]]
+
+        await handle_events([stamped, EVENT_DATA])
+
+    latencies = [consequence.latency_seconds for consequence in mock_create.call_args.args[0]]
+    assert all(latency >= 2.0 for latency in latencies[:2])
+    # Unstamped events are left out
+    assert latencies[2] is None
+    assert 2.0 <= EVENT_QUEUE_WAIT_SECONDS._sum.get() - waits_before < 3.0
+    assert 2.0 <= EVENT_TO_ACTION_REACTOR._sum.get() - totals_before < 3.0
@@ -0,0 +1,142 @@
+import json
+import pytest
+import fakeredis
+from unittest.mock import patch, MagicMock, AsyncMock
+from redis.exceptions import ResponseError
+
+from app.queues.transport import ListTransport, StreamTransport, build_transport
+
+EVENT_DATA = {
+    "type": "temperature_change",
+    "device_id": "device_123",
+    "temperature": 30.0
+}
+
+
+# List mode blocks for the first event and drains the rest with a single LPOP
+@pytest.mark.asyncio
+async def test_list_read_drains_queue():
+    with patch('app.queues.transport.redis_client') as mock_redis:
+        mock_redis.blpop = AsyncMock(return_value=("event_queue", json.dumps(EVENT_DATA)))
+        mock_redis.lpop = AsyncMock(return_value=[json.dumps(EVENT_DATA), "not json"])
+
+        messages = await ListTransport().read(10)
+
+        mock_redis.lpop.assert_called_once_with("event_queue", 9)
+        assert messages == [(None, EVENT_DATA), (None, EVENT_DATA)]
+
+
+@pytest.mark.asyncio
+async def test_list_read_timeout():
+    with patch('app.queues.transport.redis_client') as mock_redis:
+        mock_redis.blpop = AsyncMock(return_value=None)
+        mock_redis.lpop = AsyncMock()
+
+        assert await ListTransport().read(10) == []
+        mock_redis.lpop.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_stream_setup_ignores_existing_group():
+    with patch('app.queues.transport.redis_client') as mock_redis:
+        mock_redis.xgroup_create = AsyncMock(side_effect=ResponseError("BUSYGROUP Consumer Group name already exists"))
+        await StreamTransport().setup()
+
+
+# Stream mode reads through the consumer group and acks all ids in one XACK
+@pytest.mark.asyncio
+async def test_stream_read_and_ack():
+    transport = StreamTransport(stream="events", group="reactor", consumer="worker-1")
+    with patch('app.queues.transport.redis_client') as mock_redis:
+        mock_redis.xreadgroup = AsyncMock(return_value=[
+            ["events", [("1-0", {"event": json.dumps(EVENT_DATA)}), ("2-0", {"event": "{broken"})]]
+        ])
+        mock_redis.xack = AsyncMock()
+
+        messages = await transport.read(50)
+        assert messages == [("1-0", EVENT_DATA)]
+        assert mock_redis.xreadgroup.call_args.kwargs["count"] == 50
+        # The malformed entry is acknowledged right away so it is never redelivered
+        mock_redis.xack.assert_called_once_with("events", "reactor", "2-0")
+
+        await transport.ack(["1-0", None, "3-0"])
+        mock_redis.xack.assert_called_with("events", "reactor", "1-0", "3-0")
+
+
+@pytest.mark.asyncio
+async def test_stream_claim_stale_advances_cursor():
+    transport = StreamTransport(stream="events", group="reactor", consumer="worker-1", claim_idle_ms=1000)
+    with patch('app.queues.transport.redis_client') as mock_redis:
+        mock_redis.xautoclaim = AsyncMock(return_value=["5-0", [("4-0", {"event": json.dumps(EVENT_DATA)})], []])
+        mock_redis.xack = AsyncMock()
+        mock_redis.pipeline = MagicMock()
+        pipe = mock_redis.pipeline.return_value.__aenter__.return_value
+        pipe.execute = AsyncMock(return_value=[[{"message_id": "4-0", "times_delivered": 2}]])
+
+        messages = await transport.claim_stale(10)
+
+        assert messages == [("4-0", EVENT_DATA)]
+        assert mock_redis.xautoclaim.call_args.kwargs["start_id"] == "0-0"
+        assert transport._claim_cursor == "5-0"
+
+
+# Entries this process still holds are touched instead of claimed; poison entries go to the dead-letter stream
+@pytest.mark.asyncio
+async def test_stream_claim_stale_skips_held_and_dead_letters():
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    transport = StreamTransport(
+        stream="events", group="reactor", consumer="worker-1", claim_idle_ms=0, max_deliveries=2, dead_letter="dead",
+    )
+    with patch('app.queues.transport.redis_client', redis):
+        await transport.setup()
+        await transport.push([{**EVENT_DATA, "seq": 1}, {**EVENT_DATA, "seq": 2}])
+        held, failed = await transport.read(2)
+
+        transport.release([failed[0]])
+        await transport.touch()
+        claimed = await transport.claim_stale(10)
+        assert claimed == [failed]
+
+        # Delivered by the read and two claims: one more than allowed
+        transport.release([failed[0]])
+        transport._claim_cursor = "0-0"
+        assert await transport.claim_stale(10) == []
+
+        dead = await redis.xrange("dead")
+        assert len(dead) == 1
+        assert json.loads(dead[0][1]["event"])["seq"] == 2
+        assert dead[0][1]["id"] == failed[0]
+        assert dead[0][1]["deliveries"] == "3"
+        pending = await redis.xpending_range("events", "reactor", min="-", max="+", count=10)
+        assert [entry["message_id"] for entry in pending] == [held[0]]
+
+
+# Other pending entries between the claimed ids do not hide the claimed ones' delivery counts
+@pytest.mark.asyncio
+async def test_stream_claim_stale_dead_letters_interleaved_ids():
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    transport = StreamTransport(
+        stream="events", group="reactor", consumer="worker-1", claim_idle_ms=60000, max_deliveries=1, dead_letter="dead",
+    )
+    with patch('app.queues.transport.redis_client', redis):
+        await transport.setup()
+        await transport.push([{**EVENT_DATA, "seq": i} for i in range(5)])
+        messages = await transport.read(5)
+        ids = [message_id for message_id, _ in messages]
+        transport.release(ids)
+        # Only every other entry has been idle long enough to be claimed
+        await redis.xclaim("events", "reactor", "worker-1", min_idle_time=0, message_ids=ids[::2], idle=120000, justid=True)
+
+        assert await transport.claim_stale(10) == []
+
+        dead = await redis.xrange("dead")
+        assert [entry["id"] for _, entry in dead] == ids[::2]
+        pending = await redis.xpending_range("events", "reactor", min="-", max="+", count=10)
+        assert [entry["message_id"] for entry in pending] == ids[1::2]
+
+
+def test_build_transport():
+    assert isinstance(build_transport("list"), ListTransport)
+    assert isinstance(build_transport("stream"), StreamTransport)
+    with pytest.raises(ValueError):
+        build_transport("kafka")
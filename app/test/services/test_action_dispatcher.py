@@ -0,0 +1,82 @@
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+from fastapi import HTTPException
+
+from app.services.action_dispatcher import coalesce_actions, dispatch_actions
+
+DEVICE_A = "60b6a6fa5f3c1f5f56e8391b"
+DEVICE_B = "60b6a6fa5f3c1f5f56e8391c"
+
+
+def consequence(action, device_id):
+    return MagicMock(action=action, device_id=device_id)
+
+
+@pytest.fixture
+def mock_collection():
+    collection = MagicMock()
+    collection.bulk_write = AsyncMock(return_value=MagicMock(modified_count=1))
+    with patch('app.services.action_dispatcher.Device.get_pymongo_collection', return_value=collection):
+        yield collection
+
+
+@pytest.fixture(autouse=True)
+def mock_record_states():
+    with patch('app.services.action_dispatcher.record_states', AsyncMock()) as mock_record:
+        yield mock_record
+
+
+@pytest.fixture(autouse=True)
+def mock_publisher():
+    with patch('app.services.action_dispatcher.mqtt_publisher') as publisher:
+        yield publisher
+
+
+# The last action of a batch wins for each device
+def test_coalesce_last_writer_wins():
+    states = coalesce_actions([
+        consequence("turn_on", DEVICE_A),
+        consequence("turn_off", DEVICE_B),
+        consequence("turn_off", DEVICE_A),
+        consequence("send_alert", DEVICE_B),
+        consequence("turn_on", "not-an-id"),
+    ])
+
+    assert states == {DEVICE_A: "off", DEVICE_B: "off"}
+
+
+@pytest.mark.asyncio
+async def test_dispatch_uses_one_bulk_write(mock_collection, mock_record_states, mock_publisher):
+    changed = await dispatch_actions([
+        consequence("turn_on", DEVICE_A),
+        consequence("turn_on", DEVICE_B),
+        consequence("turn_off", DEVICE_A),
+    ])
+
+    assert changed == 1
+    mock_collection.bulk_write.assert_called_once()
+    operations = mock_collection.bulk_write.call_args.args[0]
+    assert mock_collection.bulk_write.call_args.kwargs == {"ordered": False}
+    # Devices already in the desired state are not matched, so they are not written
+    assert [(op._filter["state"], op._doc) for op in operations] == [
+        ({"$ne": "off"}, {"$set": {"state": "off"}}),
+        ({"$ne": "on"}, {"$set": {"state": "on"}}),
+    ]
+    assert mock_record_states.call_args.args[0] == {DEVICE_A: "off", DEVICE_B: "on"}
+    mock_publisher.publish_states.assert_called_once_with({DEVICE_A: "off", DEVICE_B: "on"})
+
+
+@pytest.mark.asyncio
+async def test_dispatch_without_state_actions(mock_collection):
+    assert await dispatch_actions([consequence("send_alert", DEVICE_A)]) == 0
+    mock_collection.bulk_write.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_dispatch_error(mock_collection):
+    mock_collection.bulk_write.side_effect = Exception("db down")
+
+    with pytest.raises(HTTPException) as exc_info:
+        await dispatch_actions([consequence("turn_on", DEVICE_A)])
+
+    assert exc_info.value.status_code == 500
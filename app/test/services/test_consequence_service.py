@@ -1,7 +1,12 @@
 import pytest
 from unittest.mock import patch, MagicMock
 from unittest.mock import AsyncMock
-from app.services.consequence_service import get_consequence_by_id, mark_consequence_as_executed
+from app.services.consequence_service import (
+    get_consequence_by_id,
+    mark_consequence_as_executed,
+    create_executed_consequences,
+    mark_consequences_as_executed,
+)
 
 
 @pytest.mark.asyncio
@@ -28,4 +33,36 @@ async def test_mark_consequence_as_executed():
 
         # Ensure the consequence was marked as executed
         assert executed_consequence.status == "executed"
-        mock_consequence.save.assert_called_once()  # Verify save was called once
\ No newline at end of file
+        mock_consequence.save.assert_called_once()  # Verify save was called once
+
+
+@pytest.mark.asyncio
+async def test_create_executed_consequences():
+    consequences = [MagicMock(status="pending", executed_at=None) for _ in range(3)]
+
+    with patch('app.services.consequence_service.Consequence.insert_many', AsyncMock()) as mock_insert_many:
+        created = await create_executed_consequences(consequences)
+
+        # One round trip for the whole batch, already in the final state
+        mock_insert_many.assert_called_once_with(consequences, ordered=False)
+        assert all(c.status == "executed" and c.executed_at is not None for c in created)
+
+
+@pytest.mark.asyncio
+async def test_mark_consequences_as_executed():
+    mock_query = MagicMock()
+    mock_query.update = AsyncMock(return_value=MagicMock(modified_count=2))
+
+    with patch('app.services.consequence_service.Consequence.find', return_value=mock_query) as mock_find:
+        modified = await mark_consequences_as_executed(["60f5c4a1b4c32f1b5c1d34c5", "60f5c4a1b4c32f1b5c1d34c6"])
+
+        assert modified == 2
+        mock_find.assert_called_once()
+        mock_query.update.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_mark_consequences_as_executed_empty():
+    with patch('app.services.consequence_service.Consequence.find') as mock_find:
+        assert await mark_consequences_as_executed([]) == 0
+        mock_find.assert_not_called()
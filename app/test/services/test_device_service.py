@@ -7,6 +7,14 @@ from app.schemas.device import DeviceCreate, DeviceUpdate
 # Ensure that you're using valid MongoDB ObjectIds (24-character hex strings)
 VALID_OBJECT_ID = "60b6a6fa5f3c1f5f56e8391b"
 
+
+# Device twins live in Redis, which is not available to these tests
+@pytest.fixture(autouse=True)
+def mock_device_twin():
+    with patch('app.services.device_service.record_state', AsyncMock()), \
+         patch('app.services.device_service.delete_twin', AsyncMock()):
+        yield
+
 # Test for creating a device
 @pytest.mark.asyncio
 async def test_create_device():
@@ -0,0 +1,88 @@
+import pytest
+import fakeredis
+from unittest.mock import patch
+
+from app.queues.event_producer import stamp_ingest
+from app.services.device_twin import (
+    delete_twin,
+    get_live_states,
+    parse_twin,
+    record_events,
+    record_state,
+    twin_fields,
+    twin_key,
+)
+
+
+@pytest.fixture
+def fake_redis():
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    with patch('app.services.device_twin.redis_client', client):
+        yield client
+
+
+# Only numeric values are kept, each with the event time in epoch seconds
+def test_twin_fields_keep_numeric_values():
+    event = {"type": "temperature_change", "device_id": "d1", "timestamp": "2024-01-01T00:00:00+00:00",
+             "temperature": 21.5, "unit": "C"}
+
+    assert twin_fields(event) == {"temperature": 21.5, "temperature:ts": 1704067200.0}
+
+
+# The reactor's ingest stamp is bookkeeping, not a reading
+@pytest.mark.asyncio
+async def test_stamped_event_only_records_readings(fake_redis):
+    event = stamp_ingest({"type": "temperature_change", "device_id": "d1", "event_id": "e1",
+                          "timestamp": "2024-01-01T00:00:00+00:00", "temperature": 21.5})
+
+    await record_events([event])
+
+    assert await fake_redis.hgetall(twin_key("d1")) == {"temperature": "21.5", "temperature:ts": "1704067200.0"}
+
+
+@pytest.mark.asyncio
+async def test_record_events_keeps_latest_reading(fake_redis):
+    await record_events([
+        {"type": "temperature_change", "device_id": "d1", "timestamp": "2024-01-01T00:00:00+00:00", "temperature": 20},
+        {"type": "humidity_change", "device_id": "d1", "timestamp": "2024-01-01T00:01:00+00:00", "humidity": 40},
+        {"type": "temperature_change", "device_id": "d1", "timestamp": "2024-01-01T00:02:00+00:00", "temperature": 23},
+        {"type": "temperature_change", "device_id": "d2", "timestamp": "2024-01-01T00:00:00+00:00", "temperature": 18},
+    ])
+    await record_state("d1", "on", 1704067300.0)
+
+    live = await get_live_states(["d1", "d2", "unknown"])
+
+    assert live["d1"] == {
+        "state": "on",
+        "state_updated_at": 1704067300.0,
+        "readings": {
+            "temperature": {"value": 23.0, "timestamp": 1704067320.0},
+            "humidity": {"value": 40.0, "timestamp": 1704067260.0},
+        },
+    }
+    assert live["d2"]["readings"]["temperature"]["value"] == 18.0
+    assert live["unknown"] == {"state": None, "state_updated_at": None, "readings": {}}
+
+
+@pytest.mark.asyncio
+async def test_delete_twin(fake_redis):
+    await record_state("d1", "off")
+    await delete_twin("d1")
+
+    assert await fake_redis.exists(twin_key("d1")) == 0
+
+
+# A Redis outage is logged, it never fails the ingestion path
+@pytest.mark.asyncio
+async def test_record_events_swallows_redis_errors():
+    client = fakeredis.FakeAsyncRedis(decode_responses=True, connected=False)
+    with patch('app.services.device_twin.redis_client', client):
+        await record_events([{"type": "temperature_change", "device_id": "d1", "temperature": 20}])
+
+
+def test_parse_twin_without_timestamps():
+    assert parse_twin({"temperature": "20"}) == {
+        "state": None,
+        "state_updated_at": None,
+        "readings": {"temperature": {"value": 20.0, "timestamp": None}},
+    }
@@ -1,8 +1,8 @@
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import ANY, patch, MagicMock
 from unittest.mock import AsyncMock
 from datetime import datetime, timezone
-from app.services.event_service import log_event
+from app.services.event_service import log_event, ingest_event, ingest_events
 from app.schemas.event import EventCreate
 from fastapi import HTTPException
 
@@ -14,8 +14,15 @@ mock_event_data = {
 }
 
 
+# Device twins live in Redis, which is not available to these tests
+@pytest.fixture(autouse=True)
+def mock_record_events():
+    with patch('app.services.event_service.record_events', AsyncMock()) as mock_record:
+        yield mock_record
+
+
 @pytest.mark.asyncio
-async def test_log_event_success():
+async def test_log_event_success(mock_record_events):
     # Create a mock Event instance
     mock_event = MagicMock()
     mock_event.device_id = "60f5c4a1b4c32f1b5c1d34c5"
@@ -24,12 +31,11 @@ async def test_log_event_success():
     mock_event.timestamp = datetime.now(timezone.utc)  # Fix deprecation warning: use timezone-aware datetime
     mock_event.id = "60f5c4a1b4c32f1b5c1d34c6"
 
-    # Mock async 'insert' method using AsyncMock
-    mock_event.insert = AsyncMock()
-
-    # Patch the Event model and the process_event function
+    # Patch the Event model, the write-behind buffer and the process_event function
     with patch('app.services.event_service.Event', return_value=mock_event), \
+            patch('app.services.event_service.event_buffer') as mock_buffer, \
             patch('app.services.event_service.process_event', new_callable=AsyncMock) as mock_process_event:
+        mock_buffer.put = AsyncMock()
         # Create an EventCreate schema instance
         event_in = EventCreate(**mock_event_data)
 
@@ -41,11 +47,13 @@ async def test_log_event_success():
         assert event.event_type == mock_event_data["event_type"]
         assert event.id is not None
 
-        # Verify that the insert method was called once
-        mock_event.insert.assert_called_once()
+        # Verify that the event was handed to the write-behind buffer once
+        mock_buffer.put.assert_called_once_with(mock_event)
+        mock_record_events.assert_called_once_with([mock_event])
 
-        # Verify that the process_event function was called once
-        mock_process_event.assert_called_once_with(event)
+        # Verify that the process_event function was called once, with the ingest time
+        mock_process_event.assert_called_once_with(event, ANY)
+        assert isinstance(mock_process_event.call_args.args[1], float)
 
 
 @pytest.mark.asyncio
@@ -59,4 +67,60 @@ async def test_log_event_failure():
             await log_event(event_in)
 
         assert exc_info.value.status_code == 500
-        assert "Error logging event" in str(exc_info.value.detail)
\ No newline at end of file
+        assert "Error logging event" in str(exc_info.value.detail)
+
+
+@pytest.mark.asyncio
+async def test_ingest_event_enqueues_without_evaluating_rules():
+    mock_event = MagicMock()
+    mock_event.id = "60f5c4a1b4c32f1b5c1d34c6"
+    mock_event.device_id = mock_event_data["device_id"]
+    mock_event.event_type = mock_event_data["event_type"]
+    mock_event.data = mock_event_data["data"]
+    mock_event.timestamp = datetime.now(timezone.utc)
+
+    with patch('app.services.event_service.Event', return_value=mock_event), \
+            patch('app.services.event_service.event_buffer') as mock_buffer, \
+            patch('app.services.event_service.event_transport') as mock_transport, \
+            patch('app.services.event_service.process_event', new_callable=AsyncMock) as mock_process_event:
+        mock_buffer.put = AsyncMock()
+        mock_transport.push = AsyncMock()
+
+        event = await ingest_event(EventCreate(**mock_event_data))
+
+        assert event is mock_event
+        mock_buffer.put.assert_called_once_with(mock_event)
+        queued = mock_transport.push.call_args.args[0]
+        assert queued == [{
+            "temperature": 23.5,
+            "event_id": "60f5c4a1b4c32f1b5c1d34c6",
+            "type": "motion_detected",
+            "device_id": "60f5c4a1b4c32f1b5c1d34c5",
+            "timestamp": mock_event.timestamp.isoformat(),
+            "meta": {"ingested_at": ANY},
+        }]
+        mock_process_event.assert_not_called()
+
+
+# A batch is buffered with one put_many and queued with one push
+@pytest.mark.asyncio
+async def test_ingest_events_in_bulk():
+    events_in = [EventCreate(**mock_event_data), EventCreate(**{**mock_event_data, "data": {"temperature": 24.0}})]
+
+    def make_event(**fields):
+        return MagicMock(id="60f5c4a1b4c32f1b5c1d34c6", timestamp=datetime.now(timezone.utc), **fields)
+
+    with patch('app.services.event_service.Event', side_effect=make_event), \
+            patch('app.services.event_service.event_buffer') as mock_buffer, \
+            patch('app.services.event_service.event_transport') as mock_transport:
+        mock_buffer.put_many = AsyncMock()
+        mock_transport.push = AsyncMock()
+
+        events = await ingest_events(events_in)
+
+    assert [event.data for event in events] == [{"temperature": 23.5}, {"temperature": 24.0}]
+    mock_buffer.put_many.assert_called_once_with(events)
+    queued = mock_transport.push.call_args.args[0]
+    assert [event["temperature"] for event in queued] == [23.5, 24.0]
+    # Stamped for the reactor's lag metrics
+    assert all(isinstance(event["meta"]["ingested_at"], float) for event in queued)
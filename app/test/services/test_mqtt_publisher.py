@@ -0,0 +1,71 @@
+import asyncio
+import itertools
+import pytest
+from unittest.mock import patch, MagicMock
+
+import paho.mqtt.client as mqtt
+
+from app.services.mqtt_publisher import MqttPublisher, control_topic
+
+
+@pytest.fixture
+def mock_client():
+    client = MagicMock()
+    mids = itertools.count(1)
+    client.publish.side_effect = lambda topic, payload, qos: MagicMock(rc=mqtt.MQTT_ERR_SUCCESS, mid=next(mids))
+    with patch('app.services.mqtt_publisher.mqtt.Client', return_value=client):
+        yield client
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_publish_before_start_is_dropped():
+    publisher = MqttPublisher()
+
+    assert publisher.publish(control_topic("d1"), "on") is False
+    assert publisher.stats()["dropped"] == 1
+
+
+# At most max_inflight messages await a PUBACK; each ack lets the next one out
+@pytest.mark.asyncio
+async def test_inflight_window(mock_client):
+    publisher = MqttPublisher(max_inflight=2)
+    publisher.start()
+    mock_client.connect_async.assert_called_once()
+    mock_client.loop_start.assert_called_once()
+
+    publisher.publish_states({f"d{i}": "on" for i in range(5)})
+    await settle()
+    assert mock_client.publish.call_count == 2
+    assert mock_client.publish.call_args_list[0].args == ("device/d0/control", "on")
+
+    # PUBACKs arrive on the paho network thread
+    await asyncio.to_thread(publisher._on_publish, mock_client, None, 1)
+    await settle()
+    assert mock_client.publish.call_count == 3
+    assert publisher.stats()["inflight"] == 2
+
+    for mid in (2, 3, 4, 5):
+        await asyncio.to_thread(publisher._on_publish, mock_client, None, mid)
+    await publisher.stop(timeout=1)
+
+    assert publisher.stats()["acked"] == 5
+    mock_client.disconnect.assert_called_once()
+    mock_client.loop_stop.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_full_queue_drops_without_waiting(mock_client):
+    publisher = MqttPublisher(max_inflight=1, queue_size=1)
+    publisher.start()
+    publisher.publish("device/d1/control", "on")
+    await settle()
+
+    assert publisher.publish("device/d2/control", "on") is True
+    assert publisher.publish("device/d3/control", "on") is False
+    assert publisher.stats()["dropped"] == 1
+
+    await publisher.stop(timeout=0.1)
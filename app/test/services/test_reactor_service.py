@@ -1,6 +1,8 @@
+import time
 import pytest
 from unittest.mock import patch, MagicMock, AsyncMock
 from app.services.reactor_service import process_event, compare
+from app.services.rule_engine import RuleEngine
 from fastapi import HTTPException
 
 # Sample data for testing
@@ -21,6 +23,20 @@ RULE_DATA = {
 }
 
 # Mock Event object
+# Device updates are covered by the action dispatcher tests
+@pytest.fixture(autouse=True)
+def mock_dispatch_actions():
+    with patch('app.services.reactor_service.dispatch_actions', AsyncMock()) as mock_dispatch:
+        yield mock_dispatch
+
+
+# Consequences are written through the write-behind buffer, covered by the consequence service tests
+@pytest.fixture(autouse=True)
+def mock_create_executed():
+    with patch('app.services.reactor_service.create_executed_consequences', AsyncMock()) as mock_create:
+        yield mock_create
+
+
 @pytest.fixture
 def mock_event():
     event = MagicMock()
@@ -54,41 +70,68 @@ def mock_consequence():
     consequence.status = "pending"
     return consequence
 
+async def build_engine(rules):
+    engine = RuleEngine()
+    query = MagicMock()
+    query.to_list = AsyncMock(return_value=rules)
+    with patch('app.services.rule_engine.Rule.find_all', return_value=query):
+        await engine.reload()
+    return engine
+
+
 # Test for process_event when the event triggers a rule
 @pytest.mark.asyncio
-async def test_process_event_trigger_rule(mock_event, mock_rule, mock_consequence):
-    # Mock Rule.find to return the mock rule wrapped in a list
-    with patch('app.services.reactor_service.Rule.find', AsyncMock(return_value=[mock_rule])), \
-         patch('app.services.reactor_service.Consequence.insert', AsyncMock()) as mock_insert:
-
+async def test_process_event_trigger_rule(mock_event, mock_rule, mock_consequence, mock_dispatch_actions, mock_create_executed):
+    engine = await build_engine([mock_rule])
+    with patch('app.services.reactor_service.rule_engine', engine), \
+         patch('app.services.reactor_service.Consequence', return_value=mock_consequence) as mock_cls:
         # Call the process_event function
         await process_event(mock_event)
 
-        # Ensure Consequence.insert was called
-        mock_insert.assert_called_once()
+        # Ensure the consequence was created for the correct device, applied, then recorded as executed
+        mock_cls.assert_called_once_with(
+            event_id="event_123",
+            rule_id="rule_123",
+            action="turn_on_heater",
+            device_id="device_123",
+        )
+        mock_dispatch_actions.assert_called_once_with([mock_consequence])
+        mock_create_executed.assert_called_once_with([mock_consequence])
 
-        # Check that the consequence was created for the correct device
-        mock_insert.assert_called_with()  # Ensure insert was called
-        print("Test passed successfully")
+
+# A failed dispatch records no consequence
+@pytest.mark.asyncio
+async def test_process_event_dispatch_failure(mock_event, mock_rule, mock_consequence, mock_dispatch_actions, mock_create_executed):
+    engine = await build_engine([mock_rule])
+    mock_dispatch_actions.side_effect = Exception("db down")
+    with patch('app.services.reactor_service.rule_engine', engine), \
+         patch('app.services.reactor_service.Consequence', return_value=mock_consequence):
+        with pytest.raises(HTTPException):
+            await process_event(mock_event)
+
+    mock_create_executed.assert_not_called()
 
 
 # Test for process_event when no rule is triggered
 @pytest.mark.asyncio
-async def test_process_event_no_rule_triggered(mock_event, mock_rule):
-    # Mock Rule.find to return no matching rules
-    with patch('app.services.reactor_service.Rule.find', AsyncMock(return_value=[])):
+async def test_process_event_no_rule_triggered(mock_event, mock_rule, mock_dispatch_actions, mock_create_executed):
+    engine = await build_engine([])
+    with patch('app.services.reactor_service.rule_engine', engine), \
+         patch('app.services.reactor_service.Consequence') as mock_cls:
         await process_event(mock_event)
 
-        # Since there are no rules, the Consequence.insert should not be called
-        with patch('app.services.reactor_service.Consequence.insert', AsyncMock()) as mock_insert:
-            mock_insert.assert_not_called()
+        # Since there are no rules, no consequence should be created
+        mock_cls.assert_not_called()
+        mock_dispatch_actions.assert_not_called()
+        mock_create_executed.assert_not_called()
 
 
-# Test for process_event when there is an error in processing
+# Test for process_event when the rules cannot be loaded
 @pytest.mark.asyncio
 async def test_process_event_error(mock_event, mock_rule):
-    # Mock Rule.find to raise an error
-    with patch('app.services.reactor_service.Rule.find', AsyncMock(side_effect=Exception("Test error"))):
+    engine = RuleEngine()
+    with patch('app.services.reactor_service.rule_engine', engine), \
+         patch.object(engine, 'reload', AsyncMock(side_effect=Exception("Test error"))):
         with pytest.raises(HTTPException) as exc_info:
             await process_event(mock_event)
 
@@ -101,25 +144,49 @@ async def test_process_event_error(mock_event, mock_rule):
     (29, ">", 28, True),
     (27, "<", 28, True),
     (28, "==", 28, True),
-    (30, "<", 28, False)
+    (30, "<", 28, False),
+    (28, ">=", 28, True),
+    (28, "!=", 27, False)
 ])
 def test_compare(value, operator, target, expected):
     result = compare(value, operator, target)
     assert result == expected
 
 
-# Test for process_event when there are matching rules (testing the full flow with mock Rule objects)
+# Test that process_event reads the compiled rules instead of querying Mongo per event
 @pytest.mark.asyncio
-async def test_process_event_with_matching_rule(mock_event, mock_rule, mock_consequence):
-    # Mock Rule.find to return the mock rule
-    with patch('app.services.reactor_service.Rule.find', AsyncMock(return_value=[mock_rule])), \
-         patch('app.services.reactor_service.Consequence.insert', AsyncMock()):
+async def test_process_event_uses_rule_engine(mock_event, mock_rule, mock_consequence, mock_create_executed):
+    engine = await build_engine([mock_rule])
+    with patch('app.services.reactor_service.rule_engine', engine), \
+         patch('app.services.reactor_service.Consequence', return_value=mock_consequence), \
+         patch('app.services.rule_engine.Rule.find_all') as mock_find_all:
+        await process_event(mock_event)
+        await process_event(mock_event)
 
+        mock_find_all.assert_not_called()
+        assert mock_create_executed.call_count == 2
+
+
+# The HTTP path evaluates the same operators as the Redis worker
+@pytest.mark.asyncio
+async def test_process_event_supports_all_operators(mock_event, mock_rule, mock_consequence, mock_create_executed):
+    mock_rule.operator = ">="
+    engine = await build_engine([mock_rule])
+    with patch('app.services.reactor_service.rule_engine', engine), \
+         patch('app.services.reactor_service.Consequence', return_value=mock_consequence):
         await process_event(mock_event)
 
-        # Ensure Consequence.insert was called
-        mock_consequence.insert.assert_called_once()
+        mock_create_executed.assert_called_once_with([mock_consequence])
 
-        # Ensure the consequence was created correctly
-        mock_consequence.insert.assert_called_with()
 
+# The sync path stores its ingest-to-action latency on the consequences too
+@pytest.mark.asyncio
+async def test_process_event_stores_latency(mock_event, mock_rule, mock_consequence, mock_create_executed):
+    engine = await build_engine([mock_rule])
+    mock_consequence.latency_seconds = None
+    with patch('app.services.reactor_service.rule_engine', engine), \
+         patch('app.services.reactor_service.Consequence', return_value=mock_consequence):
+        await process_event(mock_event, time.time() - 1.5)
+
+    assert 1.5 <= mock_consequence.latency_seconds < 2.5
+    mock_create_executed.assert_called_once_with([mock_consequence])
@@ -0,0 +1,230 @@
+import asyncio
+import random
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from app.models.rule import ConditionGroup
+from app.services.rule_engine import CompiledRule, Group, RuleEngine, OPERATORS, normalize_event
+from app.services.window_state import WindowStore
+
+
+def make_rule(rule_id, operator, condition, trigger_type="temperature_change", tree=None):
+    rule = MagicMock()
+    rule.id = rule_id
+    rule.trigger_type = trigger_type
+    rule.operator = operator
+    rule.condition = condition
+    rule.condition_tree = ConditionGroup.model_validate(tree) if tree else None
+    return rule
+
+
+def leaf(key, operator, value):
+    return {"key": key, "operator": operator, "value": value}
+
+
+def mock_find_all(rules):
+    query = MagicMock()
+    query.to_list = AsyncMock(return_value=rules)
+    return patch('app.services.rule_engine.Rule.find_all', return_value=query)
+
+
+# Queue events are flat, Event documents nest their values under `data`
+def test_normalize_event_shapes():
+    event = MagicMock()
+    event.event_type = "temperature_change"
+    event.data = {"temperature": 30}
+    queued = {"type": "temperature_change", "temperature": 30, "device_id": "d1"}
+
+    assert normalize_event(event) == ("temperature_change", {"temperature": 30})
+    assert normalize_event(queued) == ("temperature_change", queued)
+    assert normalize_event({"event_type": "motion", "data": {"motion": 1}}) == ("motion", {"motion": 1})
+
+
+# Legacy rules hold when any key matches, and fire once however many do
+def test_compiled_legacy_rule_is_an_or_of_keys():
+    compiled = CompiledRule(make_rule("r1", ">", {"temperature": 28.0, "humidity": 40.0}))
+
+    assert isinstance(compiled.root, Group) and compiled.root.any
+    assert compiled("temperature_change", {"temperature": 30, "humidity": 50}) is True
+    assert compiled("temperature_change", {"temperature": 20, "humidity": "wet"}) is False
+    assert compiled("humidity_change", {"temperature": 30}) is False
+
+
+# Both the HTTP and the queue event shapes reach the same compiled rules
+def test_match_is_shared_by_both_event_shapes():
+    engine = RuleEngine()
+    rule = make_rule("r1", ">=", {"temperature": 28.0})
+    engine.load([rule])
+    event = MagicMock()
+    event.event_type = "temperature_change"
+    event.data = {"temperature": 28}
+
+    assert engine.match(event) == [rule]
+    assert engine.match({"type": "temperature_change", "temperature": 28}) == [rule]
+    assert engine.compiled("r1").rule is rule
+
+
+# The vectorized batch path must agree with the compiled predicates
+def test_match_many_agrees_with_compiled_rules():
+    rng = random.Random(7)
+    rules = [
+        make_rule(f"r{i}", rng.choice(list(OPERATORS)), {rng.choice(["temperature", "humidity"]): float(rng.randint(0, 20))})
+        for i in range(200)
+    ]
+    events = [{"type": "temperature_change", "temperature": rng.randint(0, 20), "humidity": rng.randint(0, 20)}
+              for _ in range(80)]
+    engine = RuleEngine(vectorize_min_batch=10)
+    engine.load(rules)
+    compiled = [CompiledRule(rule) for rule in rules]
+
+    for event, matched in zip(events, engine.match_many(events)):
+        expected = sorted(c.id for c in compiled if c(*normalize_event(event)))
+        assert sorted(rule.id for rule in matched) == expected
+
+
+def test_and_or_tree_fires_once():
+    engine = RuleEngine(ttl_seconds=0)
+    rule = make_rule("r1", None, {}, tree={"op": "and", "conditions": [
+        leaf("temperature", ">", 28.0),
+        {"op": "or", "conditions": [leaf("humidity", "<", 40.0), leaf("window", "==", 1.0)]},
+    ]})
+    engine.load([rule])
+
+    assert engine.match({"type": "temperature_change", "temperature": 30, "humidity": 30, "window": 1}) == [rule]
+    assert engine.match({"type": "temperature_change", "temperature": 30, "humidity": 50, "window": 1}) == [rule]
+    assert engine.match({"type": "temperature_change", "temperature": 30, "humidity": 50}) == []
+    assert engine.match({"type": "temperature_change", "temperature": 20, "humidity": 30}) == []
+
+
+# Rules sharing a comparison share one interned leaf, evaluated once per event
+def test_shared_leaves_are_interned():
+    engine = RuleEngine(ttl_seconds=0)
+    hot = leaf("temperature", ">", 28.0)
+    engine.load([
+        make_rule("r1", None, {}, tree={"op": "and", "conditions": [hot, leaf("humidity", "<", 40.0)]}),
+        make_rule("r2", None, {}, tree={"op": "and", "conditions": [hot, leaf("humidity", ">", 60.0)]}),
+        make_rule("r3", ">", {"temperature": 28.0}),
+    ])
+
+    assert len(engine.index) == 3
+    assert engine.compiled("r1").leaves[0] is engine.compiled("r3").root
+
+    engine.remove("r1")
+    engine.remove("r3")
+    assert len(engine.index) == 2
+
+
+# Randomized AND/OR trees, matched through the index, agree with direct evaluation
+@pytest.mark.parametrize("seed", [1, 2])
+def test_tree_matching_agrees_with_direct_evaluation(seed):
+    rng = random.Random(seed)
+
+    def random_tree(depth):
+        if depth == 0 or rng.random() < 0.3:
+            return leaf(rng.choice(["temperature", "humidity", "light"]), rng.choice(list(OPERATORS)), float(rng.randint(0, 10)))
+        return {"op": rng.choice(["and", "or"]), "conditions": [random_tree(depth - 1) for _ in range(rng.randint(1, 3))]}
+
+    rules = [make_rule(f"r{i}", None, {}, tree={"op": "and", "conditions": [random_tree(3)]}) for i in range(150)]
+    engine = RuleEngine(ttl_seconds=0, reorder_interval=25)
+    engine.load(rules)
+    compiled = [CompiledRule(rule) for rule in rules]
+
+    for _ in range(100):
+        event = {"type": "temperature_change", **{key: rng.randint(0, 10) for key in ["temperature", "humidity", "light"]}}
+        expected = sorted(c.id for c in compiled if c(*normalize_event(event)))
+        assert sorted(rule.id for rule in engine.match(event)) == expected
+
+
+# AND rules are only registered under their rarest leaf
+def test_and_rule_anchored_under_most_selective_leaf():
+    engine = RuleEngine(ttl_seconds=0)
+    engine.load([make_rule("r1", None, {}, tree={"op": "and", "conditions": [
+        leaf("temperature", ">", 28.0), leaf("motion", "==", 1.0),
+    ]})])
+
+    anchors = engine.compiled("r1").anchors
+    assert [(a.key, a.operator) for a in anchors] == [("motion", "==")]
+
+
+@pytest.mark.asyncio
+async def test_ensure_loaded_reads_rules_once():
+    engine = RuleEngine(ttl_seconds=0)
+    with mock_find_all([make_rule("r1", ">", {"temperature": 28.0})]) as find_all:
+        await engine.ensure_loaded()
+        await engine.ensure_loaded()
+
+    find_all.assert_called_once()
+    assert len(engine) == 1
+
+
+@pytest.mark.asyncio
+async def test_writes_update_loaded_engine_only():
+    engine = RuleEngine(ttl_seconds=0)
+    engine.add(make_rule("early", ">", {"temperature": 1.0}))
+    assert not engine.loaded and len(engine) == 0
+
+    with mock_find_all([]):
+        await engine.ensure_loaded()
+    engine.add(make_rule("r1", ">", {"temperature": 28.0}))
+    assert len(engine.match({"type": "temperature_change", "temperature": 30})) == 1
+
+    engine.remove("r1")
+    assert engine.match({"type": "temperature_change", "temperature": 30}) == []
+
+
+# Aggregate leaves compare a device's sliding window, not the single event value
+def test_windowed_aggregate_conditions():
+    engine = RuleEngine(ttl_seconds=0, windows=WindowStore())
+    avg_rule = make_rule("avg", None, {}, tree={"op": "and", "conditions": [
+        {"key": "temperature", "operator": ">", "value": 27.0, "aggregate": "avg", "window_seconds": 300},
+    ]})
+    count_rule = make_rule("count", None, {}, trigger_type="motion_detected", tree={"op": "and", "conditions": [
+        {"key": "motion", "operator": ">=", "value": 3, "aggregate": "count", "window_seconds": 60},
+    ]})
+    engine.load([avg_rule, count_rule])
+
+    def temperature(t, value, device="d1"):
+        return {"type": "temperature_change", "device_id": device, "timestamp": t, "temperature": value}
+
+    assert engine.match(temperature("2024-01-01T00:00:00", 26.0)) == []
+    assert engine.match(temperature("2024-01-01T00:01:00", 30.0)) == [avg_rule]
+    # Another device has its own window
+    assert engine.match(temperature("2024-01-01T00:01:00", 27.5, device="d2")) == [avg_rule]
+    assert engine.match(temperature("2024-01-01T00:02:00", 20.0)) == []
+
+    motion = {"type": "motion_detected", "device_id": "d1", "motion": 1, "timestamp": "2024-01-01T00:00:00"}
+    assert [engine.match({**motion, "timestamp": f"2024-01-01T00:00:{s:02d}"}) for s in (0, 10, 20)] == [[], [], [count_rule]]
+
+
+# Expression rules are parsed into a condition tree and matched through the index
+def test_expression_rules():
+    engine = RuleEngine(ttl_seconds=0)
+    rule = make_rule("expr", None, {})
+    rule.expression = "temperature > 28 and humidity < 40"
+    engine.load([rule])
+
+    compiled = engine.compiled("expr")
+    assert compiled("temperature_change", {"temperature": 30, "humidity": 30}) is True
+    assert engine.match({"type": "temperature_change", "temperature": 30, "humidity": 30}) == [rule]
+    assert engine.match({"type": "temperature_change", "temperature": 30, "humidity": 50}) == []
+
+
+# Reordering runs per trigger type after the matching call, and only types with rules are counted
+@pytest.mark.asyncio
+async def test_reorder_scheduled_per_trigger_type():
+    engine = RuleEngine(ttl_seconds=0, reorder_interval=3)
+    engine.load([make_rule("r1", None, {}, tree={"op": "and", "conditions": [
+        leaf("temperature", ">", 28.0), leaf("motion", "==", 1.0),
+    ]})])
+
+    with patch.object(engine, "reorder", wraps=engine.reorder) as reorder:
+        for _ in range(3):
+            engine.match({"type": "temperature_change", "temperature": 30, "motion": 0})
+        for i in range(50):
+            engine.match({"type": f"made_up_{i}", "temperature": 30})
+        reorder.assert_not_called()
+        await asyncio.sleep(0)
+
+    reorder.assert_called_once_with("temperature_change")
+    assert engine._seen == {"temperature_change": 3}
+    assert engine._since_reorder == {"temperature_change": 0}
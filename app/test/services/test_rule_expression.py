@@ -0,0 +1,44 @@
+import pytest
+
+from app.models.rule import ConditionGroup, ConditionLeaf
+from app.services.rule_expression import (
+    ExpressionError,
+    parse_expression,
+)
+
+
+def test_parse_expression_builds_condition_tree():
+    tree = parse_expression("temperature > 28 and (humidity < 40 or 18 < light <= 25)")
+
+    assert tree == ConditionGroup(op="and", conditions=[
+        ConditionLeaf(key="temperature", operator=">", value=28.0),
+        ConditionGroup(op="or", conditions=[
+            ConditionLeaf(key="humidity", operator="<", value=40.0),
+            ConditionGroup(op="and", conditions=[
+                ConditionLeaf(key="light", operator=">", value=18.0),
+                ConditionLeaf(key="light", operator="<=", value=25.0),
+            ]),
+        ]),
+    ])
+
+
+def test_parse_expression_aggregates():
+    leaf = parse_expression("count(motion, 60) >= 3")
+    assert leaf == ConditionLeaf(key="motion", operator=">=", value=3.0, aggregate="count", window_seconds=60.0)
+
+
+# Anything outside the whitelisted grammar is rejected before compilation
+@pytest.mark.parametrize("expression", [
+    "__import__('os').system('ls') > 1",
+    "temperature > humidity",
+    "not temperature > 1",
+    "sensor.temperature > 1",
+    "temperature in [1, 2]",
+    "avg(temperature, -5) > 1",
+    "temperature > 1 if humidity else 2",
+    "temperature >",
+])
+def test_parse_expression_rejects_unsupported_syntax(expression):
+    with pytest.raises(ExpressionError):
+        parse_expression(expression)
+
@@ -0,0 +1,68 @@
+import random
+import pytest
+from unittest.mock import MagicMock
+
+from app.services.rule_engine import Leaf
+from app.services.rule_index import ConditionIndex, ThresholdIndex
+from app.services.rule_service import OPERATORS
+
+
+def make_rule(rule_id, operator, condition, trigger_type="temperature_change"):
+    rule = MagicMock()
+    rule.id = rule_id
+    rule.trigger_type = trigger_type
+    rule.operator = operator
+    rule.condition = condition
+    return rule
+
+
+def loaded_index(leaves):
+    index = ConditionIndex()
+    index.load(leaves)
+    return index
+
+
+# The sorted index must return exactly the rules the linear OPERATORS loop would
+@pytest.mark.parametrize("operator", [">", "<", "==", ">=", "<="])
+def test_threshold_index_matches_linear_scan(operator):
+    rng = random.Random(42)
+    index = ThresholdIndex()
+    rules = []
+    for i in range(200):
+        threshold = float(rng.randint(0, 40))
+        rule = make_rule(f"rule_{i}", operator, {"temperature": threshold})
+        rules.append((rule, threshold))
+        index.add(threshold, rule)
+
+    for value in [-1.0, 0.0, 12.5, 20.0, 40.0, 41.0]:
+        expected = {r.id for r, t in rules if OPERATORS[operator](value, t)}
+        assert {r.id for r in index.match(operator, value)} == expected
+
+
+def test_threshold_index_remove():
+    index = ThresholdIndex()
+    first = make_rule("rule_1", ">", {"temperature": 20.0})
+    second = make_rule("rule_2", ">", {"temperature": 20.0})
+    index.add(20.0, first)
+    index.add(20.0, second)
+
+    assert index.remove(20.0, first) is True
+    assert index.match(">", 25.0) == [second]
+    assert index.remove(20.0, first) is False
+
+
+def test_condition_index_match_by_trigger_and_key():
+    hot = Leaf("temperature_change", "temperature", ">", 28.0)
+    dry = Leaf("temperature_change", "humidity", "<", 30.0)
+    motion = Leaf("motion_detected", "motion", "==", 1.0)
+    index = loaded_index([hot, dry, motion])
+
+    assert index.match("temperature_change", {"temperature": 30, "humidity": 20}) == [hot, dry]
+    assert index.match("temperature_change", {"temperature": "hot"}) == []
+    assert index.match("motion_detected", {"motion": 1}) == [motion]
+    assert index.match("unknown", {"temperature": 30}) == []
+
+    assert index.remove(hot) is True
+    assert index.match("temperature_change", {"temperature": 30}) == []
+    assert index.remove(hot) is False
+    assert len(index) == 2
@@ -10,6 +10,7 @@ from app.services.rule_service import (
 )
 from app.schemas.rule import RuleCreate
 from app.models.rule import Rule
+from app.services.rule_engine import rule_engine
 
 # Mock data
 VALID_RULE_ID = "60f5c4a1b4c32f1b5c1d34c5"
@@ -27,6 +28,13 @@ RULE_CREATE_DATA = RuleCreate(
 )
 
 
+@pytest.fixture(autouse=True)
+def reset_rule_engine():
+    rule_engine.invalidate()
+    yield
+    rule_engine.invalidate()
+
+
 # Test for creating a rule
 @pytest.mark.asyncio
 async def test_create_rule():
@@ -102,3 +110,58 @@ async def test_delete_rule_not_found():
     with patch('app.services.rule_service.Rule.get', return_value=None):
         with pytest.raises(HTTPException):
             await delete_rule_by_id(VALID_RULE_ID)
+
+
+# Test that rule writes keep a loaded index in sync without reloading it
+@pytest.mark.asyncio
+async def test_rule_writes_update_index():
+    mock_async_query = AsyncMock()
+    mock_async_query.to_list.return_value = []
+
+    new_rule = MagicMock()
+    new_rule.id = VALID_RULE_ID
+    new_rule.trigger_type = "temperature_change"
+    new_rule.condition = {"temperature": 25.0}
+    new_rule.operator = ">"
+    new_rule.insert = AsyncMock()
+    new_rule.delete = AsyncMock()
+
+    with patch('app.services.rule_service.Rule.find_all', return_value=mock_async_query) as mock_find_all, \
+         patch('app.services.rule_service.Rule', return_value=new_rule):
+        assert await get_matching_rules(EVENT_DATA) == []
+
+        await create_rule(RULE_CREATE_DATA)
+        assert await get_matching_rules(EVENT_DATA) == [new_rule]
+
+    with patch('app.services.rule_service.Rule.get', return_value=new_rule), \
+         patch('app.services.rule_service.Rule.find_all', return_value=mock_async_query) as mock_find_all:
+        await delete_rule_by_id(VALID_RULE_ID)
+        assert await get_matching_rules(EVENT_DATA) == []
+        mock_find_all.assert_not_called()
+
+
+# A rule needs either a condition tree or legacy condition + operator
+def test_rule_create_requires_a_condition():
+    tree = {"op": "and", "conditions": [
+        {"key": "temperature", "operator": ">", "value": 28.0},
+        {"key": "humidity", "operator": "<", "value": 40.0},
+    ]}
+    rule_in = RuleCreate(name="Hot and dry", trigger_type="temperature_change",
+                         condition_tree=tree, target_device_id="device_123", action="turn_on")
+    assert rule_in.condition_tree.conditions[1].operator == "<"
+
+    with pytest.raises(ValueError):
+        RuleCreate(name="Empty", trigger_type="temperature_change",
+                   target_device_id="device_123", action="turn_on")
+
+
+def test_rule_create_parses_expression():
+    rule_in = RuleCreate(name="Hot and dry", trigger_type="temperature_change",
+                         expression="temperature > 28 and humidity < 40",
+                         target_device_id="device_123", action="turn_on")
+    assert [leaf.key for leaf in rule_in.condition_tree.conditions] == ["temperature", "humidity"]
+
+    with pytest.raises(ValueError):
+        RuleCreate(name="Unsafe", trigger_type="temperature_change",
+                   expression="__import__('os') > 1",
+                   target_device_id="device_123", action="turn_on")
@@ -0,0 +1,96 @@
+import asyncio
+import json
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from app.services.telemetry_bridge import TelemetryBridge, decode_telemetry
+
+
+def message(payload):
+    return json.dumps(payload).encode()
+
+
+# Both the API shape and the flat queue shape decode, the device id comes from the topic
+def test_decode_telemetry_shapes():
+    nested = decode_telemetry("device/+/telemetry", "device/d1/telemetry",
+                              message({"event_type": "temperature_change", "data": {"temperature": 21.5}}))
+    flat = decode_telemetry("device/+/telemetry", "device/d1/telemetry",
+                            message({"type": "temperature_change", "temperature": 21.5, "timestamp": "2024-01-01T00:00:00"}))
+
+    assert nested == flat
+    assert nested.device_id == "d1"
+    assert nested.data == {"temperature": 21.5}
+
+
+def test_decode_telemetry_device_from_payload():
+    event = decode_telemetry("sensors/telemetry", "sensors/telemetry",
+                             message({"device_id": "d2", "event_type": "motion_detected", "data": {"motion": 1}}))
+
+    assert event.device_id == "d2"
+
+
+@pytest.mark.asyncio
+async def test_flush_ingests_in_batches():
+    bridge = TelemetryBridge(batch_size=2)
+    for value in (20, 21, 22):
+        bridge.receive("device/d1/telemetry", message({"type": "temperature_change", "temperature": value}))
+    bridge.receive("device/d1/telemetry", b"not json")
+    bridge.receive("device/d1/telemetry", message({"type": "temperature_change", "temperature": "hot"}))
+
+    with patch('app.services.telemetry_bridge.ingest_events', AsyncMock()) as mock_ingest:
+        await bridge.flush()
+
+    assert [[event.data["temperature"] for event in call.args[0]] for call in mock_ingest.call_args_list] == [[20, 21], [22]]
+    assert bridge.stats()["ingested"] == 3
+    assert bridge.stats()["invalid"] == 2
+    assert len(bridge) == 0
+
+
+def test_receive_drops_beyond_max_pending():
+    bridge = TelemetryBridge(batch_size=1, max_pending=2)
+    for _ in range(3):
+        bridge.receive("device/d1/telemetry", b"{}")
+
+    assert len(bridge) == 2
+    assert bridge.stats()["dropped"] == 1
+
+
+@pytest.mark.asyncio
+async def test_subscribes_on_connect():
+    bridge = TelemetryBridge(topic="home/+/telemetry", qos=1)
+    client = MagicMock()
+    with patch('app.services.telemetry_bridge.mqtt.Client', return_value=client), \
+         patch('app.services.telemetry_bridge.ingest_events', AsyncMock()):
+        bridge.start()
+        bridge._on_connect(client, None, {}, 0)
+        await bridge.stop()
+
+    client.subscribe.assert_called_once_with("home/+/telemetry", qos=1)
+    client.loop_stop.assert_called_once()
+
+
+# Stopping while a batch is being ingested keeps it for the final flush
+@pytest.mark.asyncio
+async def test_stop_during_ingest_keeps_batch():
+    started = asyncio.Event()
+
+    async def slow_ingest(events):
+        if not started.is_set():
+            started.set()
+            await asyncio.sleep(60)
+
+    bridge = TelemetryBridge(batch_size=2, flush_interval=60)
+    client = MagicMock()
+    with patch('app.services.telemetry_bridge.mqtt.Client', return_value=client), \
+         patch('app.services.telemetry_bridge.ingest_events', AsyncMock(side_effect=slow_ingest)) as mock_ingest:
+        bridge.start()
+        bridge.receive("device/d1/telemetry", message({"type": "temperature_change", "temperature": 20}))
+        bridge.receive("device/d1/telemetry", b"not json")
+        await started.wait()
+        await bridge.stop()
+
+    assert mock_ingest.call_count == 2
+    assert [event.data["temperature"] for event in mock_ingest.call_args.args[0]] == [20]
+    assert bridge.stats()["ingested"] == 1
+    assert bridge.stats()["invalid"] == 1
+    assert len(bridge) == 0
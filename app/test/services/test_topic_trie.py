@@ -0,0 +1,75 @@
+import random
+import pytest
+from paho.mqtt.client import topic_matches_sub
+
+from app.services.topic_trie import TopicTrie
+
+
+def matched_filters(trie, topic):
+    return sorted(topic_filter for topic_filter, _ in trie.match(topic))
+
+
+def test_wildcards():
+    trie = TopicTrie()
+    for topic_filter in ["device/+/control", "device/#", "device/light_1/control", "#", "+/+/telemetry", "$SYS/#"]:
+        trie.add(topic_filter, topic_filter)
+
+    assert matched_filters(trie, "device/light_1/control") == [
+        "#", "device/#", "device/+/control", "device/light_1/control",
+    ]
+    assert matched_filters(trie, "device/d2/telemetry") == ["#", "+/+/telemetry", "device/#"]
+    # "a/#" also matches "a"
+    assert matched_filters(trie, "device") == ["#", "device/#"]
+    # Wildcards in the first level do not match $ topics
+    assert matched_filters(trie, "$SYS/broker/uptime") == ["$SYS/#"]
+
+
+def test_dispatch_and_remove():
+    trie = TopicTrie()
+    received = []
+    handler = lambda topic, payload: received.append((topic, payload))
+    trie.add("device/+/control", handler)
+    trie.add("device/+/control", print)
+
+    assert trie.dispatch("device/d1/control", "on") == 2
+    assert received == [("device/d1/control", "on")]
+
+    assert trie.remove("device/+/control", print) is True
+    assert len(trie) == 1 and trie.filters() == ["device/+/control"]
+    trie.add("device/+/control", print)
+    trie.add("device/#", print)
+    # Each filter once, however many handlers it has
+    assert sorted(trie.filters()) == ["device/#", "device/+/control"]
+    assert trie.remove("device/#") is True
+    assert trie.remove("device/+/control") is True
+    assert trie.remove("device/+/control") is False
+    assert len(trie) == 0 and trie.filters() == []
+    assert trie.dispatch("device/d1/control", "on") == 0
+
+
+@pytest.mark.parametrize("topic_filter", ["device/#/control", "device/light+", "device/a#"])
+def test_invalid_filters(topic_filter):
+    with pytest.raises(ValueError):
+        TopicTrie().add(topic_filter, print)
+
+
+# Random filters and topics agree with paho's own matcher
+def test_agrees_with_paho_matcher():
+    rng = random.Random(3)
+    levels = ["device", "d1", "d2", "control", "telemetry", "$SYS"]
+
+    def random_filter():
+        parts = [rng.choice(levels + ["+"]) for _ in range(rng.randint(1, 4))]
+        if rng.random() < 0.3:
+            parts.append("#")
+        return "/".join(parts)
+
+    filters = sorted({random_filter() for _ in range(300)})
+    trie = TopicTrie()
+    for topic_filter in filters:
+        trie.add(topic_filter, None)
+
+    for _ in range(300):
+        topic = "/".join(rng.choice(levels) for _ in range(rng.randint(1, 4)))
+        expected = sorted(f for f in filters if topic_matches_sub(f, topic))
+        assert matched_filters(trie, topic) == expected, topic
@@ -0,0 +1,55 @@
+import random
+import pytest
+
+from app.services.rule_engine import Leaf, normalize_event
+from app.services.rule_index import ConditionIndex
+from app.services.rule_service import OPERATORS
+from app.services.vectorized_rules import match_batch
+
+TRIGGER_TYPES = ["temperature_change", "humidity_change"]
+KEYS = ["temperature", "humidity"]
+
+
+def scalar_match(leaves, event):
+    matched = []
+    for leaf in leaves:
+        if leaf.trigger_type != event.get("type"):
+            continue
+        if leaf.key in event and OPERATORS[leaf.operator](event[leaf.key], leaf.value):
+            matched.append(id(leaf))
+    return sorted(matched)
+
+
+# The vectorized evaluator must agree with OPERATORS for every event in the batch
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_match_batch_matches_operator_semantics(seed):
+    rng = random.Random(seed)
+    leaves = [
+        Leaf(rng.choice(TRIGGER_TYPES), rng.choice(KEYS), rng.choice(list(OPERATORS)), float(rng.randint(0, 20)))
+        for _ in range(300)
+    ]
+    events = [
+        {"type": rng.choice(TRIGGER_TYPES), rng.choice(KEYS): rng.randint(0, 20)}
+        for _ in range(100)
+    ]
+    index = ConditionIndex()
+    index.load(leaves)
+
+    results = match_batch(index, [normalize_event(event) for event in events])
+
+    assert len(results) == len(events)
+    for event, matched in zip(events, results):
+        assert sorted(id(leaf) for leaf in matched) == scalar_match(leaves, event)
+
+
+def test_match_batch_skips_non_numeric_values():
+    index = ConditionIndex()
+    index.load([Leaf("temperature_change", "temperature", ">", 10.0)])
+
+    results = match_batch(index, [
+        ("temperature_change", {"temperature": "hot"}),
+        ("temperature_change", {}),
+        ("temperature_change", {"temperature": 11}),
+    ])
+
+    assert [len(matched) for matched in results] == [0, 0, 1]
@@ -0,0 +1,112 @@
+import pytest
+import fakeredis
+from unittest.mock import patch
+
+from app.services.window_state import SlidingWindow, WindowStore, aggregate_key, event_time
+
+
+def test_sliding_window_aggregates():
+    window = SlidingWindow(60, buckets=6)
+    for timestamp, value in [(0, 20.0), (15, 30.0), (35, 10.0)]:
+        window.add(timestamp, value)
+
+    assert window.value("count") == 3
+    assert window.value("sum") == 60.0
+    assert window.value("avg") == 20.0
+    assert window.value("min") == 10.0
+    assert window.value("max") == 30.0
+
+
+# Whole buckets expire once they fall out of the window
+def test_sliding_window_expires_old_buckets():
+    window = SlidingWindow(60, buckets=6)
+    window.add(0, 100.0)
+    window.add(30, 10.0)
+    window.add(65, 20.0)
+
+    assert window.value("count") == 2
+    assert window.value("max") == 20.0
+
+    window.add(1000, 5.0)
+    assert window.value("count") == 1
+    assert window.value("avg") == 5.0
+
+    # Late events older than the window are ignored
+    window.add(900, 50.0)
+    assert window.value("count") == 1
+
+
+def test_empty_window_has_no_average():
+    window = SlidingWindow(60)
+    assert window.value("avg") is None
+    assert window.value("count") == 0
+
+
+def test_store_evicts_least_recently_updated():
+    store = WindowStore(max_series=2)
+    store.observe("d1", "temperature", 60, 0, 1.0)
+    store.observe("d2", "temperature", 60, 0, 1.0)
+    store.observe("d1", "temperature", 60, 1, 1.0)
+    store.observe("d3", "temperature", 60, 1, 1.0)
+
+    assert store.get("d2", "temperature", 60) is None
+    assert store.get("d1", "temperature", 60).value("count") == 2
+    assert store.stats()["evicted"] == 1
+
+
+@pytest.mark.asyncio
+async def test_snapshot_round_trip():
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    with patch('app.services.window_state.redis_client', redis):
+        store = WindowStore(buckets=6)
+        store.observe("d1", "temperature", 300, 0, 25.0)
+        store.observe("d1", "temperature", 300, 10, 29.0)
+        await store.snapshot()
+
+        restored = WindowStore(buckets=6)
+        await restored.restore()
+
+    window = restored.get("d1", "temperature", 300)
+    assert window.value("avg") == 27.0
+    window.add(20, 30.0)
+    assert window.value("count") == 3
+
+
+@pytest.mark.asyncio
+async def test_snapshot_writes_only_changed_windows_in_chunks():
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    with patch('app.services.window_state.redis_client', redis):
+        store = WindowStore(max_series=3, buckets=6, snapshot_key="windows:r1", snapshot_chunk=2)
+        for device_id in ("d1", "d2", "d3"):
+            store.observe(device_id, "temperature", 60, 0, 20.0)
+        await store.snapshot()
+        assert await redis.hlen("windows:r1") == 3
+
+        # Another replica's snapshot is left alone
+        await redis.hset("windows:r2", "x", "y")
+        await redis.hset("windows:r1", '["d3", "temperature", 60]', "not rewritten")
+        store.observe("d1", "temperature", 60, 1, 30.0)
+        store.observe("d4", "temperature", 60, 1, 30.0)  # evicts d2
+        await store.snapshot()
+
+        stored = await redis.hgetall("windows:r1")
+        assert sorted(stored) == ['["d1", "temperature", 60]', '["d3", "temperature", 60]', '["d4", "temperature", 60]']
+        assert stored['["d3", "temperature", 60]'] == "not rewritten"
+        assert await redis.hgetall("windows:r2") == {"x": "y"}
+
+        # Nothing changed, nothing written
+        with patch.object(redis, 'pipeline') as mock_pipeline:
+            await store.snapshot()
+        mock_pipeline.assert_not_called()
+
+        restored = WindowStore(buckets=6, snapshot_key="windows:r1")
+        await restored.restore()
+        # The malformed entry is dropped from the hash
+        assert await redis.hlen("windows:r1") == 2
+    assert restored.get("d1", "temperature", 60).value("avg") == 25.0
+    assert restored.get("d3", "temperature", 60) is None
+
+
+def test_aggregate_key_and_event_time():
+    assert aggregate_key("avg", "temperature", 300.0) == "avg(temperature,300)"
+    assert event_time({"timestamp": "1970-01-01T00:01:00+00:00"}) == 60.0
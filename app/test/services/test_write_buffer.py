@@ -0,0 +1,92 @@
+import asyncio
+import pytest
+from unittest.mock import MagicMock, AsyncMock
+
+from app.services.write_buffer import WriteBehindBuffer
+
+
+def make_model(insert_many=None):
+    model = MagicMock()
+    model.__name__ = "Event"
+    model.insert_many = insert_many or AsyncMock()
+    return model
+
+
+def make_docs(count):
+    return [MagicMock(id=None) for _ in range(count)]
+
+
+# Without a running flusher the buffer writes through and still assigns ids
+@pytest.mark.asyncio
+async def test_put_writes_through_when_not_started():
+    model = make_model()
+    buffer = WriteBehindBuffer(model, max_batch=10, flush_interval=60, max_pending=100)
+    docs = make_docs(3)
+
+    await buffer.put_many(docs)
+
+    model.insert_many.assert_called_once_with(docs, ordered=False)
+    assert all(doc.id is not None for doc in docs)
+
+
+# Reaching max_batch wakes the flusher; stop() flushes whatever is left
+@pytest.mark.asyncio
+async def test_flush_on_size_and_on_stop():
+    model = make_model()
+    buffer = WriteBehindBuffer(model, max_batch=5, flush_interval=60, max_pending=100)
+    buffer.start()
+
+    await buffer.put_many(make_docs(5))
+    await asyncio.sleep(0.01)
+    assert model.insert_many.call_count == 1
+    assert len(buffer) == 0
+
+    await buffer.put_many(make_docs(2))
+    assert len(buffer) == 2
+    await buffer.stop()
+
+    assert model.insert_many.call_count == 2
+    assert buffer.stats()["flushed"] == 7
+    assert buffer.stats()["depth"] == 0
+
+
+# A failed flush keeps the documents for the next attempt
+@pytest.mark.asyncio
+async def test_failed_flush_requeues():
+    model = make_model(AsyncMock(side_effect=[Exception("db down"), None]))
+    buffer = WriteBehindBuffer(model, max_batch=10, flush_interval=60, max_pending=100)
+    buffer._task = MagicMock()  # buffer documents without a background flusher
+
+    await buffer.put_many(make_docs(3))
+    with pytest.raises(Exception):
+        await buffer.flush()
+    assert len(buffer) == 3
+
+    await buffer.flush()
+    assert len(buffer) == 0
+    assert buffer.flushed == 3
+
+
+# Stopping while a flush is in flight keeps its batch for the final flush
+@pytest.mark.asyncio
+async def test_stop_during_flush_keeps_batch():
+    started = asyncio.Event()
+
+    async def slow_insert(documents, ordered):
+        if not started.is_set():
+            started.set()
+            await asyncio.sleep(60)
+
+    model = make_model(AsyncMock(side_effect=slow_insert))
+    buffer = WriteBehindBuffer(model, max_batch=5, flush_interval=60, max_pending=100)
+    buffer.start()
+    docs = make_docs(5)
+
+    await buffer.put_many(docs)
+    await started.wait()
+    await buffer.stop()
+
+    assert model.insert_many.call_count == 2
+    assert model.insert_many.call_args.args[0] == docs
+    assert buffer.stats()["flushed"] == 5
+    assert buffer.stats()["depth"] == 0
@@ -0,0 +1,11 @@
+"""Helpers shared by the benchmark scripts."""
+import subprocess
+from typing import Optional
+
+
+def git_revision() -> Optional[str]:
+    """Short hash of the checked-out commit, recorded with the results so runs can be told apart."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,342 @@
+"""
+End-to-end throughput harness: boots app.main:app in process behind httpx's
+ASGI transport, with fakeredis for redis_client and mongomock-motor for
+MongoDB (or a disposable mongod given with --mongo-url), and drives the API
+and the reactor queue at a configurable concurrency.
+
+Each scenario reports requests/s, p50/p95/p99 latency and errors; scenarios
+feeding the reactor also report reactor lag (event timestamp to the worker
+picking it up) and how long the queue took to drain. The output is JSON so
+runs of two releases can be diffed:
+
+    python -m benchmarks.e2e_throughput --requests 2000 --concurrency 50 > e2e.json
+    python -m benchmarks.e2e_throughput --scenarios monitor_async,queue --rules 10000
+    python -m benchmarks.e2e_throughput --mongo-url mongodb://localhost:27017 --json e2e.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import random
+import sys
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+from unittest.mock import patch
+
+import fakeredis
+import httpx
+from beanie import PydanticObjectId, init_beanie
+
+from app.core import database
+from app.devices.fleet_simulator import percentile
+from app.core import redis_client as redis_module
+from app.main import app
+from app.models.action import Action
+from app.models.automation import Automation
+from app.models.consequence import Consequence
+from app.models.device import Device
+from app.models.event import Event
+from app.models.rule import Rule
+from app.models.sensor import Sensor
+from app.models.user import User
+from app.queues import reactor_pool as reactor_pool_module
+from app.queues.reactor_pool import reactor_pool
+from app.queues.transport import event_transport
+from app.services.mqtt_publisher import mqtt_publisher
+from app.services.rule_engine import rule_engine
+from app.services.telemetry_bridge import telemetry_bridge
+from benchmarks.common import git_revision
+
+SCENARIOS = ["monitor_sync", "monitor_async", "devices", "dashboard", "queue"]
+EVENT_TYPES = {"temperature_change": "temperature", "humidity_change": "humidity", "motion_detected": "motion"}
+DATABASE_NAME = "e2e_throughput"
+DOCUMENT_MODELS = [User, Device, Sensor, Event, Automation, Action, Consequence, Rule]
+
+
+def latency_summary(latencies: List[float]) -> dict:
+    as_ms = lambda seconds: round(seconds * 1e3, 3) if seconds is not None else None
+    return {
+        "p50_ms": as_ms(percentile(latencies, 0.5)),
+        "p95_ms": as_ms(percentile(latencies, 0.95)),
+        "p99_ms": as_ms(percentile(latencies, 0.99)),
+    }
+
+
+def mongomock_patches() -> list:
+    """
+    Patches letting mongomock-motor serve Beanie 2 and pymongo 4.9+, which
+    pass arguments mongomock does not know yet (authorizedCollections when
+    listing collections, sort on bulk updates); both only matter to a real
+    server.
+    """
+    import mongomock
+    from mongomock.collection import BulkOperationBuilder
+
+    list_collection_names = mongomock.Database.list_collection_names
+    add_update = BulkOperationBuilder.add_update
+
+    def list_names(self, filter=None, session=None, **kwargs):
+        return list_collection_names(self, filter, session)
+
+    def add_update_without_sort(self, *args, sort=None, **kwargs):
+        return add_update(self, *args, **kwargs)
+
+    return [
+        patch.object(mongomock.Database, "list_collection_names", list_names),
+        patch.object(BulkOperationBuilder, "add_update", add_update_without_sort),
+    ]
+
+
+@contextlib.contextmanager
+def stand_ins(mongo_url: Optional[str], mqtt: bool):
+    """Point the app at fakeredis and a local MongoDB for the duration of the block."""
+    fake_redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    original = redis_module.redis_client
+    patches = [
+        patch.object(module, "redis_client", fake_redis)
+        for name, module in list(sys.modules.items())
+        if name.startswith("app.") and getattr(module, "redis_client", None) is original
+    ]
+
+    async def init_db():
+        if mongo_url:
+            from motor.motor_asyncio import AsyncIOMotorClient
+            database.client = AsyncIOMotorClient(mongo_url)
+            await database.client.drop_database(DATABASE_NAME)
+        else:
+            from mongomock_motor import AsyncMongoMockClient
+            database.client = AsyncMongoMockClient()
+        await init_beanie(database=database.client[DATABASE_NAME], document_models=DOCUMENT_MODELS)
+
+    patches.append(patch("app.main.init_db", init_db))
+    if not mongo_url:
+        patches.extend(mongomock_patches())
+    if not mqtt:
+        # No broker: keep the publisher and the telemetry bridge from reconnecting in the background
+        for component in (mqtt_publisher, telemetry_bridge):
+            patches.append(patch.object(component, "start", lambda: None))
+    with contextlib.ExitStack() as stack:
+        for p in patches:
+            stack.enter_context(p)
+        yield fake_redis
+
+
+class ReactorLag:
+    """Wraps the reactor's batch handler to record how old each event is when a worker picks it up."""
+
+    def __init__(self):
+        self.lags: List[float] = []
+        self.handled = 0
+        self._handle = reactor_pool_module.handle_messages
+
+    async def __call__(self, messages):
+        now = datetime.utcnow()
+        for _, event in messages:
+            timestamp = event.get("timestamp")
+            if timestamp:
+                self.lags.append((now - datetime.fromisoformat(timestamp)).total_seconds())
+        try:
+            await self._handle(messages)
+        finally:
+            self.handled += len(messages)
+
+    def reset(self):
+        self.lags = []
+        self.handled = 0
+
+
+async def seed(users: int, devices_per_user: int, rules: int, rng: random.Random) -> dict:
+    # Ids are assigned here as mongomock-motor's insert_many does not set them on the documents
+    user_docs = [
+        User(id=PydanticObjectId(), email=f"user{i}@example.com", hashed_password="x", full_name=f"User {i}")
+        for i in range(users)
+    ]
+    await User.insert_many(user_docs)
+    device_docs = [
+        Device(id=PydanticObjectId(), name=f"device-{u}-{d}", type="light", user_id=str(user.id))
+        for u, user in enumerate(user_docs)
+        for d in range(devices_per_user)
+    ]
+    await Device.insert_many(device_docs)
+    device_ids = [str(device.id) for device in device_docs]
+    rule_docs = []
+    for i in range(rules):
+        trigger_type = rng.choice(list(EVENT_TYPES))
+        rule_docs.append(Rule(
+            name=f"rule-{i}",
+            trigger_type=trigger_type,
+            condition={EVENT_TYPES[trigger_type]: float(rng.randrange(100))},
+            operator=rng.choice([">", "<", "=="]),
+            target_device_id=rng.choice(device_ids),
+            action=rng.choice(["turn_on", "turn_off"]),
+        ))
+    if rule_docs:
+        await Rule.insert_many(rule_docs)
+    rule_engine.invalidate()
+    return {"user_ids": [str(user.id) for user in user_docs], "device_ids": device_ids}
+
+
+def monitor_payload(device_ids: List[str], rng: random.Random) -> dict:
+    event_type = rng.choice(list(EVENT_TYPES))
+    return {
+        "device_id": rng.choice(device_ids),
+        "event_type": event_type,
+        "data": {EVENT_TYPES[event_type]: float(rng.randrange(100))},
+    }
+
+
+async def drive(requests: int, concurrency: int, request: Callable[[int], Awaitable[httpx.Response]]) -> dict:
+    """Send `requests` requests from `concurrency` concurrent clients."""
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    counter = iter(range(requests))
+
+    async def client():
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                response = await request(i)
+                status = str(response.status_code)
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    errors = sum(count for status, count in statuses.items() if not status.startswith(("2", "3")))
+    return {
+        "requests": requests,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(requests / elapsed, 1),
+        **latency_summary(latencies),
+        "errors": errors,
+        "statuses": statuses,
+    }
+
+
+async def wait_for_reactor(lag: ReactorLag, expected: int, timeout: float) -> float:
+    """Seconds until the reactor handled `expected` events (or `timeout`)."""
+    start = time.perf_counter()
+    while lag.handled < expected and time.perf_counter() - start < timeout:
+        await asyncio.sleep(0.01)
+    return time.perf_counter() - start
+
+
+async def run_scenario(name: str, client: httpx.AsyncClient, fixtures: dict, lag: ReactorLag, args, rng) -> dict:
+    lag.reset()
+    device_ids, user_ids = fixtures["device_ids"], fixtures["user_ids"]
+    feeds_reactor = name in ("monitor_async", "queue")
+
+    if name == "monitor_sync":
+        result = await drive(args.requests, args.concurrency, lambda i: client.post(
+            "/api/monitor/", params={"mode": "sync"}, json=monitor_payload(device_ids, rng)))
+    elif name == "monitor_async":
+        result = await drive(args.requests, args.concurrency, lambda i: client.post(
+            "/api/monitor/", params={"mode": "async"}, json=monitor_payload(device_ids, rng)))
+    elif name == "devices":
+        result = await drive(args.requests, args.concurrency, lambda i: client.get(
+            f"/api/devices/{rng.choice(device_ids)}"))
+    elif name == "dashboard":
+        result = await drive(args.requests, args.concurrency, lambda i: client.get(
+            f"/api/dashboard/{rng.choice(user_ids)}"))
+    else:
+        # Straight onto the reactor queue, in batches, as producers other than the API do
+        start = time.perf_counter()
+        for offset in range(0, args.requests, args.queue_batch):
+            await event_transport.push([
+                {
+                    "type": payload["event_type"],
+                    "device_id": payload["device_id"],
+                    "event_id": f"e2e-{offset + i}",
+                    "timestamp": datetime.utcnow().isoformat(),
+                    **payload["data"],
+                }
+                for i, payload in enumerate(
+                    monitor_payload(device_ids, rng) for _ in range(min(args.queue_batch, args.requests - offset))
+                )
+            ])
+        elapsed = time.perf_counter() - start
+        result = {
+            "requests": args.requests,
+            "seconds": round(elapsed, 3),
+            "requests_per_second": round(args.requests / elapsed, 1),
+            "errors": 0,
+        }
+
+    if feeds_reactor:
+        drain = await wait_for_reactor(lag, args.requests, args.drain_timeout)
+        result["reactor"] = {
+            "handled": lag.handled,
+            "drain_seconds": round(drain, 3),
+            "events_per_second": round(lag.handled / (result["seconds"] + drain), 1),
+            **{f"lag_{key}": value for key, value in latency_summary(lag.lags).items()},
+        }
+    return result
+
+
+async def main_async(args) -> dict:
+    rng = random.Random(args.seed)
+    lag = ReactorLag()
+    results = {
+        "settings": {
+            key: getattr(args, key)
+            for key in ("requests", "concurrency", "users", "devices_per_user", "rules", "seed")
+        },
+        "backend": {"mongo": "mongod" if args.mongo_url else "mongomock-motor", "redis": "fakeredis"},
+        "scenarios": {},
+    }
+    with stand_ins(args.mongo_url, args.mqtt), patch.object(reactor_pool_module, "handle_messages", lag):
+        async with app.router.lifespan_context(app):
+            fixtures = await seed(args.users, args.devices_per_user, args.rules, rng)
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://e2e") as client:
+                for name in args.scenarios.split(","):
+                    results["scenarios"][name] = await run_scenario(name, client, fixtures, lag, args, rng)
+            results["reactor_pool"] = {key: value for key, value in reactor_pool.stats().items() if key != "workers"}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=1000, help="requests (or queued events) per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--devices-per-user", type=int, default=10)
+    parser.add_argument("--rules", type=int, default=1000)
+    parser.add_argument("--queue-batch", type=int, default=100, help="events per push in the queue scenario")
+    parser.add_argument("--drain-timeout", type=float, default=60.0, help="seconds to wait for the reactor")
+    parser.add_argument("--mongo-url", help="use this (disposable) MongoDB instead of mongomock-motor; the database is dropped")
+    parser.add_argument("--mqtt", action="store_true", help="start the MQTT publisher and telemetry bridge")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write the results to this file instead of stdout")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios.split(",")) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+    logging.basicConfig(level=args.log_level)
+    # Several app modules pin their logger to INFO/DEBUG, which would time the log handlers
+    for name in list(logging.root.manager.loggerDict):
+        if name == "app" or name.startswith("app."):
+            logging.getLogger(name).setLevel(args.log_level)
+
+    # The app prints its startup messages; keep stdout for the JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        results = asyncio.run(main_async(args))
+    results["revision"] = git_revision()
+    output = json.dumps(results, indent=2)
+    if args.json:
+        with open(args.json, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+Rule-engine benchmark suite on synthetic rule sets, in process and without MongoDB.
+
+For every rule-set size it reports events/s, p50/p99 per-event latency and
+the memory held by each implementation:
+
+    linear         every rule's compiled predicate evaluated per event (no index)
+    match          RuleEngine.match, one event at a time
+    match_many     RuleEngine.match_many over batches of --batch events
+    process_event  reactor_service.process_event with Consequence documents,
+                   the consequence writes and the action dispatcher replaced
+                   by in-memory stand-ins
+
+Results can be saved with --json and compared with a previous run (e.g. of
+another commit) with --compare:
+
+    python -m benchmarks.rule_engine_suite --rules 1000,10000,100000
+    python -m benchmarks.rule_engine_suite --rules 1000000 --engines match,match_many --events 2000
+    python -m benchmarks.rule_engine_suite --json after.json --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+from unittest.mock import patch
+
+from app.devices.fleet_simulator import percentile
+from app.models.rule import ConditionGroup
+from app.services import reactor_service
+from app.services.rule_engine import CompiledRule, RuleEngine, normalize_event
+from app.services.rule_index import SUPPORTED_OPERATORS
+from benchmarks.common import git_revision
+
+TRIGGER_TYPES = ["temperature_change", "humidity_change", "motion_detected", "light_change", "co2_change"]
+KEYS = ["temperature", "humidity", "motion", "light", "co2", "noise"]
+VALUE_RANGE = 1000
+ENGINES = ["linear", "match", "match_many", "process_event"]
+
+
+def make_rules(count: int, rng: random.Random, operators: List[str] = SUPPORTED_OPERATORS, compound: float = 0.2) -> list:
+    """Single-key rules, plus a `compound` share of two-leaf AND/OR trees."""
+    rules = []
+    for i in range(count):
+        rule = SimpleNamespace(
+            id=f"rule-{i}",
+            name=f"rule-{i}",
+            trigger_type=rng.choice(TRIGGER_TYPES),
+            condition={},
+            operator=None,
+            condition_tree=None,
+            action=rng.choice(["turn_on", "turn_off"]),
+            target_device_id=f"device-{rng.randrange(1000)}",
+        )
+        if rng.random() < compound:
+            rule.condition_tree = ConditionGroup(op=rng.choice(["and", "or"]), conditions=[
+                {"key": key, "operator": rng.choice(operators), "value": float(rng.randrange(VALUE_RANGE))}
+                for key in rng.sample(KEYS, 2)
+            ])
+        else:
+            rule.condition = {rng.choice(KEYS): float(rng.randrange(VALUE_RANGE))}
+            rule.operator = rng.choice(operators)
+        rules.append(rule)
+    return rules
+
+
+def make_events(count: int, rng: random.Random) -> list:
+    return [
+        {"type": rng.choice(TRIGGER_TYPES), **{key: float(rng.randrange(VALUE_RANGE)) for key in rng.sample(KEYS, 3)}}
+        for _ in range(count)
+    ]
+
+
+class CountingBuffer:
+    """Stands in for create_executed_consequences and the write-behind buffer behind it."""
+
+    def __init__(self):
+        self.count = 0
+
+    async def put_many(self, documents):
+        self.count += len(documents)
+
+
+async def no_dispatch(consequences):
+    return 0
+
+
+def as_event_document(event: dict, i: int) -> SimpleNamespace:
+    """The Event shape process_event receives from POST /api/monitor/."""
+    values = {key: value for key, value in event.items() if key != "type"}
+    return SimpleNamespace(id=f"event-{i}", device_id="bench", event_type=event["type"], data=values)
+
+
+def build_engine(rules: list) -> RuleEngine:
+    engine = RuleEngine(ttl_seconds=0, vectorize_min_batch=0)
+    engine.load(rules)
+    return engine
+
+
+def held_memory(build: Callable[[], object]) -> float:
+    """MiB still allocated by what `build` returns."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    built = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del built
+    return (after - before) / 2 ** 20
+
+
+def summarize(latencies: List[float], total_seconds: float, events: int, matches: int, memory: float) -> dict:
+    return {
+        "events_per_second": round(events / total_seconds, 1),
+        "p50_us": round(percentile(latencies, 0.5) * 1e6, 2),
+        "p99_us": round(percentile(latencies, 0.99) * 1e6, 2),
+        "memory_mib": round(memory, 2),
+        "matches_per_event": round(matches / events, 2),
+    }
+
+
+def run_linear(rules: list, events: list) -> dict:
+    compiled = [CompiledRule(rule) for rule in rules]
+    latencies, matches = [], 0
+    start = time.perf_counter()
+    for event in events:
+        t = time.perf_counter()
+        event_type, values = normalize_event(event)
+        matches += sum(1 for rule in compiled if rule(event_type, values))
+        latencies.append(time.perf_counter() - t)
+    total = time.perf_counter() - start
+    return summarize(latencies, total, len(events), matches, held_memory(lambda: [CompiledRule(rule) for rule in rules]))
+
+
+def run_match(rules: list, events: list, engine: RuleEngine, memory: float) -> dict:
+    latencies, matches = [], 0
+    start = time.perf_counter()
+    for event in events:
+        t = time.perf_counter()
+        matches += len(engine.match(event))
+        latencies.append(time.perf_counter() - t)
+    return summarize(latencies, time.perf_counter() - start, len(events), matches, memory)
+
+
+def run_match_many(rules: list, events: list, engine: RuleEngine, memory: float, batch: int) -> dict:
+    # Per-event latency of a batched call is the batch time shared by its events
+    latencies, matches = [], 0
+    start = time.perf_counter()
+    for i in range(0, len(events), batch):
+        chunk = events[i:i + batch]
+        t = time.perf_counter()
+        matches += sum(len(matched) for matched in engine.match_many(chunk))
+        latencies.extend([(time.perf_counter() - t) / len(chunk)] * len(chunk))
+    return summarize(latencies, time.perf_counter() - start, len(events), matches, memory)
+
+
+def run_process_event(rules: list, events: list, engine: RuleEngine, memory: float) -> dict:
+    documents = [as_event_document(event, i) for i, event in enumerate(events)]
+    buffer = CountingBuffer()
+    latencies = []
+
+    async def run():
+        for document in documents:
+            t = time.perf_counter()
+            await reactor_service.process_event(document)
+            latencies.append(time.perf_counter() - t)
+
+    # Keep the service path in process: no MongoDB writes, no device updates
+    with patch.object(reactor_service, "rule_engine", engine), \
+         patch.object(reactor_service, "Consequence", SimpleNamespace), \
+         patch.object(reactor_service, "create_executed_consequences", buffer.put_many), \
+         patch.object(reactor_service, "dispatch_actions", no_dispatch), \
+         patch.object(reactor_service.logger, "disabled", True):
+        start = time.perf_counter()
+        asyncio.run(run())
+        total = time.perf_counter() - start
+    return summarize(latencies, total, len(events), buffer.count, memory)
+
+
+def bench_compare(calls: int, rng: random.Random) -> dict:
+    """reactor_service.compare, the scalar lookup into rule_engine.OPERATORS kept for single checks."""
+    samples = [(rng.uniform(0, 100), rng.choice(SUPPORTED_OPERATORS), rng.uniform(0, 100)) for _ in range(calls)]
+    compare = reactor_service.compare
+    start = time.perf_counter()
+    for value, operator, target in samples:
+        compare(value, operator, target)
+    return {"ns_per_call": round((time.perf_counter() - start) / calls * 1e9, 1)}
+
+
+def run_suite(
+    sizes: List[int], engines: List[str], operators: List[str], compound: float,
+    event_count: int, batch: int, linear_max: int, seed: int,
+) -> dict:
+    results: Dict[str, dict] = {}
+    for size in sizes:
+        rng = random.Random(seed)
+        rules = make_rules(size, rng, operators, compound)
+        events = make_events(event_count, rng)
+        row: Dict[str, dict] = {}
+
+        start = time.perf_counter()
+        engine = build_engine(rules)
+        build_seconds = time.perf_counter() - start
+        memory = held_memory(lambda: build_engine(rules))
+        row["build"] = {"seconds": round(build_seconds, 3), "memory_mib": round(memory, 2)}
+
+        if "linear" in engines and size <= linear_max:
+            row["linear"] = run_linear(rules, events)
+        if "match" in engines:
+            row["match"] = run_match(rules, events, engine, memory)
+        if "match_many" in engines:
+            row["match_many"] = run_match_many(rules, events, engine, memory, batch)
+        if "process_event" in engines:
+            row["process_event"] = run_process_event(rules, events, engine, memory)
+        results[str(size)] = row
+    return results
+
+
+def print_results(results: dict, baseline: Optional[dict] = None):
+    print(f"{'rules':>8} {'engine':<14} {'events/s':>12} {'p50 us':>10} {'p99 us':>10} {'MiB':>8} {'matches':>8}"
+          + (f" {'vs base':>8}" if baseline else ""))
+    for size, row in results["rules"].items():
+        print(f"{size:>8} {'(build)':<14} {row['build']['seconds']:>11.3f}s {'':>10} {'':>10} {row['build']['memory_mib']:>8.1f}")
+        for engine, stats in row.items():
+            if engine == "build":
+                continue
+            line = (f"{size:>8} {engine:<14} {stats['events_per_second']:>12.0f} {stats['p50_us']:>10.1f} "
+                    f"{stats['p99_us']:>10.1f} {stats['memory_mib']:>8.1f} {stats['matches_per_event']:>8.1f}")
+            previous = (baseline or {}).get("rules", {}).get(size, {}).get(engine)
+            if previous:
+                line += f" {stats['events_per_second'] / previous['events_per_second']:>7.2f}x"
+            print(line)
+    print(f"compare(): {results['compare']['ns_per_call']} ns/call")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rules", default="1000,10000,100000", help="comma-separated rule-set sizes (up to 1000000)")
+    parser.add_argument("--engines", default=",".join(ENGINES))
+    parser.add_argument(
+        "--operators",
+        default=",".join(SUPPORTED_OPERATORS),
+        help="comma-separated operator mix; '==' alone keeps matches per event small",
+    )
+    parser.add_argument("--compound", type=float, default=0.2, help="share of two-leaf AND/OR rules")
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--batch", type=int, default=256, help="events per match_many call")
+    parser.add_argument("--linear-max", type=int, default=100_000, help="largest rule set the linear scan runs on")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="results of a previous --json run to compare events/s against")
+    args = parser.parse_args()
+
+    engines = args.engines.split(",")
+    unknown = set(engines) - set(ENGINES)
+    if unknown:
+        parser.error(f"unknown engine(s): {', '.join(sorted(unknown))}")
+
+    results = {
+        "revision": git_revision(),
+        "seed": args.seed,
+        "events": args.events,
+        "operators": args.operators,
+        "compound": args.compound,
+        "rules": run_suite(
+            [int(size) for size in args.rules.split(",")], engines, args.operators.split(","), args.compound,
+            args.events, args.batch, args.linear_max, args.seed,
+        ),
+        "compare": bench_compare(200_000, random.Random(args.seed)),
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"baseline: {baseline.get('revision')}  current: {results['revision']}")
+        for setting in ("seed", "events", "operators", "compound"):
+            if baseline.get(setting) != results[setting]:
+                print(f"warning: baseline ran with {setting}={baseline.get(setting)!r}, this run with {results[setting]!r}")
+    print_results(results, baseline)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
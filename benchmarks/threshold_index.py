@@ -0,0 +1,96 @@
+"""
+Compare the rule engine (interned conditions in sorted ThresholdIndex arrays)
+against the linear OPERATORS loop get_matching_rules used before the index existed.
+
+    python -m benchmarks.threshold_index --rules 100000 --events 2000
+    python -m benchmarks.threshold_index --rules 100000 --operators "=="
+"""
+import argparse
+import random
+import time
+from types import SimpleNamespace
+
+from app.services.rule_engine import RuleEngine
+from app.services.rule_index import SUPPORTED_OPERATORS
+from app.services.rule_service import OPERATORS
+
+TRIGGER_TYPE = "temperature_change"
+
+
+def make_rules(count: int, operators: list, rng: random.Random) -> list:
+    return [
+        SimpleNamespace(
+            id=f"rule-{i}",
+            trigger_type=TRIGGER_TYPE,
+            condition={"temperature": round(rng.uniform(-10, 45), 1)},
+            operator=rng.choice(operators),
+        )
+        for i in range(count)
+    ]
+
+
+def linear_match(rules: list, event: dict) -> list:
+    matched = []
+    for rule in rules:
+        if rule.trigger_type != event.get("type"):
+            continue
+        for key, value in rule.condition.items():
+            if key not in event:
+                continue
+            op = OPERATORS.get(rule.operator)
+            if op and op(event[key], value):
+                matched.append(rule)
+    return matched
+
+
+def build_engine(rules: list) -> RuleEngine:
+    engine = RuleEngine(ttl_seconds=0)
+    engine.load(rules)
+    return engine
+
+
+def timed(fn, events: list) -> tuple:
+    matched = 0
+    start = time.perf_counter()
+    for event in events:
+        matched += len(fn(event))
+    return time.perf_counter() - start, matched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rules", type=int, default=100_000)
+    parser.add_argument("--events", type=int, default=1_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--operators",
+        default=",".join(SUPPORTED_OPERATORS),
+        help="comma-separated operator mix; '==' alone shows the cost without large result sets",
+    )
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    rules = make_rules(args.rules, args.operators.split(","), rng)
+    events = [
+        {"type": TRIGGER_TYPE, "temperature": round(rng.uniform(-10, 45), 1)}
+        for _ in range(args.events)
+    ]
+
+    start = time.perf_counter()
+    engine = build_engine(rules)
+    build_seconds = time.perf_counter() - start
+
+    linear_seconds, linear_matched = timed(lambda e: linear_match(rules, e), events)
+    index_seconds, index_matched = timed(engine.match, events)
+    assert linear_matched == index_matched, "index and linear scan disagree"
+
+    per_event = lambda seconds: seconds / len(events) * 1e6
+    print(f"rules={args.rules} events={args.events} avg_matches={index_matched / len(events):.0f}")
+    print(f"index build:   {build_seconds * 1e3:10.1f} ms")
+    print(f"linear loop:   {per_event(linear_seconds):10.1f} us/event")
+    print(f"sorted index:  {per_event(index_seconds):10.1f} us/event")
+    print(f"speedup:       {linear_seconds / index_seconds:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
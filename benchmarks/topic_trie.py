@@ -0,0 +1,90 @@
+"""
+Compare TopicTrie lookups against a linear scan that compares the topic with
+every registered filter level by level, the cost of dispatching with one
+comparison per subscription.
+
+    python -m benchmarks.topic_trie --topics 100000 --lookups 100000
+    python -m benchmarks.topic_trie --topics 100000 --wildcards 0.2
+"""
+import argparse
+import random
+import time
+
+from app.services.topic_trie import TopicTrie
+
+CHANNELS = ["control", "telemetry", "status"]
+
+
+def make_filters(count: int, wildcards: float, rng: random.Random) -> list:
+    filters = set()
+    while len(filters) < count:
+        device = f"d{rng.randrange(count)}"
+        if rng.random() >= wildcards:
+            filters.add(f"device/{device}/{rng.choice(CHANNELS)}")
+        elif rng.random() < 0.5:
+            filters.add(f"device/{device}/+")
+        else:
+            filters.add(f"device/+/{rng.choice(CHANNELS)}/{device}/#")
+    return sorted(filters)
+
+
+def filter_matches(filter_levels: list, topic_levels: list) -> bool:
+    for i, level in enumerate(filter_levels):
+        if level == "#":
+            return True
+        if i >= len(topic_levels) or (level != "+" and level != topic_levels[i]):
+            return False
+    return len(filter_levels) == len(topic_levels)
+
+
+def linear_match(split_filters: list, topic: str) -> list:
+    topic_levels = topic.split("/")
+    return [f for f, levels in split_filters if filter_matches(levels, topic_levels)]
+
+
+def timed(fn, topics: list) -> tuple:
+    matched = 0
+    start = time.perf_counter()
+    for topic in topics:
+        matched += len(fn(topic))
+    return time.perf_counter() - start, matched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--topics", type=int, default=100_000, help="registered topic filters")
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--linear-lookups", type=int, default=200, help="lookups for the (slow) linear scan")
+    parser.add_argument("--wildcards", type=float, default=0.05, help="share of filters using + or #")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    filters = make_filters(args.topics, args.wildcards, rng)
+    topics = [f"device/d{rng.randrange(args.topics)}/{rng.choice(CHANNELS)}" for _ in range(args.lookups)]
+
+    start = time.perf_counter()
+    trie = TopicTrie()
+    for topic_filter in filters:
+        trie.add(topic_filter, None)
+    build_seconds = time.perf_counter() - start
+
+    sample = topics[:args.linear_lookups]
+    split_filters = [(f, f.split("/")) for f in filters]
+    linear_seconds, linear_matched = timed(lambda topic: linear_match(split_filters, topic), sample)
+    _, sample_matched = timed(trie.match, sample)
+    assert linear_matched == sample_matched, "trie and linear scan disagree"
+    trie_seconds, trie_matched = timed(trie.match, topics)
+
+    per_lookup = lambda seconds, count: seconds / count * 1e6
+    linear_us = per_lookup(linear_seconds, len(sample))
+    trie_us = per_lookup(trie_seconds, len(topics))
+    print(f"filters={len(filters)} lookups={len(topics)} avg_matches={trie_matched / len(topics):.2f}")
+    print(f"trie build:    {build_seconds * 1e3:10.1f} ms")
+    print(f"linear scan:   {linear_us:10.1f} us/lookup")
+    print(f"topic trie:    {trie_us:10.2f} us/lookup")
+    print(f"speedup:       {linear_us / trie_us:10.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Find the batch size at which the NumPy evaluator (RuleEngine.match_many through
+vectorized_rules.match_batch) beats matching each event with RuleEngine.match.
+
+    python -m benchmarks.vectorized_rules --rules 1000,10000 --batches 1,8,32,128,512
+"""
+import argparse
+import random
+import time
+from types import SimpleNamespace
+
+from app.services.rule_engine import RuleEngine
+from app.services.rule_index import SUPPORTED_OPERATORS
+
+TRIGGER_TYPES = ["temperature_change", "humidity_change", "motion_detected"]
+KEYS = ["temperature", "humidity", "motion", "light"]
+
+
+def make_rules(count: int, rng: random.Random) -> list:
+    return [
+        SimpleNamespace(
+            id=f"rule-{i}",
+            trigger_type=rng.choice(TRIGGER_TYPES),
+            condition={rng.choice(KEYS): float(rng.randint(0, 1000))},
+            operator=rng.choice(SUPPORTED_OPERATORS),
+        )
+        for i in range(count)
+    ]
+
+
+def make_events(count: int, rng: random.Random) -> list:
+    return [
+        {"type": rng.choice(TRIGGER_TYPES), **{key: float(rng.randint(0, 1000)) for key in rng.sample(KEYS, 2)}}
+        for _ in range(count)
+    ]
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rules", default="100,1000,10000")
+    parser.add_argument("--batches", default="1,4,16,64,256,1024")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'rules':>8} {'batch':>6} {'scalar us/ev':>13} {'numpy us/ev':>12} {'speedup':>8}")
+    for rule_count in map(int, args.rules.split(",")):
+        # Always vectorize match_many; the scalar side calls match() directly
+        engine = RuleEngine(ttl_seconds=0, vectorize_min_batch=0)
+        engine.load(make_rules(rule_count, rng))
+        crossover = None
+        for batch_size in map(int, args.batches.split(",")):
+            events = make_events(batch_size, rng)
+            scalar = [sorted(r.id for r in engine.match(e)) for e in events]
+            assert scalar == [sorted(r.id for r in m) for m in engine.match_many(events)]
+
+            scalar_s = best_of(lambda: [engine.match(e) for e in events], args.repeat)
+            numpy_s = best_of(lambda: engine.match_many(events), args.repeat)
+            if crossover is None and numpy_s < scalar_s:
+                crossover = batch_size
+            print(
+                f"{rule_count:>8} {batch_size:>6} {scalar_s / batch_size * 1e6:>13.1f} "
+                f"{numpy_s / batch_size * 1e6:>12.1f} {scalar_s / numpy_s:>7.2f}x"
+            )
+        print(f"{rule_count:>8} crossover batch size: {crossover or 'not reached'}")
+
+
+if __name__ == "__main__":
+    main()
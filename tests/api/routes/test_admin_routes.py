@@ -0,0 +1,105 @@
+import marshal
+import pytest
+from httpx import AsyncClient
+from fastapi import status
+from unittest.mock import patch, AsyncMock, MagicMock
+from app.api.routes.admin_routes import admin_only
+from app.core.profiler import authorize, profile_store
+from app.core.query_tracer import slow_queries
+from app.main import app
+from app.models.user import UserRole
+
+
+@pytest.fixture
+def as_admin():
+    app.dependency_overrides[admin_only] = lambda: None
+    with patch("app.core.profiler.authorize", AsyncMock(return_value="admin@example.com")):
+        yield
+    app.dependency_overrides.pop(admin_only)
+    profile_store.clear()
+
+
+# A request with the header is profiled by an admin and its profile can be downloaded
+@pytest.mark.asyncio
+async def test_profile_request_and_download(as_admin):
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.get("/", headers={"X-Profile": "1"})
+        profile_id = response.headers["x-profile-id"]
+        listed = await ac.get("/api/admin/profiles")
+        dump = await ac.get(f"/api/admin/profiles/{profile_id}")
+        text = await ac.get(f"/api/admin/profiles/{profile_id}", params={"format": "text", "limit": 5})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert listed.json()[0]["profile_id"] == int(profile_id)
+    assert listed.json()[0]["path"] == "/"
+    assert listed.json()[0]["user"] == "admin@example.com"
+    assert marshal.loads(dump.content)
+    assert "function calls" in text.text
+
+
+# Without the header the admin check and the profiler are skipped
+@pytest.mark.asyncio
+async def test_requests_without_header_are_not_profiled(as_admin):
+    with patch("app.core.profiler.authorize", AsyncMock()) as mock_authorize:
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            response = await ac.get("/")
+
+    assert "x-profile-id" not in response.headers
+    mock_authorize.assert_not_called()
+    assert len(profile_store) == 0
+
+
+# The header is ignored for anyone but an admin
+@pytest.mark.asyncio
+async def test_profile_header_ignored_for_non_admins():
+    with patch("app.core.profiler.authorize", AsyncMock(return_value=None)):
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            response = await ac.get("/", headers={"X-Profile": "1"})
+            listed = await ac.get("/api/admin/profiles")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert "x-profile-id" not in response.headers
+    assert len(profile_store) == 0
+    assert listed.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.asyncio
+async def test_download_unknown_profile(as_admin):
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.get("/api/admin/profiles/999")
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+# The bearer token is checked through require_roles(["admin"])
+@pytest.mark.asyncio
+async def test_authorize_requires_admin_role():
+    scope = {"type": "http", "headers": [(b"authorization", b"Bearer token")]}
+    admin = MagicMock(email="admin@example.com", is_active=True, roles=[UserRole.ADMIN])
+    user = MagicMock(email="user@example.com", is_active=True, roles=[UserRole.USER])
+
+    with patch("app.core.profiler.get_current_user", AsyncMock(side_effect=[admin, user])):
+        assert await authorize(scope) == "admin@example.com"
+        assert await authorize(scope) is None
+    assert await authorize({"type": "http", "headers": []}) is None
+
+    # Errors looking the user up leave the request unprofiled instead of failing it
+    with patch("app.core.profiler.get_current_user", AsyncMock(side_effect=RuntimeError("mongo down"))):
+        assert await authorize(scope) is None
+
+
+@pytest.mark.asyncio
+async def test_list_slow_queries(as_admin):
+    slow_queries.record(("sensors", "find", '{"user_id": "?"}'), 0.3, "GET /api/sensors/user/{user_id}")
+    slow_queries.record(("devices", "find", '{"_id": "?"}'), 0.5, "GET /api/devices/{device_id}")
+    slow_queries.record(("sensors", "find", '{"user_id": "?"}'), 0.4, "GET /api/sensors/user/{user_id}")
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            response = await ac.get("/api/admin/slow-queries", params={"limit": 1})
+    finally:
+        slow_queries.clear()
+
+    assert response.status_code == status.HTTP_200_OK
+    [top] = response.json()["shapes"]
+    assert top["collection"] == "sensors"
+    assert top["count"] == 2
@@ -0,0 +1,18 @@
+import pytest
+from httpx import AsyncClient
+from fastapi import status
+from unittest.mock import patch, AsyncMock
+from app.main import app
+
+
+# /live is not captured by /{device_id} and reads the twins of every requested device
+@pytest.mark.asyncio
+async def test_get_live_devices():
+    live = {"d1": {"state": "on", "state_updated_at": 1.0, "readings": {}}}
+    with patch("app.api.routes.devices_routes.get_live_states", AsyncMock(return_value=live)) as mock_live:
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            response = await ac.get("/api/devices/live", params=[("ids", "d1"), ("ids", "d2")])
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == live
+    mock_live.assert_called_once_with(["d1", "d2"])
@@ -0,0 +1,41 @@
+import pytest
+from httpx import AsyncClient
+from fastapi import status
+from unittest.mock import patch, AsyncMock
+from app.core.metrics import HTTP_REQUEST_SECONDS
+from app.main import app
+
+
+def observed(method, route, status_code):
+    return HTTP_REQUEST_SECONDS.labels(method, route, str(status_code))._sum.get()
+
+
+# Requests are timed under their route template, and the queue depth is read at scrape time
+@pytest.mark.asyncio
+async def test_metrics_exposes_route_latency_and_queue_depth():
+    before = observed("GET", "/", 200)
+    with patch("app.api.routes.metrics_routes.event_transport.depth", AsyncMock(return_value=7)):
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            await ac.get("/")
+            await ac.get("/no/such/route")
+            response = await ac.get("/metrics")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+    assert observed("GET", "/", 200) > before
+    body = response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="unmatched",status="404"}' in body
+    assert "event_queue_depth 7.0" in body
+    assert "reactor_events_total" in body
+    assert "rule_matches_total" in body
+    assert "mongo_command_duration_seconds" in body
+
+
+# A Redis outage must not break the scrape
+@pytest.mark.asyncio
+async def test_metrics_survives_queue_errors():
+    with patch("app.api.routes.metrics_routes.event_transport.depth", AsyncMock(side_effect=ConnectionError("down"))):
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            response = await ac.get("/metrics")
+
+    assert response.status_code == status.HTTP_200_OK
@@ -0,0 +1,63 @@
+import pytest
+from httpx import AsyncClient
+from fastapi import status
+from unittest.mock import patch, MagicMock
+from app.main import app
+from datetime import datetime, timezone
+from bson import ObjectId
+
+EVENT_PAYLOAD = {
+    "device_id": "device_123",
+    "event_type": "temperature_change",
+    "data": {"temperature": 29.5}
+}
+
+
+@pytest.fixture
+def mock_event_doc():
+    return MagicMock(
+        id=ObjectId(),
+        device_id=EVENT_PAYLOAD["device_id"],
+        event_type=EVENT_PAYLOAD["event_type"],
+        data=EVENT_PAYLOAD["data"],
+        timestamp=datetime.now(timezone.utc)
+    )
+
+
+@pytest.mark.asyncio
+async def test_create_event_sync(mock_event_doc):
+    with patch("app.api.routes.monitor_routes.log_event", return_value=mock_event_doc) as mock_log, \
+         patch("app.api.routes.monitor_routes.ingest_event") as mock_ingest:
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            response = await ac.post("/api/monitor/", json=EVENT_PAYLOAD)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["id"] == str(mock_event_doc.id)
+    mock_log.assert_called_once()
+    mock_ingest.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_create_event_async_returns_202(mock_event_doc):
+    with patch("app.api.routes.monitor_routes.ingest_event", return_value=mock_event_doc) as mock_ingest, \
+         patch("app.api.routes.monitor_routes.log_event") as mock_log:
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            response = await ac.post("/api/monitor/?mode=async", json=EVENT_PAYLOAD)
+
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    response_data = response.json()
+    assert response_data["id"] == str(mock_event_doc.id)
+    assert response_data["status"] == "accepted"
+    assert response_data["consequences_url"] == f"/api/consequences/?event_id={mock_event_doc.id}"
+    mock_ingest.assert_called_once()
+    mock_log.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_create_event_async_by_default():
+    with patch("app.api.routes.monitor_routes.MONITOR_INGEST_MODE", "async"), \
+         patch("app.api.routes.monitor_routes.ingest_event", return_value=MagicMock(id=ObjectId())):
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            response = await ac.post("/api/monitor/", json=EVENT_PAYLOAD)
+
+    assert response.status_code == status.HTTP_202_ACCEPTED
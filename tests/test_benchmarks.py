@@ -0,0 +1,33 @@
+import argparse
+
+from benchmarks.e2e_throughput import SCENARIOS, main_async
+from benchmarks.rule_engine_suite import ENGINES, run_suite
+
+
+# Keeps the suite runnable, and every implementation must find the same matches
+def test_rule_engine_suite_engines_agree():
+    results = run_suite(
+        [300], ENGINES, operators=[">", "<", "=="], compound=0.3,
+        event_count=100, batch=16, linear_max=1000, seed=5,
+    )
+
+    row = results["300"]
+    assert set(row) == {"build", *ENGINES}
+    assert len({row[engine]["matches_per_event"] for engine in ENGINES}) == 1
+    assert all(row[engine]["events_per_second"] > 0 for engine in ENGINES)
+
+
+# Boots the app on the in-process stand-ins and drives every scenario once
+async def test_e2e_throughput_scenarios_run():
+    args = argparse.Namespace(
+        scenarios=",".join(SCENARIOS), requests=20, concurrency=4, users=2, devices_per_user=3, rules=20,
+        queue_batch=5, drain_timeout=10.0, mongo_url=None, mqtt=False, seed=3,
+    )
+
+    results = await main_async(args)
+
+    assert set(results["scenarios"]) == set(SCENARIOS)
+    for name, scenario in results["scenarios"].items():
+        assert scenario["errors"] == 0, name
+    for name in ("monitor_async", "queue"):
+        assert results["scenarios"][name]["reactor"]["handled"] == 20